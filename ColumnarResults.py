@@ -0,0 +1,165 @@
+"""
+SHARED COLUMNAR RESULTS
+
+An output stage used by both the generalised code and the code specific for
+each regulator to write the rows of the output a second time as compressed
+columnar files, which are much faster to reload than a large Output.csv. The
+rows are written in Parquet or Arrow IPC format and partitioned into folders
+named like Regulator=OCC/Year=2015, the layout read by pyarrow.dataset,
+pandas.read_parquet and most query engines, so that a query on a date or an
+institution only reads the columns and partitions it needs. Rows are kept per
+partition and written as a row group as soon as enough of them have been
+collected, so the memory used does not grow with the number of rows. The folder
+is written under a temporary name and only renamed once it is complete. pyarrow
+is only imported when a writer is created.
+"""
+
+# Importing the previously installed libraries.
+import os
+import math
+import shutil
+import tempfile
+
+
+# This dictionary stores the extension of the files of every format.
+FORMAT_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# This variable stores the name of the folder of a partition whose value is
+# missing, such as the year of a keyword, which readers turn back into null.
+MISSING_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+# This function is used to convert a value to the type of a column provided as
+# an argument, which is either "string" or "date". Missing values become None.
+def toColumnValue(value, columnType):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if columnType == "string":
+        return str(value)
+    return value
+
+
+# This function is used to obtain the name of the folder of a partition from
+# the name of its column and its value.
+def getPartitionFolder(column, value):
+    if value is None:
+        value = MISSING_PARTITION
+    return column + "=" + str(value).replace(os.sep, "_").replace("=", "_")
+
+
+class PartitionedWriter:
+
+    # This function is used to create a writer for a table with the columns
+    # provided as a dictionary mapping every column to its type ("string" or
+    # "date"), partitioned by the given partition columns. The files are
+    # written in the given format ("parquet" or "arrow") into the output
+    # directory, and every row group holds up to the given number of rows.
+    def __init__(self, outputDirectory, columns, partitionColumns,
+                 fileFormat="parquet", rowGroupSize=65536, compression="zstd"):
+        import pyarrow as pa
+        if fileFormat not in FORMAT_EXTENSIONS:
+            raise ValueError("The format " + repr(fileFormat) + " is not one " +
+                             "of " + ", ".join(FORMAT_EXTENSIONS) + ".")
+        self.outputDirectory = outputDirectory
+        self.columns = dict(columns)
+        self.partitionColumns = list(partitionColumns)
+        self.fileFormat = fileFormat
+        self.rowGroupSize = rowGroupSize
+        self.compression = compression
+        self.numberOfRows = 0
+
+        # This variable stores the schema shared by every file.
+        self.schema = pa.schema([(column, pa.string() if columnType ==
+                                  "string" else pa.date32())
+                                 for column, columnType in
+                                 self.columns.items()])
+
+        # These dictionaries store the rows that have not been written yet and
+        # the open file of every partition.
+        self.buffers = {}
+        self.writers = {}
+
+        # We write the files into a temporary folder next to the output
+        # directory.
+        parentDirectory = os.path.dirname(os.path.abspath(outputDirectory))
+        os.makedirs(parentDirectory, exist_ok=True)
+        self.temporaryDirectory = tempfile.mkdtemp(
+            prefix=os.path.basename(os.path.abspath(outputDirectory)) + ".",
+            suffix=".part", dir=parentDirectory)
+
+    # This function is used to add a row to the partition with the values of
+    # the partition columns provided as an argument. The values of the row are
+    # given in the same order as the columns.
+    def add(self, partition, *values):
+        partition = tuple(partition)
+        buffer = self.buffers.get(partition)
+        if buffer is None:
+            buffer = self.buffers[partition] = {column: [] for column in
+                                                self.columns}
+        for (column, columnType), value in zip(self.columns.items(), values):
+            buffer[column].append(toColumnValue(value, columnType))
+        self.numberOfRows += 1
+
+        # We write a row group once the partition has collected enough rows.
+        if len(buffer[next(iter(self.columns))]) >= self.rowGroupSize:
+            self.flush(partition)
+
+    # This function is used to find the number of rows that have been added.
+    def __len__(self):
+        return self.numberOfRows
+
+    # This function is used to write the rows collected for the partition
+    # provided as an argument as a row group of its file.
+    def flush(self, partition):
+        import pyarrow as pa
+        buffer = self.buffers.pop(partition, None)
+        if buffer is None:
+            return
+
+        # We open the file of the partition the first time it is written.
+        writer = self.writers.get(partition)
+        if writer is None:
+            directory = os.path.join(self.temporaryDirectory, *[
+                getPartitionFolder(column, value) for column, value in
+                zip(self.partitionColumns, partition)])
+            os.makedirs(directory, exist_ok=True)
+            fileName = os.path.join(directory, "part-0" +
+                                    FORMAT_EXTENSIONS[self.fileFormat])
+            if self.fileFormat == "parquet":
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(fileName, self.schema,
+                                          compression=self.compression)
+            else:
+                writer = pa.ipc.new_file(fileName, self.schema,
+                                         options=pa.ipc.IpcWriteOptions(
+                                             compression=self.compression))
+            self.writers[partition] = writer
+
+        writer.write_table(pa.Table.from_pydict(buffer, schema=self.schema))
+
+    # This function is used to write the remaining rows, close every file and
+    # move the folder to its final name, replacing the output of an earlier
+    # run.
+    def close(self):
+        if self.temporaryDirectory is None:
+            return
+        for partition in list(self.buffers):
+            self.flush(partition)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+        # An existing output directory is moved out of the way first, since a
+        # folder can only be renamed over an empty one.
+        if os.path.exists(self.outputDirectory):
+            oldDirectory = tempfile.mkdtemp(
+                prefix=os.path.basename(os.path.abspath(
+                    self.outputDirectory)) + ".", suffix=".old",
+                dir=os.path.dirname(os.path.abspath(self.outputDirectory)))
+            os.rmdir(oldDirectory)
+            os.replace(self.outputDirectory, oldDirectory)
+            os.replace(self.temporaryDirectory, self.outputDirectory)
+            shutil.rmtree(oldDirectory, ignore_errors=True)
+        else:
+            os.replace(self.temporaryDirectory, self.outputDirectory)
+        self.temporaryDirectory = None
@@ -0,0 +1,317 @@
+"""
+COMMAND LINE
+
+A non-interactive entry point for both the generalised code and the code
+specific for each regulator, so that runs can be scheduled or started by a job
+runner without anybody answering prompts. The "any" command processes every
+record of Data.csv, and the "fdic", "occ" and "fed" commands process a list of
+FDIC docket numbers, OCC order numbers or FED URLs. The "search" command finds
+dates and keywords in the text index of the documents processed by earlier runs
+without processing any PDF again. Running either script without any arguments
+still asks for everything interactively.
+
+Steps for Executing the Code From the Command Line:
+1. Execute python CommandLine.py any --download --start 01/01/2015 --end 31/12/2020 --keywords "Wyomissing;Reginald" to process Data.csv with the given filters.
+2. Add --columnar-output OutputTables to also write the output as Parquet files partitioned by regulator and by year, or --columnar-format arrow to write Arrow files instead. pyarrow should be installed to use this option.
+3. Execute python CommandLine.py search --start 01/01/2015 --end 31/12/2020 --keywords "Wyomissing;Reginald" to search the documents of Data.csv that have already been processed, or add --source FDIC to search the FDIC documents.
+4. Execute python CommandLine.py fdic FDIC-13-214e FDIC-12-568e, or python CommandLine.py fdic --identifiers-file dockets.txt, to process FDIC documents. The occ and fed commands work the same way.
+5. Add --report Report.json to write the time spent in every stage, the pages processed per second, the bytes downloaded, the hit rates of the caches and the peak memory of the run, for the whole run, every regulator and every record, to Report.json. Add --profile Run.prof to also profile the run with cProfile, and read it with python -m pstats Run.prof.
+6. Execute python CommandLine.py --help, or python CommandLine.py any --help, to see every option, and python CommandLine.py --version to see the version of the code.
+"""
+
+# Importing the previously installed libraries.
+import os
+import sys
+import argparse
+from datetime import datetime
+from TextualAnalysis import __version__
+
+
+# This dictionary stores the regulator handled by every regulator command.
+REGULATOR_COMMANDS = {"fdic": "FDIC", "occ": "OCC", "fed": "FED"}
+
+
+# This function is used to read a date given in DD/MM/YYYY format on the
+# command line.
+def parseDate(text):
+    try:
+        return datetime.strptime(text, '%d/%m/%Y')
+    except ValueError:
+        raise argparse.ArgumentTypeError("'" + text + "' is not a date in DD/" +
+                                         "MM/YYYY format")
+
+
+# This function is used to read a list of keywords, or of identifiers, from the
+# file with the name provided as an argument. The file should contain one entry
+# per line, and blank lines are ignored.
+def readLines(fileName):
+    with open(fileName, encoding='utf-8-sig') as file:
+        return [line.strip() for line in file if line.strip() != ""]
+
+
+# This function is used to build the parser of the command line arguments.
+def buildParser():
+    parser = argparse.ArgumentParser(
+        prog="CommandLine.py",
+        description="Find the dates and keywords mentioned in the enforcemen" +
+                    "t actions of the regulators.")
+    parser.add_argument("--version", action="version",
+                        version="%(prog)s " + __version__)
+
+    # These options are shared by every command.
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument("--output", default="Output.csv",
+                        help="output file (default: %(default)s)")
+    shared.add_argument("--cache-directory", default=".cache",
+                        help="directory of the download cache, the OCR cache" +
+                        ", the converted workbooks, the lookup index, the te" +
+                        "xt index and the run state (default: %(default)s)")
+    shared.add_argument("--no-cache", action="store_true",
+                        help="download and recognize every document again a" +
+                        "nd do not reuse the output of earlier runs")
+    shared.add_argument("--scratch-directory",
+                        help="directory where the temporary workspace of the" +
+                        " run is created (default: the temporary directory " +
+                        "of the system)")
+    shared.add_argument("--report",
+                        help="JSON file where a report of the run is writte" +
+                        "n, with the time spent in every stage, the pages pr" +
+                        "ocessed, the bytes downloaded, the hit rates of the" +
+                        " caches and the peak memory, for the whole run, eve" +
+                        "ry regulator and every record")
+    shared.add_argument("--profile",
+                        help="file where a cProfile profile of the main pro" +
+                        "cess is written, which can be read with pstats")
+
+    # These options are shared by every command that processes documents.
+    common = argparse.ArgumentParser(add_help=False, parents=[shared])
+    common.add_argument("--input", help="data file to read instead of Data.c" +
+                        "sv, FDIC.csv, OCC.xlsx or FED.csv")
+    common.add_argument("--columnar-output",
+                        help="directory where the output is also written as" +
+                        " compressed columnar files, partitioned by regulato" +
+                        "r and by year")
+    common.add_argument("--columnar-format", choices=["parquet", "arrow"],
+                        default="parquet",
+                        help="format of the columnar output (default: " +
+                        "%(default)s)")
+    common.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes used for OCR (defau" +
+                        "lt: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # These options are shared by the generalised code and the search.
+    filtersParser = argparse.ArgumentParser(add_help=False)
+    filtersParser.add_argument("--start", type=parseDate,
+                               help="starting date filter in DD/MM/YYYY format")
+    filtersParser.add_argument("--end", type=parseDate,
+                               help="ending date filter in DD/MM/YYYY format")
+    filtersParser.add_argument("--keywords", default="",
+                               help="keywords separated by semicolons (;)")
+    filtersParser.add_argument("--keyword-file",
+                               help="file containing one keyword per line")
+
+    # These options are specific to the generalised code.
+    anyParser = subparsers.add_parser(
+        "any", parents=[common, filtersParser],
+        help="process every record of Data.csv")
+    anyParser.add_argument("--download", action="store_true",
+                           help="download the PDFs instead of reading them f" +
+                           "rom --pdf-directory")
+    anyParser.add_argument("--pdf-directory", default=".",
+                           help="directory of the PDFs labelled with their R" +
+                           "ecord ID (default: %(default)s)")
+    anyParser.add_argument("--journal",
+                           help="progress journal used to resume an interrup" +
+                           "ted run (default: the output file with a .journa" +
+                           "l extension)")
+    anyParser.add_argument("--deduplicate", action="store_true",
+                           help="write a repeated date or keyword in the sam" +
+                           "e sentence of a record only once")
+
+    # These options are specific to the code for each regulator.
+    for command, regulatorName in REGULATOR_COMMANDS.items():
+        regulatorParser = subparsers.add_parser(
+            command, parents=[common],
+            help="process a list of " + regulatorName + " documents")
+        regulatorParser.add_argument("identifiers", nargs="*",
+                                     help="FDIC docket numbers, OCC order nu" +
+                                     "mbers or FED URLs")
+        regulatorParser.add_argument("--identifiers-file",
+                                     help="file containing one identifier pe" +
+                                     "r line")
+        regulatorParser.add_argument("--status", default="Status.csv",
+                                     help="status file (default: %(default)s)")
+        regulatorParser.add_argument("--minimum-year", type=int, default=1990,
+                                     help="first year whose dates are writte" +
+                                     "n to the output (default: %(default)s)")
+
+    # These options are specific to the search of the text index.
+    searchParser = subparsers.add_parser(
+        "search", parents=[shared, filtersParser],
+        help="search the documents processed by earlier runs")
+    searchParser.add_argument("--source", default="Data.csv",
+                              help="data file whose documents are searched, " +
+                              "or FDIC, OCC or FED for the documents of a re" +
+                              "gulator (default: %(default)s)")
+    searchParser.add_argument("--no-dates", action="store_true",
+                              help="only search for the keywords")
+
+    return parser
+
+
+# This function is used to point the caches at the cache directory provided as
+# an argument, or to disable them if it is None. It returns the file of the
+# run state.
+def configureCaches(cacheDirectory):
+    import Downloading
+    import PDFProcessing
+    import RegulatorIndex
+    import SourceReader
+    import TextIndex
+    if cacheDirectory is None:
+        Downloading.CACHE_DIRECTORY = None
+        PDFProcessing.OCR_CACHE_FILE = None
+        RegulatorIndex.INDEX_DIRECTORY = None
+        SourceReader.SOURCE_CACHE_DIRECTORY = None
+        TextIndex.TEXT_INDEX_FILE = None
+        return None
+    Downloading.CACHE_DIRECTORY = os.path.join(cacheDirectory, "downloads")
+    PDFProcessing.OCR_CACHE_FILE = os.path.join(cacheDirectory, "ocr.sqlite3")
+    RegulatorIndex.INDEX_DIRECTORY = os.path.join(cacheDirectory, "index")
+    SourceReader.SOURCE_CACHE_DIRECTORY = os.path.join(cacheDirectory,
+                                                       "sources")
+    TextIndex.TEXT_INDEX_FILE = os.path.join(cacheDirectory, "text.sqlite3")
+    return os.path.join(cacheDirectory, "state.sqlite3")
+
+
+# This function is used to read the keywords given on the command line and in
+# the keyword file.
+def getKeywords(arguments):
+    listOfKeywords = arguments.keywords.split(";")
+    if arguments.keyword_file is not None:
+        listOfKeywords += readLines(arguments.keyword_file)
+    return listOfKeywords
+
+
+# This function is used to find the journal of the run with the arguments
+# provided. By default it is named after the output file, so runs writing
+# different output files in the same folder never share a journal.
+def getJournalFile(arguments):
+    if arguments.journal is not None:
+        return arguments.journal
+    return os.path.splitext(arguments.output)[0] + ".journal"
+
+
+# This function is used to run the generalised code with the arguments provided.
+def runAny(arguments, stateFile):
+    from Workspace import Workspace
+    from TextIndex import TEXT_INDEX_FILE
+    from TextualAnalysisForAnyRegulator import getDataFromDataframe
+
+    # This list stores the keywords given on the command line and in the
+    # keyword file.
+    listOfKeywords = getKeywords(arguments)
+
+    # The PDFs are downloaded into a workspace of their own, which is removed
+    # once they have been processed.
+    workspace = Workspace() if arguments.download else None
+    try:
+        getDataFromDataframe(arguments.start or datetime.min,
+                             arguments.end or datetime.max, listOfKeywords,
+                             arguments.workers, workspace.directory
+                             if workspace is not None else
+                             arguments.pdf_directory, arguments.output,
+                             journalFile=getJournalFile(arguments),
+                             stateFile=stateFile,
+                             download=workspace is not None,
+                             dataFile=arguments.input or "Data.csv",
+                             deduplicate=arguments.deduplicate,
+                             columnarOutput=arguments.columnar_output,
+                             columnarFormat=arguments.columnar_format,
+                             textIndexFile=TEXT_INDEX_FILE)
+    finally:
+        if workspace is not None:
+            workspace.close()
+
+
+# This function is used to run the code specific for the regulator with the
+# name provided as an argument with the arguments provided.
+def runRegulator(regulatorName, arguments, stateFile):
+
+    # This list stores the identifiers given on the command line and in the
+    # identifiers file.
+    listOfIdentifiers = list(arguments.identifiers)
+    if arguments.identifiers_file is not None:
+        listOfIdentifiers += readLines(arguments.identifiers_file)
+    if listOfIdentifiers == []:
+        raise SystemExit("No identifiers were given.")
+
+    from TextIndex import TEXT_INDEX_FILE
+    from TextualAnalysisForSpecificRegulator import getDataForIdentifiers
+    getDataForIdentifiers(regulatorName, listOfIdentifiers, arguments.output,
+                          arguments.status, stateFile, arguments.input,
+                          arguments.minimum_year, arguments.columnar_output,
+                          arguments.columnar_format, TEXT_INDEX_FILE,
+                          arguments.workers)
+
+
+# This function is used to search the text index with the arguments provided
+# and write the rows found to the output file, with the same columns as the
+# output of the generalised code.
+def runSearch(arguments):
+    from TextIndex import TEXT_INDEX_FILE, TextIndex
+    from Results import ResultBuilder
+    if TEXT_INDEX_FILE is None or not os.path.exists(TEXT_INDEX_FILE):
+        raise SystemExit("There is no text index. Process the documents with" +
+                         " the cache enabled first.")
+
+    # We write the rows straight to the output file as they are found.
+    textIndex = TextIndex(TEXT_INDEX_FILE)
+    outputBuilder = ResultBuilder(['Record ID', 'Name of Institution',
+                                   'Key Information', 'Sentence Cont' +
+                                   'aining Key Information'], arguments.output)
+    for record, institutionName, pageNumber, keyInformation, sentence in \
+            textIndex.search(getKeywords(arguments), arguments.start,
+                             arguments.end, arguments.source,
+                             not arguments.no_dates):
+        outputBuilder.add(record, institutionName, keyInformation, sentence)
+    outputBuilder.writeCSV()
+    textIndex.close()
+    print(str(len(outputBuilder)) + " rows were found. Please open the " +
+          arguments.output + " file to see them.")
+
+
+# This function is used to run the command given by the list of command line
+# arguments provided, which defaults to the arguments of the program.
+def main(argv=None):
+    arguments = buildParser().parse_args(argv)
+
+    # We configure the caches and the workspace of the run.
+    stateFile = configureCaches(None if arguments.no_cache else
+                                arguments.cache_directory)
+    if arguments.scratch_directory is not None:
+        import Workspace
+        Workspace.SCRATCH_DIRECTORY = arguments.scratch_directory
+
+    # The run is measured and profiled if a report or a profile is requested.
+    from Instrumentation import profileRun, reportRun
+    with reportRun(arguments.report, {"command": arguments.command,
+                                      "version": __version__}), \
+            profileRun(arguments.profile):
+        if arguments.command == "any":
+            runAny(arguments, stateFile)
+        elif arguments.command == "search":
+            runSearch(arguments)
+        else:
+            runRegulator(REGULATOR_COMMANDS[arguments.command], arguments,
+                         stateFile)
+    if arguments.report is not None:
+        print("The report of the run was written to " + arguments.report +
+              ".")
+    return 0
+
+
+# This is the main part of the program.
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+SHARED DOWNLOAD CACHE
+
+A persistent cache of the documents downloaded from the regulators. Every file
+is stored once under the SHA-256 hash of its content, and a manifest maps each
+normalized URL to the hash of its content together with the ETag and
+Last-Modified headers returned by the server. This allows a download to be
+revalidated with a conditional request, which the server answers with a short
+304 Not Modified response instead of the whole file when it has not changed.
+A file from a server that sends neither header cannot be revalidated, so it is
+used without contacting the server for a while instead of being downloaded on
+every run. Entries that have not been used for a while, or that push the cache over its
+size limit, are evicted starting with the least recently used one.
+"""
+
+# Importing the previously installed libraries.
+import os
+import json
+import time
+import shutil
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from Workspace import getTemporaryFileName
+
+
+# This function is used to normalize the URL provided as an argument so that
+# different spellings of the same link share one cache entry. The scheme and
+# the host are lowercased, default ports and fragments are removed and the
+# query parameters are sorted.
+def normalizeURL(link):
+
+    # This variable stores the different parts of the URL.
+    parts = urlsplit(link.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+
+    # We keep the port only if it is not the default port for the scheme.
+    if parts.port and (scheme, parts.port) not in (("http", 80),
+                                                   ("https", 443)):
+        host += ":" + str(parts.port)
+
+    # We sort the query parameters so their order does not matter.
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class DownloadCache:
+
+    # This function is used to open the cache stored in the directory provided
+    # as an argument. The cache is limited to maximumBytes bytes and entries
+    # that have not been used for maximumAge seconds are evicted. An entry
+    # downloaded or revalidated less than freshFor seconds ago is used without
+    # contacting the server at all, and so is an entry without an ETag or a
+    # Last-Modified header downloaded less than unvalidatedFreshFor seconds ago.
+    def __init__(self, directory, maximumBytes=5 * 1024 ** 3,
+                 maximumAge=90 * 24 * 3600, freshFor=0,
+                 unvalidatedFreshFor=7 * 24 * 3600):
+        self.directory = directory
+        self.maximumBytes = maximumBytes
+        self.maximumAge = maximumAge
+        self.freshFor = freshFor
+        self.unvalidatedFreshFor = unvalidatedFreshFor
+
+        # This variable stores the path to the manifest of the cache.
+        self.manifestFile = os.path.join(directory, "manifest.json")
+
+        # The lock protects the manifest when several threads download at the
+        # same time.
+        self.lock = threading.RLock()
+        self.lastSave = 0
+        self.dirty = False
+
+        # We load the manifest of a previous run if there is one.
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.manifest = {}
+        if os.path.exists(self.manifestFile):
+            with open(self.manifestFile) as file:
+                self.manifest = json.load(file)
+
+    # This function is used to find the path where the content with the hash
+    # provided as an argument is stored.
+    def getObjectPath(self, sha256):
+        return os.path.join(self.directory, "objects", sha256[:2], sha256)
+
+    # This function is used to find the manifest entry of the link provided as
+    # an argument. It returns None if the link is not cached or its content has
+    # been removed from the disk.
+    def getEntry(self, link):
+        with self.lock:
+            entry = self.manifest.get(normalizeURL(link))
+            if entry is None or not os.path.exists(
+                    self.getObjectPath(entry["sha256"])):
+                return None
+            return entry
+
+    # This function is used to check if the link provided as an argument was
+    # downloaded or revalidated recently enough to be used without contacting
+    # the server. An entry that the server gave no validators for cannot be
+    # revalidated, so it is kept for longer.
+    def isFresh(self, link):
+        entry = self.getEntry(link)
+        if entry is None:
+            return False
+        freshFor = self.freshFor
+        if not entry.get("etag") and not entry.get("lastModified"):
+            freshFor = max(freshFor, self.unvalidatedFreshFor)
+        return time.time() - entry["validated"] < freshFor
+
+    # This function is used to obtain the headers of a conditional request for
+    # the link provided as an argument, so that the server only sends the file
+    # again if it has changed.
+    def getConditionalHeaders(self, link):
+        entry = self.getEntry(link)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+        return headers
+
+    # This function is used to add the downloaded file provided as an argument
+    # to the cache. The file is moved into the cache under the hash of its
+    # content, so identical documents behind different links are only stored
+    # once. If a file name is provided, the content is also copied to it before
+    # another thread can evict the new entry.
+    def store(self, link, downloadedFile, sha256, headers, fileName=None):
+        with self.lock:
+
+            # We make room for the new entry first.
+            self.evict()
+
+            # We move the file into the cache unless the same content is
+            # already stored.
+            objectPath = self.getObjectPath(sha256)
+            os.makedirs(os.path.dirname(objectPath), exist_ok=True)
+            if os.path.exists(objectPath):
+                os.remove(downloadedFile)
+            else:
+                os.replace(downloadedFile, objectPath)
+
+            # We record the content and the validators of the link, whose
+            # previous content is deleted once no other link refers to it.
+            now = time.time()
+            previousEntry = self.manifest.get(normalizeURL(link))
+            self.manifest[normalizeURL(link)] = {
+                "sha256": sha256, "size": os.path.getsize(objectPath),
+                "etag": headers.get("ETag"),
+                "lastModified": headers.get("Last-Modified"),
+                "validated": now, "used": now}
+            if previousEntry is not None and \
+                    previousEntry["sha256"] != sha256:
+                self.removeUnreferencedObjects([previousEntry["sha256"]])
+            self.dirty = True
+            self.save(force=False)
+            if fileName is not None:
+                self.copyTo(link, fileName)
+
+    # This function is used to record that the server confirmed that the cached
+    # content of the link provided as an argument is still up to date, and to
+    # copy it to the given file name. Both are done before another thread can
+    # evict the entry. It returns the size of the content, or None if the entry
+    # was evicted since the request was sent, in which case the file should be
+    # downloaded again.
+    def revalidate(self, link, fileName):
+        with self.lock:
+            entry = self.getEntry(link)
+            if entry is None:
+                return None
+            entry["validated"] = time.time()
+            self.dirty = True
+            self.save(force=False)
+            return self.copyTo(link, fileName)
+
+    # This function is used to copy the cached content of the link provided as
+    # an argument to the given file name. A hard link is used when possible so
+    # that the file is not copied at all. The content is copied before another
+    # thread can evict it. It returns the size of the content, or None if the
+    # link is not cached.
+    def copyTo(self, link, fileName):
+        with self.lock:
+            entry = self.getEntry(link)
+            if entry is None:
+                return None
+            entry["used"] = time.time()
+            self.dirty = True
+            objectPath = self.getObjectPath(entry["sha256"])
+
+            # We replace the file atomically so readers never see half a file.
+            temporaryFileName = getTemporaryFileName(fileName)
+            os.remove(temporaryFileName)
+            try:
+                os.link(objectPath, temporaryFileName)
+            except OSError:
+                shutil.copyfile(objectPath, temporaryFileName)
+            os.replace(temporaryFileName, fileName)
+            return entry["size"]
+
+    # This function is used to remove the entries that have not been used for
+    # longer than the maximum age, and then the least recently used entries
+    # until the cache fits in its size limit. The content of an entry is only
+    # deleted once no other link refers to it.
+    def evict(self):
+        with self.lock:
+            now = time.time()
+
+            # This dictionary stores how many links refer to each content.
+            references = Counter(entry["sha256"]
+                                 for entry in self.manifest.values())
+
+            # We remove the entries that are too old.
+            for key in [key for key, entry in self.manifest.items()
+                        if now - entry["used"] > self.maximumAge]:
+                references[self.manifest.pop(key)["sha256"]] -= 1
+
+            # This variable stores the size of all the content still referred
+            # to.
+            totalBytes = sum({entry["sha256"]: entry["size"] for entry in
+                              self.manifest.values()}.values())
+
+            # We remove the least recently used entries until the cache fits.
+            if totalBytes > self.maximumBytes:
+                for key in sorted(self.manifest,
+                                  key=lambda key: self.manifest[key]["used"]):
+                    if totalBytes <= self.maximumBytes:
+                        break
+                    entry = self.manifest.pop(key)
+                    references[entry["sha256"]] -= 1
+                    if references[entry["sha256"]] == 0:
+                        totalBytes -= entry["size"]
+
+            # We delete the content that is no longer referred to, including
+            # any content an earlier run left behind without an entry, so that
+            # everything on the disk counts towards the size limit.
+            self.removeUnreferencedObjects()
+
+            self.dirty = True
+
+    # This function is used to delete the content with the hashes provided as
+    # an argument that no link refers to any more. If no hashes are provided,
+    # every stored content is checked.
+    def removeUnreferencedObjects(self, listOfHashes=None):
+        with self.lock:
+            references = set(entry["sha256"]
+                             for entry in self.manifest.values())
+            if listOfHashes is None:
+                objectsDirectory = os.path.join(self.directory, "objects")
+                listOfHashes = [sha256 for folder in os.listdir(
+                                    objectsDirectory)
+                                for sha256 in os.listdir(os.path.join(
+                                    objectsDirectory, folder))]
+            for sha256 in listOfHashes:
+                objectPath = self.getObjectPath(sha256)
+                if sha256 not in references and os.path.exists(objectPath):
+                    os.remove(objectPath)
+
+    # This function is used to write the manifest to disk. Unless force is
+    # True, the manifest is written at most once every few seconds so that large
+    # runs do not spend their time rewriting it.
+    def save(self, force=True):
+        with self.lock:
+            if not self.dirty or (not force and time.time() - self.lastSave < 5):
+                return
+            temporaryFileName = getTemporaryFileName(self.manifestFile)
+            with open(temporaryFileName, 'w') as file:
+                json.dump(self.manifest, file)
+            os.replace(temporaryFileName, self.manifestFile)
+            self.lastSave = time.time()
+            self.dirty = False
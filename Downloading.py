@@ -0,0 +1,315 @@
+"""
+SHARED DOWNLOADING
+
+Helpers used by both the generalised code and the code specific for each
+regulator to download the documents of the regulators. Every host (occ.gov,
+orders.fdic.gov, federalreserve.gov, ...) gets its own pooled session so that
+connections are kept alive and reused, the number of downloads running against
+the same host at the same time is limited, failed requests are retried with an
+exponential backoff and response bodies are streamed to disk in chunks. The
+downloaded files are kept in a persistent download cache and revalidated with
+conditional requests, so a file that has not changed is not downloaded again.
+The time spent downloading, the bytes downloaded and the hits of the download
+cache are added to the run report of Instrumentation. requests and Beautiful
+Soup are only imported once something is downloaded.
+"""
+
+# Importing the previously installed libraries.
+import os
+import time
+import atexit
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+from DownloadCache import DownloadCache
+from Instrumentation import count, inCurrentRecord, stage
+from Workspace import getTemporaryFileName
+
+
+# This variable stores the connect and read timeouts (in seconds) used for every
+# request.
+TIMEOUT = (10, 60)
+
+# This variable stores how many times a failed request is attempted again.
+RETRIES = 3
+
+# This variable stores the delay (in seconds) before the first retry. The delay
+# doubles with every retry.
+BACKOFF = 1.0
+
+# This variable stores the maximum number of requests sent to the same host at
+# the same time.
+PER_HOST_LIMIT = 4
+
+# This variable stores the size (in bytes) of the chunks written to disk.
+CHUNK_SIZE = 64 * 1024
+
+# This variable stores the directory of the download cache. Setting it to None
+# disables the cache.
+CACHE_DIRECTORY = os.path.join(".cache", "downloads")
+
+# These dictionaries store the session and the concurrency limit of every host.
+# The lock protects them when several threads see a new host at the same time.
+sessions = {}
+hostLimits = {}
+hostLock = threading.Lock()
+
+# This variable stores the download cache once it has been opened.
+downloadCache = None
+
+
+# This function is used to open the download cache the first time it is needed.
+# It returns None if the cache is disabled.
+def getDownloadCache():
+    global downloadCache
+    with hostLock:
+        if downloadCache is None and CACHE_DIRECTORY is not None:
+            downloadCache = DownloadCache(CACHE_DIRECTORY)
+
+            # We make sure the manifest is written when the program ends.
+            atexit.register(downloadCache.save)
+        return downloadCache
+
+
+# This function is used to obtain the pooled session and the semaphore that
+# limits the concurrency for the host of the link provided as an argument.
+def getSession(link):
+    import requests
+
+    # This variable stores the host the link points to.
+    host = urlsplit(link).netloc.lower()
+
+    with hostLock:
+        if host not in sessions:
+
+            # Each host gets a session whose connection pool is as large as the
+            # number of requests we allow to run against it at the same time.
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=PER_HOST_LIMIT)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            sessions[host] = session
+            hostLimits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+
+        return sessions[host], hostLimits[host]
+
+
+# This function is used to decide if a failed request is worth attempting
+# again. Network errors and server side errors usually are, whereas client
+# errors such as a missing file are not.
+def isRetryable(error):
+    import requests
+    if isinstance(error, requests.HTTPError):
+        return (error.response is not None and
+                (error.response.status_code >= 500 or
+                 error.response.status_code == 429))
+    return isinstance(error, requests.RequestException)
+
+
+# This function is used to send a GET request for the link provided as an
+# argument and pass the response to the function handleResponse. The request is
+# sent through the pooled session of the host, waits for a free slot of the
+# host and is attempted again with an exponential backoff if it fails. It
+# returns the result of handleResponse together with the number of attempts.
+# Extra headers, such as those of a conditional request, can be provided.
+def requestWithRetries(link, handleResponse, stream=False, headers=None):
+
+    # This variable stores the session and the concurrency limit of the host.
+    session, hostLimit = getSession(link)
+
+    # We attempt the request until it succeeds or we run out of retries.
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with hostLimit:
+                with session.get(link, timeout=TIMEOUT, stream=stream,
+                                 headers=headers) as response:
+                    response.raise_for_status()
+                    return handleResponse(response), attempt
+        except Exception as error:
+            if attempt > RETRIES or not isRetryable(error):
+                raise
+            time.sleep(BACKOFF * 2 ** (attempt - 1))
+
+
+# This dictionary stores the counter of the run report incremented for every
+# status of the download cache.
+CACHE_COUNTERS = {"fresh": "downloadCacheFresh",
+                  "revalidated": "downloadCacheRevalidated",
+                  "miss": "downloadCacheMisses"}
+
+
+# This function is used to download the file at the link provided as an argument
+# and save it using the given file name, like transferFile does, while adding
+# the time spent, the bytes downloaded and the status of the download cache to
+# the run report.
+def downloadFile(link, fileName):
+    with stage("download"):
+        timing = transferFile(link, fileName)
+    count("downloadedFiles")
+    count("bytesDownloaded", timing["bytes"])
+    if getDownloadCache() is not None:
+        count(CACHE_COUNTERS[timing["cache"]])
+    return timing
+
+
+# This function is used to download the file at the link provided as an argument
+# and save it using the given file name. The body of the response is streamed
+# to a temporary file in chunks, which is only renamed to the given file name
+# once it is complete, so a failed download never leaves a truncated file
+# behind. If the download cache is enabled, a cached copy of the file is
+# revalidated with a conditional request and only downloaded again if the server
+# reports that it has changed. It returns a dictionary with the timing of the
+# download, where "cache" is "miss" for a full download, "revalidated" for a
+# cached file confirmed by the server and "fresh" for a cached file used without
+# contacting the server. If conditional is False, the file is requested without
+# a conditional request even if it is cached.
+def transferFile(link, fileName, conditional=True):
+
+    # This variable stores the time the download started.
+    startTime = time.perf_counter()
+
+    # This variable stores the download cache, if it is enabled.
+    cache = getDownloadCache()
+
+    # A recently validated file does not need to be requested at all, unless
+    # it is evicted before it can be copied.
+    if conditional and cache is not None and cache.isFresh(link):
+        numberOfBytes = cache.copyTo(link, fileName)
+        if numberOfBytes is not None:
+            return {"link": link, "file": fileName, "bytes": 0,
+                    "size": numberOfBytes, "attempts": 0, "cache": "fresh",
+                    "seconds": time.perf_counter() - startTime}
+
+    # This variable stores the headers of a conditional request if the file is
+    # cached.
+    headers = {}
+    if conditional and cache is not None:
+        headers = cache.getConditionalHeaders(link)
+
+    # This variable stores the name of the temporary file.
+    temporaryFileName = getTemporaryFileName(fileName)
+
+    # This function writes the body of the response to the temporary file and
+    # returns the number of bytes written together with the hash of the
+    # content. It returns None if the server reports that the cached copy is
+    # still up to date.
+    def saveResponse(response):
+        if response.status_code == 304:
+            return None
+        numberOfBytes = 0
+        sha256 = hashlib.sha256()
+        with open(temporaryFileName, 'wb') as file:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                file.write(chunk)
+                sha256.update(chunk)
+                numberOfBytes += len(chunk)
+        return numberOfBytes, sha256.hexdigest(), response.headers
+
+    try:
+        result, attempts = requestWithRetries(link, saveResponse, stream=True,
+                                              headers=headers)
+    except Exception:
+        if os.path.exists(temporaryFileName):
+            os.remove(temporaryFileName)
+        raise
+
+    # If the cached copy is still up to date, we use it instead. If it was
+    # evicted in the meantime, the file is requested again in full.
+    if result is None:
+        os.remove(temporaryFileName)
+        numberOfBytes = cache.revalidate(link, fileName)
+        if numberOfBytes is None:
+            return transferFile(link, fileName, conditional=False)
+        return {"link": link, "file": fileName, "bytes": 0,
+                "size": numberOfBytes, "attempts": attempts,
+                "cache": "revalidated",
+                "seconds": time.perf_counter() - startTime}
+
+    # We move the complete file to the cache and from there to its final name,
+    # or straight to its final name if the cache is disabled.
+    numberOfBytes, sha256, responseHeaders = result
+    if cache is not None:
+        cache.store(link, temporaryFileName, sha256, responseHeaders,
+                    fileName)
+    else:
+        os.replace(temporaryFileName, fileName)
+
+    return {"link": link, "file": fileName, "bytes": numberOfBytes,
+            "size": numberOfBytes, "attempts": attempts, "cache": "miss",
+            "seconds": time.perf_counter() - startTime}
+
+
+# This function is used to obtain the text of the webpage at the link provided
+# as an argument, going through the download cache if it is enabled.
+def getText(link):
+
+    # Without a cache, we simply request the webpage.
+    if getDownloadCache() is None:
+        with stage("download"):
+            text, attempts = requestWithRetries(link,
+                                                lambda response: response.text)
+        return text
+
+    # With a cache, we download the webpage to a temporary file so that it is
+    # revalidated like any other file.
+    fileDescriptor, fileName = tempfile.mkstemp(dir=CACHE_DIRECTORY)
+    os.close(fileDescriptor)
+    try:
+        downloadFile(link, fileName)
+        with open(fileName, 'rb') as file:
+            return file.read().decode("utf-8", errors="replace")
+    finally:
+        os.remove(fileName)
+
+
+# This function is used to find the links to all the PDFs available in the
+# webpage at the link provided as an argument.
+def getPDFLinks(link):
+
+    # This variable obtains the HTML code for the webpage.
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(getText(link), "html.parser")
+
+    # We make every link absolute so that it can be downloaded directly.
+    return [urljoin(link, url['href']) for url in
+            soup.select("a[href$='.pdf']")]
+
+
+# This function is used to download many files at the same time. It takes a
+# list of (link, file name) pairs and returns the timing of every download in
+# the same order. At most workers downloads run at the same time, and each host
+# is further limited by PER_HOST_LIMIT. The downloads count for the record the
+# calling thread is working on in the run report.
+def downloadFiles(listOfDownloads, workers=8):
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(inCurrentRecord(
+            lambda download: downloadFile(*download)), listOfDownloads))
+
+
+# This function is used to print a short report of the timings returned by the
+# download functions.
+def printDownloadReport(listOfTimings):
+
+    # We display the timing of every file.
+    for timing in listOfTimings:
+        print(timing["file"] + ": " + str(timing["bytes"]) + " bytes in " +
+              "%.2f" % timing["seconds"] + " seconds (" +
+              str(timing["attempts"]) + " attempt(s), cache " +
+              str(timing["cache"]) + ")")
+
+    # We display the totals for all the files.
+    print("Obtained " + str(len(listOfTimings)) + " files with " +
+          str(sum(timing["cache"] == "miss" for timing in listOfTimings)) +
+          " full downloads and a total of " +
+          str(sum(timing["bytes"] for timing in listOfTimings)) +
+          " bytes downloaded.")
+
+    # We write the manifest of the download cache now that the files are in
+    # place.
+    if getDownloadCache() is not None:
+        getDownloadCache().save()
@@ -0,0 +1,226 @@
+"""
+SHARED HITS
+
+A compact representation of the sentences with key information found in the
+pages of a document, used by both the generalised code and the code specific for
+each regulator. The text of every page is kept once in a PageText, and every hit
+only stores the offsets of its sentence and of its date in that text, the
+ordinal of its date and a reference to its keyword. The sentence and the key
+information are only turned into strings when they are written to the output,
+and dates are compared as integers instead of being parsed again with strptime.
+The hits of a document can also be held in columns with HitColumns, so that
+the date filters and the removal of repeated hits run as vectorized NumPy
+operations. NumPy is only imported when HitColumns is used.
+"""
+
+# Importing the previously installed libraries.
+from datetime import date
+from TextMatching import getDateOrdinal
+
+
+class PageText:
+    __slots__ = ("pageNumber", "text")
+
+    # This function is used to store the text of the page with the number
+    # provided as an argument. In many PDFs, at the ending of a line, if a word
+    # cannot be written fully, a 'hyphen' is added and the rest of the word is
+    # written in the next line. We are removing that.
+    def __init__(self, pageNumber, text):
+        self.pageNumber = pageNumber
+        self.text = text.replace('-\n', '')
+
+
+class Hit:
+    __slots__ = ("page", "sentenceStart", "sentenceEnd", "keyStart", "keyEnd",
+                 "dateOrdinal", "keyword")
+
+    # This function is used to create a hit in the page provided as an
+    # argument. A date is given by the offsets of its text and its ordinal, and
+    # a keyword by the keyword itself.
+    def __init__(self, page, sentenceStart, sentenceEnd, keyStart=0, keyEnd=0,
+                 dateOrdinal=None, keyword=None):
+        self.page = page
+        self.sentenceStart = sentenceStart
+        self.sentenceEnd = sentenceEnd
+        self.keyStart = keyStart
+        self.keyEnd = keyEnd
+        self.dateOrdinal = dateOrdinal
+        self.keyword = keyword
+
+    # This function is used to check if the key information is a date.
+    @property
+    def isDate(self):
+        return self.keyword is None
+
+    # This function is used to find the number of the page of the hit.
+    @property
+    def pageNumber(self):
+        return self.page.pageNumber
+
+    # This function is used to obtain the sentence containing the key
+    # information, written on a single line.
+    @property
+    def sentence(self):
+        return self.page.text[self.sentenceStart:self.sentenceEnd].replace(
+            '\n', ' ')
+
+    # This function is used to obtain the date, written on a single line, or the
+    # keyword.
+    @property
+    def keyInformation(self):
+        if self.keyword is not None:
+            return self.keyword
+        return self.page.text[self.keyStart:self.keyEnd].replace('\n', ' ')
+
+    # This function is used to obtain the date of the hit as a date object. It
+    # is None for keywords and impossible dates.
+    @property
+    def date(self):
+        if self.dateOrdinal is None:
+            return None
+        return date.fromordinal(self.dateOrdinal)
+
+    def __repr__(self):
+        return ("Hit(pageNumber=" + repr(self.pageNumber) + ", isDate=" +
+                repr(self.isDate) + ", keyInformation=" +
+                repr(self.keyInformation) + ", sentence=" +
+                repr(self.sentence) + ")")
+
+
+# This function is used to find the hits in the text of the page provided as an
+# argument using the given TextMatcher. The page can be a PageText or a tuple of
+# its page number and its text.
+def iterPageHits(page, matcher):
+    if not isinstance(page, PageText):
+        page = PageText(*page)
+    for sentenceStart, sentenceEnd, dateMatch, position in \
+            matcher.iterMatchOffsets(page.text):
+        if dateMatch is not None:
+            yield Hit(page, sentenceStart, sentenceEnd, dateMatch.start(1),
+                      dateMatch.end(1), getDateOrdinal(dateMatch))
+        else:
+            yield Hit(page, sentenceStart, sentenceEnd,
+                      keyword=matcher.listOfKeywords[position])
+
+
+# This function is used to find the hits in the texts of the pages of a
+# document provided as an argument, given in order starting from page 1.
+def iterDocumentHits(pageTexts, matcher):
+    for pageNumber, text in enumerate(pageTexts, 1):
+        yield from iterPageHits(PageText(pageNumber, text), matcher)
+
+
+# This function is used to check if a hit provided as an argument should be
+# kept when only the dates between the ordinals of the starting and ending
+# dates are wanted. Keywords are always kept. Either bound may be None.
+def isInDateRange(hit, startOrdinal=None, endOrdinal=None):
+    if hit.keyword is not None:
+        return True
+    if hit.dateOrdinal is None:
+        return False
+    return ((startOrdinal is None or hit.dateOrdinal >= startOrdinal) and
+            (endOrdinal is None or hit.dateOrdinal <= endOrdinal))
+
+
+# This variable stores the ordinal of January 1, 1970, the first day of the
+# dates used by NumPy.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class HitColumns:
+
+    # This function is used to hold the hits provided as an argument in
+    # columns, so that they can be filtered with vectorized comparisons instead
+    # of one comparison per hit. The dates are converted once into an array of
+    # NumPy dates, holding NaT for keywords and impossible dates.
+    def __init__(self, listOfHits):
+        import numpy as np
+        self.hits = listOfHits
+        numberOfHits = len(listOfHits)
+
+        # These arrays store whether every hit is a date and its date.
+        self.isDate = np.fromiter((hit.keyword is None for hit in listOfHits),
+                                  bool, numberOfHits)
+        ordinals = np.fromiter((hit.dateOrdinal or 0 for hit in listOfHits),
+                               np.int64, numberOfHits)
+        self.dates = (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+        self.dates[ordinals == 0] = np.datetime64('NaT')
+
+    # This function is used to find the number of hits.
+    def __len__(self):
+        return len(self.hits)
+
+    # This function is used to find which hits should be kept when only the
+    # dates between the starting and ending dates provided as arguments are
+    # wanted. Keywords are always kept and either date may be None. It returns
+    # an array of booleans with one entry per hit.
+    def getDateMask(self, startDate=None, endDate=None):
+        import numpy as np
+        mask = self.isDate & ~np.isnat(self.dates)
+        if startDate is not None:
+            mask &= self.dates >= np.datetime64(date.fromordinal(
+                startDate.toordinal()), 'D')
+        if endDate is not None:
+            mask &= self.dates <= np.datetime64(date.fromordinal(
+                endDate.toordinal()), 'D')
+        return mask | ~self.isDate
+
+    # This function is used to find which hits should be kept when only the
+    # dates from the year provided as an argument onwards are wanted.
+    def getYearMask(self, minimumYear):
+        return self.getDateMask(date(minimumYear, 1, 1))
+
+    # This function is used to obtain the key information and the sentence of
+    # the hits selected by the mask provided as an argument, in the order the
+    # hits were found. If deduplicate is True, a repeated combination of key
+    # information and sentence is only returned the first time it appears.
+    def getRows(self, mask, deduplicate=False):
+        import numpy as np
+        listOfRows = [[self.hits[i].keyInformation, self.hits[i].sentence]
+                      for i in np.flatnonzero(mask)]
+        if deduplicate and listOfRows:
+            keys = np.array([keyInformation + "\0" + sentence for
+                             keyInformation, sentence in listOfRows],
+                            dtype=object)
+            uniqueKeys, firstPositions = np.unique(keys, return_index=True)
+            listOfRows = [listOfRows[i] for i in np.sort(firstPositions)]
+        return listOfRows
+
+
+# This function is used to count how many times each value in the list provided
+# as an argument appears, for instance to group the rows of the output by
+# institution. If a list of weights is provided, every value is counted as many
+# times as its weight, so that a record adds all its rows at once. It returns a
+# dictionary mapping every value to its count, from the largest count to the
+# smallest.
+def countByValue(listOfValues, listOfWeights=None):
+    import numpy as np
+    if len(listOfValues) == 0:
+        return {}
+    values, inverse = np.unique(np.array([str(value) for value in
+                                          listOfValues], dtype=object),
+                                return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=listOfWeights,
+                         minlength=len(values))
+    return {values[i]: int(counts[i]) for i in np.argsort(-counts,
+                                                          kind="stable")}
+
+
+# This function is used to display the institutions with the most rows in the
+# output, grouping the rows by institution. The institution of every record is
+# provided as a list, together with the number of rows every record added to
+# the output, or every institution is counted once per row if no counts are
+# provided.
+def printInstitutionSummary(listOfInstitutions, listOfRowCounts=None,
+                            numberOfInstitutions=5):
+    rowsByInstitution = [(institutionName, rowCount) for institutionName,
+                         rowCount in countByValue(listOfInstitutions,
+                                                  listOfRowCounts).items()
+                         if rowCount > 0]
+    if rowsByInstitution == []:
+        return
+    print(str(len(rowsByInstitution)) + " institutions have rows in the outp" +
+          "ut. The most rows were found for " +
+          "; ".join(institutionName + " (" + str(rowCount) + ")" for
+                    institutionName, rowCount in
+                    rowsByInstitution[:numberOfInstitutions]) + ".")
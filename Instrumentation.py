@@ -0,0 +1,355 @@
+"""
+SHARED INSTRUMENTATION
+
+Timers and counters used by both the generalised code and the code specific
+for each regulator to record where a run spends its time. Every stage of the
+pipeline (reading the data, downloading, reading the text layer, looking pages
+up in the OCR cache, rendering, OCR, matching, indexing and writing the output)
+is timed in wall-clock time and in CPU time, and counters record the pages
+processed, the bytes downloaded and the hits and misses of the caches. Every
+measurement is also added to the record it was made for and to the regulator
+of that record, so a slow record or regulator can be found. Nothing is recorded
+unless a report has been started, so the stages cost almost nothing otherwise.
+
+The stages run by the worker processes are measured there and sent back with
+their results, and are then added to the record of their document in the main
+process. The wall-clock time of a stage is therefore summed over every thread
+and process that ran it, and can be larger than the wall-clock time of the run.
+
+The report of a run is written as a JSON file together with the peak memory
+used by the main process and by the largest worker process. A profile of the
+main process can also be written using cProfile, which can be read with pstats
+or a viewer such as snakeviz.
+"""
+
+# Importing the previously installed libraries.
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from Workspace import getTemporaryFileName
+
+
+# This variable stores the version of the layout of the run report.
+REPORT_VERSION = 1
+
+# This variable stores the report of the run of this process, if one has been
+# started.
+report = None
+
+# This variable stores the record and the regulator the current thread is
+# working on.
+currentRecord = threading.local()
+
+
+# This function is used to create the totals of a run, a record or a regulator.
+def newTotals():
+    return {"stages": {}, "counters": {}}
+
+
+# This function is used to add the wall-clock time and the CPU time of a stage
+# provided as arguments to the given totals.
+def addStage(totals, stage, wallTime, cpuTime, calls=1):
+    entry = totals["stages"].get(stage)
+    if entry is None:
+        entry = totals["stages"][stage] = {"calls": 0, "wallTime": 0.0,
+                                           "cpuTime": 0.0}
+    entry["calls"] += calls
+    entry["wallTime"] += wallTime
+    entry["cpuTime"] += cpuTime
+
+
+# This function is used to add the value provided as an argument to a counter
+# of the given totals.
+def addCount(totals, counter, value):
+    totals["counters"][counter] = totals["counters"].get(counter, 0) + value
+
+
+# This function is used to divide two numbers, returning None instead of
+# dividing by zero.
+def getRatio(numerator, denominator):
+    return numerator / denominator if denominator else None
+
+
+# This function is used to summarize the totals provided as an argument with
+# the number of pages processed, the bytes downloaded and the hit rates of the
+# caches, which are None when a cache was not used.
+def summarizeTotals(totals):
+    counters = totals["counters"]
+    downloadHits = (counters.get("downloadCacheFresh", 0) +
+                    counters.get("downloadCacheRevalidated", 0))
+    ocrHits = counters.get("ocrCacheHits", 0)
+    return {"pages": (counters.get("textLayerPages", 0) + ocrHits +
+                      counters.get("ocrPages", 0)),
+            "bytesDownloaded": counters.get("bytesDownloaded", 0),
+            "cacheHitRates": {
+                "download": getRatio(downloadHits, downloadHits +
+                                     counters.get("downloadCacheMisses", 0)),
+                "ocr": getRatio(ocrHits, ocrHits + counters.get("ocrPages",
+                                                                0))},
+            "stages": totals["stages"], "counters": counters}
+
+
+# This function is used to find the peak memory (in bytes) used by this process,
+# or by the largest of its worker processes that have finished if children is
+# True. It returns None on systems that do not report it.
+def getPeakMemory(children=False):
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else
+                              resource.RUSAGE_SELF).ru_maxrss
+
+    # The peak is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RunReport:
+
+    # This function is used to start the report of a run. The details provided
+    # as a dictionary, such as the command that was run, are copied to the
+    # report.
+    def __init__(self, details=None):
+
+        # The lock protects the totals when several threads add to them.
+        self.lock = threading.Lock()
+        self.details = dict(details or {})
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.startTime = time.perf_counter()
+        self.startCPUTime = time.process_time()
+        self.startWorkerCPUTime = sum(os.times()[2:4])
+
+        # These dictionaries store the totals of the run, of every record and
+        # of every regulator, and the record every document belongs to.
+        self.totals = newTotals()
+        self.records = {}
+        self.regulators = {}
+        self.documentRecords = {}
+
+    # This function is used to find the totals that a measurement of the
+    # document provided as an argument is added to: the totals of the run, and
+    # those of its record and regulator. A document that was not registered is
+    # counted for the record the current thread is working on. The lock should
+    # already be held.
+    def getTotals(self, document=None):
+        record = self.documentRecords.get(document)
+        if record is None:
+            record = getattr(currentRecord, "value", None)
+        if record is None:
+            return [self.totals]
+        uniqueID, regulatorName = record
+        recordTotals = self.records.get(uniqueID)
+        if recordTotals is None:
+            recordTotals = self.records[uniqueID] = newTotals()
+            recordTotals["regulator"] = regulatorName
+        if regulatorName is None:
+            return [self.totals, recordTotals]
+        regulatorTotals = self.regulators.get(regulatorName)
+        if regulatorTotals is None:
+            regulatorTotals = self.regulators[regulatorName] = newTotals()
+        return [self.totals, recordTotals, regulatorTotals]
+
+    # This function is used to record that the document provided as an
+    # argument, which is either the name of a PDF or a tuple of the names of
+    # its parts, belongs to the record with the given unique ID and regulator.
+    def setDocumentRecord(self, document, uniqueID, regulatorName=None):
+        parts = [document] if isinstance(document, str) else list(document)
+        with self.lock:
+            for part in parts:
+                self.documentRecords[part] = (str(uniqueID), regulatorName)
+
+    # This function is used to add the time spent in a stage of the document
+    # provided as an argument.
+    def addStage(self, stage, wallTime, cpuTime, document=None):
+        with self.lock:
+            for totals in self.getTotals(document):
+                addStage(totals, stage, wallTime, cpuTime)
+
+    # This function is used to add a value to a counter of the document
+    # provided as an argument.
+    def addCount(self, counter, value, document=None):
+        with self.lock:
+            for totals in self.getTotals(document):
+                addCount(totals, counter, value)
+
+    # This function is used to add the totals measured by a worker process for
+    # the document provided as an argument.
+    def addTotals(self, workerTotals, document=None):
+        with self.lock:
+            for totals in self.getTotals(document):
+                for stage, entry in workerTotals["stages"].items():
+                    addStage(totals, stage, entry["wallTime"],
+                             entry["cpuTime"], entry["calls"])
+                for counter, value in workerTotals["counters"].items():
+                    addCount(totals, counter, value)
+
+    # This function is used to obtain the report as a dictionary that can be
+    # written as JSON.
+    def getSummary(self):
+        with self.lock:
+            wallTime = time.perf_counter() - self.startTime
+            summary = {"version": REPORT_VERSION, "details": self.details,
+                       "started": self.started,
+                       "finished": datetime.now().isoformat(
+                           timespec="seconds"),
+                       "wallTime": wallTime,
+                       "cpuTime": time.process_time() - self.startCPUTime,
+                       "workerCPUTime": (sum(os.times()[2:4]) -
+                                         self.startWorkerCPUTime),
+                       "peakMemory": {"mainProcess": getPeakMemory(),
+                                      "largestWorker": getPeakMemory(True)}}
+            summary.update(summarizeTotals(self.totals))
+            summary["pagesPerSecond"] = getRatio(summary["pages"], wallTime)
+            summary["regulators"] = {regulatorName: summarizeTotals(totals)
+                                     for regulatorName, totals in
+                                     self.regulators.items()}
+            summary["records"] = {uniqueID: dict(summarizeTotals(totals),
+                                                 regulator=totals["regulator"])
+                                  for uniqueID, totals in self.records.items()}
+        return summary
+
+    # This function is used to write the report to the JSON file with the name
+    # provided as an argument. The file is written under a temporary name and
+    # only renamed once it is complete.
+    def write(self, fileName):
+        temporaryFileName = getTemporaryFileName(fileName)
+        with open(temporaryFileName, 'w', encoding='utf-8') as file:
+            json.dump(self.getSummary(), file, indent=2)
+        os.replace(temporaryFileName, fileName)
+
+
+# This function is used to time a stage of the pipeline, which is the code run
+# inside the with statement using this function. The time is added to the
+# record of the document provided as an argument, or to the record the current
+# thread is working on. Nothing is measured if no report has been started.
+@contextmanager
+def stage(name, document=None):
+    if report is None:
+        yield
+        return
+    startTime = time.perf_counter()
+    startCPUTime = time.thread_time()
+    try:
+        yield
+    finally:
+        report.addStage(name, time.perf_counter() - startTime,
+                        time.thread_time() - startCPUTime, document)
+
+
+# This function is used to add a value to a counter, for the record of the
+# document provided as an argument or for the record the current thread is
+# working on, if a report has been started.
+def count(name, value=1, document=None):
+    if report is not None and value:
+        report.addCount(name, value, document)
+
+
+# This function is used to make every measurement made by the current thread
+# inside the with statement using this function count for the record with the
+# unique ID and the regulator provided as arguments.
+@contextmanager
+def measureRecord(uniqueID, regulatorName=None):
+    previousRecord = getattr(currentRecord, "value", None)
+    currentRecord.value = (str(uniqueID), regulatorName)
+    try:
+        yield
+    finally:
+        currentRecord.value = previousRecord
+
+
+# This function is used to wrap the function provided as an argument so that
+# the measurements it makes count for the record the current thread is working
+# on, even when it is called by another thread, such as a thread of a pool.
+def inCurrentRecord(function):
+    record = getattr(currentRecord, "value", None)
+    if record is None:
+        return function
+
+    def callInRecord(*arguments, **keywordArguments):
+        with measureRecord(*record):
+            return function(*arguments, **keywordArguments)
+    return callInRecord
+
+
+# This function is used to record that the document provided as an argument
+# belongs to the record with the given unique ID and regulator, so that the
+# measurements made for it count for that record whichever record the main
+# process is working on at the time.
+def setDocumentRecord(document, uniqueID, regulatorName=None):
+    if report is not None:
+        report.setDocumentRecord(document, uniqueID, regulatorName)
+
+
+# This function is used to run the function provided as an argument in a worker
+# process while measuring its stages. It returns the result of the function
+# together with the totals measured.
+def callMeasured(function, *arguments):
+    global report
+    report = RunReport()
+    try:
+        return function(*arguments), report.totals
+    finally:
+        report = None
+
+
+# This function is used to hand the function provided as an argument to the
+# pool of worker processes given as an executor. If a report has been started,
+# the stages of the function are measured in the worker process.
+def submitMeasured(executor, function, *arguments):
+    if report is None:
+        return executor.submit(function, *arguments)
+    future = executor.submit(callMeasured, function, *arguments)
+    future.measured = True
+    return future
+
+
+# This function is used to wait for the result of a future returned by
+# submitMeasured, adding the stages measured by the worker process to the record
+# of the document provided as an argument.
+def getMeasuredResult(future, document=None):
+    if not getattr(future, "measured", False):
+        return future.result()
+    result, workerTotals = future.result()
+    if report is not None:
+        report.addTotals(workerTotals, document)
+    return result
+
+
+# This function is used to write a report of the run made of the code inside
+# the with statement using this function to the JSON file with the name
+# provided as an argument. The report is written even if the run fails. Nothing
+# is measured if the file name is None.
+@contextmanager
+def reportRun(fileName, details=None):
+    global report
+    if fileName is None:
+        yield None
+        return
+    report = RunReport(details)
+    try:
+        yield report
+    finally:
+        runReport, report = report, None
+        runReport.write(fileName)
+
+
+# This function is used to profile the code inside the with statement using
+# this function with cProfile and write the statistics to the file with the
+# name provided as an argument. Nothing is profiled if the file name is None.
+@contextmanager
+def profileRun(fileName):
+    if fileName is None:
+        yield
+        return
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(fileName)
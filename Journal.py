@@ -0,0 +1,106 @@
+"""
+SHARED RUN JOURNAL
+
+A progress journal used by the generalised code so that a long run over
+Data.csv can be interrupted and resumed without losing the work already done.
+The journal is a text file with one JSON entry per line. The first entry
+records the filters of the run, and every following entry records a Record ID
+that has been processed together with the rows it contributed to the output,
+or the error that made it fail. Every entry is flushed to disk as soon as it is
+written, so after a crash only the record that was being processed is lost. A
+run resumed from the journal skips the records already completed and retries
+the ones that failed. A journal written by a run with different filters, or
+over different files, is started again instead of being resumed.
+"""
+
+# Importing the previously installed libraries.
+import os
+import json
+
+
+class RunJournal:
+
+    # This function is used to open the journal stored in the file provided as
+    # an argument for a run with the given filters, which should be a
+    # dictionary that can be written as JSON. The entries of an earlier run are
+    # loaded if the journal exists. A journal written for different filters
+    # cannot be resumed, so it is started again.
+    def __init__(self, journalFile, filters):
+        self.journalFile = journalFile
+
+        # This dictionary maps the Record ID of every completed record to the
+        # rows it contributed to the output, and this one maps the Record ID of
+        # every failed record to its error.
+        self.completedRecords = {}
+        self.failedRecords = {}
+
+        # We load the entries of an earlier run. A line left incomplete by a
+        # crash is ignored, unless it is the line recording the filters.
+        isNew = not os.path.exists(journalFile) or \
+            os.path.getsize(journalFile) == 0
+        if not isNew:
+            with open(journalFile, encoding='utf-8') as file:
+                for lineNumber, line in enumerate(file):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        entry = None
+                    if lineNumber == 0:
+                        if entry is None or entry.get("filters") != filters:
+                            print("The journal " + journalFile + " was writ" +
+                                  "ten for different filters or files, so it" +
+                                  " is started again.")
+                            isNew = True
+                            break
+                    elif entry is None:
+                        continue
+                    elif entry["status"] == "done":
+                        self.completedRecords[entry["record"]] = entry["rows"]
+                        self.failedRecords.pop(entry["record"], None)
+                    else:
+                        self.failedRecords[entry["record"]] = entry["error"]
+
+        # We open the journal for appending and record the filters of a new
+        # run, replacing a journal that cannot be resumed. An incomplete last
+        # line is ended first so that it does not spoil the next entry.
+        self.file = open(journalFile, 'w' if isNew else 'a', encoding='utf-8')
+        if isNew:
+            self.write({"filters": filters})
+        else:
+            with open(journalFile, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    self.file.write("\n")
+
+    # This function is used to add the entry provided as an argument to the
+    # journal and make sure it reaches the disk.
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    # This function is used to record that the record with the Record ID
+    # provided as an argument has been processed, along with the rows it
+    # contributed to the output.
+    def recordSuccess(self, recordID, rows):
+        rows = [list(row) for row in rows]
+        self.write({"record": recordID, "status": "done", "rows": rows})
+        self.completedRecords[recordID] = rows
+        self.failedRecords.pop(recordID, None)
+
+    # This function is used to record that the record with the Record ID
+    # provided as an argument could not be processed because of the given
+    # error.
+    def recordFailure(self, recordID, error):
+        self.write({"record": recordID, "status": "failed",
+                    "error": repr(error)})
+        self.failedRecords[recordID] = repr(error)
+
+    # This function is used to close the journal. If remove is True, the
+    # journal is deleted, which is done once a run has completed every record.
+    def close(self, remove=False):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if remove and os.path.exists(self.journalFile):
+            os.remove(self.journalFile)
@@ -0,0 +1,180 @@
+"""
+SHARED OCR CACHE
+
+A persistent cache of the text recognized from the pages of the PDFs, stored in
+a SQLite database. Every entry is keyed by the SHA-256 hash of the content of
+the PDF, the page number, the resolution the page was rendered at and the
+settings of the OCR engine, so a page is only recognized again if the document
+itself or the way it is recognized changes. Changing the filters of a run, such
+as the dates or the keywords, therefore never requires a page to be rendered or
+recognized again. Once the cache grows beyond its size limit, the least recently
+used pages are evicted. The size of the cache is kept up to date by the
+database itself as pages are added and removed, so checking it after every page
+does not require reading the whole cache.
+"""
+
+# Importing the previously installed libraries.
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+# This function is used to compute the SHA-256 hash of the content of the file
+# with the name provided as an argument. The file is read in chunks so that
+# large PDFs are never held in memory.
+def getFileHash(fileName):
+    sha256 = hashlib.sha256()
+    with open(fileName, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class OCRCache:
+
+    # This function is used to open the cache stored in the database file
+    # provided as an argument. The cache is limited to maximumBytes bytes of
+    # text.
+    def __init__(self, databaseFile, maximumBytes=2 * 1024 ** 3):
+        self.maximumBytes = maximumBytes
+
+        # The lock protects the connection if the cache is shared by threads.
+        self.lock = threading.Lock()
+
+        # We create the database and its table the first time it is used.
+        directory = os.path.dirname(databaseFile)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(databaseFile,
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS pages ("
+                                "document TEXT NOT NULL, "
+                                "page INTEGER NOT NULL, "
+                                "dpi INTEGER NOT NULL, "
+                                "engine TEXT NOT NULL, "
+                                "text TEXT NOT NULL, "
+                                "size INTEGER NOT NULL, "
+                                "used REAL NOT NULL, "
+                                "PRIMARY KEY (document, page, dpi, engine))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS pagesByUse ON "
+                                "pages (used)")
+        self.connection.commit()
+
+        # The total size of the pages is kept in its own table by triggers,
+        # which also keep it right when several processes share the cache. A
+        # cache created before the total was kept is measured once, inside
+        # the same transaction that creates the triggers.
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS totals ("
+                                "name TEXT PRIMARY KEY, "
+                                "value INTEGER NOT NULL)")
+        self.connection.execute("INSERT OR IGNORE INTO totals SELECT 'size', "
+                                "COALESCE(SUM(size), 0) FROM pages")
+        self.connection.execute("CREATE TRIGGER IF NOT EXISTS pagesAdded "
+                                "AFTER INSERT ON pages BEGIN UPDATE totals "
+                                "SET value = value + new.size WHERE name = "
+                                "'size'; END")
+        self.connection.execute("CREATE TRIGGER IF NOT EXISTS pagesRemoved "
+                                "AFTER DELETE ON pages BEGIN UPDATE totals "
+                                "SET value = value - old.size WHERE name = "
+                                "'size'; END")
+        self.connection.execute("CREATE TRIGGER IF NOT EXISTS pagesReplaced "
+                                "AFTER UPDATE OF size ON pages BEGIN UPDATE "
+                                "totals SET value = value - old.size + "
+                                "new.size WHERE name = 'size'; END")
+        self.connection.commit()
+
+    # This function is used to look up the pages with the page numbers provided
+    # as an argument for the document with the given hash. It returns a
+    # dictionary mapping the page number of every cached page to its text.
+    def getPages(self, documentHash, pageNumbers, dpi, engine):
+        pageTexts = {}
+        with self.lock:
+            for pageNumber in pageNumbers:
+                row = self.connection.execute(
+                    "SELECT text FROM pages WHERE document = ? AND page = ? "
+                    "AND dpi = ? AND engine = ?",
+                    (documentHash, pageNumber, dpi, engine)).fetchone()
+                if row is not None:
+                    pageTexts[pageNumber] = row[0]
+
+            # We make a note that the cached pages have been used.
+            self.connection.executemany(
+                "UPDATE pages SET used = ? WHERE document = ? AND page = ? "
+                "AND dpi = ? AND engine = ?",
+                [(time.time(), documentHash, pageNumber, dpi, engine)
+                 for pageNumber in pageTexts])
+            self.connection.commit()
+        return pageTexts
+
+    # This function is used to add the recognized text of the pages provided
+    # as a dictionary mapping page numbers to texts for the document with the
+    # given hash. A page that is already cached is updated in place, so that
+    # the triggers keeping the size of the cache see the change.
+    def putPages(self, documentHash, pageTexts, dpi, engine):
+        with self.lock:
+            self.connection.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT "
+                "(document, page, dpi, engine) DO UPDATE SET text = "
+                "excluded.text, size = excluded.size, used = excluded.used",
+                [(documentHash, pageNumber, dpi, engine, text,
+                  len(text.encode("utf-8")), time.time())
+                 for pageNumber, text in pageTexts.items()])
+            self.connection.commit()
+        self.evict()
+
+    # This function is used to remove cached pages. Without arguments every
+    # page is removed, otherwise only the pages of the document with the given
+    # hash and/or the pages recognized with the given engine settings.
+    def invalidate(self, documentHash=None, engine=None):
+        conditions = []
+        parameters = []
+        if documentHash is not None:
+            conditions.append("document = ?")
+            parameters.append(documentHash)
+        if engine is not None:
+            conditions.append("engine = ?")
+            parameters.append(engine)
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM pages" + (" WHERE " + " AND ".join(conditions)
+                                       if conditions else ""), parameters)
+            self.connection.commit()
+
+    # This function is used to find the total size of the cached pages.
+    def getSize(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT value FROM totals WHERE name = 'size'").fetchone()[0]
+
+    # This function is used to remove the least recently used pages until the
+    # cache fits in its size limit.
+    def evict(self):
+        with self.lock:
+            totalBytes = self.connection.execute(
+                "SELECT value FROM totals WHERE name = 'size'").fetchone()[0]
+            if totalBytes <= self.maximumBytes:
+                return
+
+            # We collect the oldest pages until enough space is freed.
+            listOfKeys = []
+            for row in self.connection.execute(
+                    "SELECT document, page, dpi, engine, size FROM pages "
+                    "ORDER BY used"):
+                if totalBytes <= self.maximumBytes:
+                    break
+                listOfKeys.append(row[:4])
+                totalBytes -= row[4]
+
+            self.connection.executemany(
+                "DELETE FROM pages WHERE document = ? AND page = ? AND "
+                "dpi = ? AND engine = ?", listOfKeys)
+            self.connection.commit()
+
+    # This function is used to close the database.
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,626 @@
+"""
+SHARED PDF PROCESSING
+
+Helpers used by both the generalised code and the code specific for each
+regulator to turn the pages of a PDF into text. Born-digital pages are read
+straight from the text layer embedded in the PDF. Only the pages without a
+usable text layer are rasterized, a small window at a time, and handed to the
+OCR engine straight from memory, so the memory used while processing a document
+depends on the page window rather than on the length of the document. Several
+documents can also be processed at the same time by fanning their pages out to
+a pool of worker processes. The text recognized from every page is kept in a
+persistent OCR cache, so a page is never recognized twice.
+
+Pages are rendered in grayscale and passed to the OCR engine without being
+encoded as images first. Instead of a fixed resolution, the resolution can be
+chosen per page by passing "adaptive" as the dpi: every page is first rendered
+at the lowest resolution of DPI_LADDER and only rendered again at the next
+resolution while the confidence reported by tesseract stays below
+MINIMUM_CONFIDENCE.
+
+A document is either the name of a PDF or a tuple of the names of the PDFs
+that make it up, such as the attachments of a FED press release. The parts are
+read one after another as one document, without merging them into a new PDF,
+and their pages are numbered continuously across the parts. The OCR cache still
+keys every page by the hash of its own part and its page number within it.
+
+The time spent reading the text layers, looking pages up in the OCR cache,
+rendering and recognizing pages is added to the run report of Instrumentation,
+including the time spent by the worker processes.
+
+pytesseract, pdf2image and PyPDF2 are only imported by the functions that use
+them, so importing this module is cheap and a process that never renders or
+recognizes a page never loads the OCR stack.
+"""
+
+# Importing the previously installed libraries.
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from Instrumentation import count, getMeasuredResult, stage, submitMeasured
+from OCRCache import OCRCache, getFileHash
+
+
+# This variable stores the configuration passed to tesseract for every page.
+TESSERACT_CONFIG = ""
+
+# This variable stores the resolutions tried, from the lowest to the highest,
+# when the resolution is chosen per page.
+DPI_LADDER = (200, 300, 500)
+
+# This variable stores the average word confidence (from 0 to 100) below which
+# a page is rendered again at a higher resolution.
+MINIMUM_CONFIDENCE = 75
+
+# This variable stores whether the rendered pages are converted to black and
+# white before they are recognized, and the gray level used as the threshold.
+BINARIZE = False
+BINARIZE_THRESHOLD = 160
+
+# This variable stores the database file of the OCR cache. Setting it to None
+# disables the cache.
+OCR_CACHE_FILE = os.path.join(".cache", "ocr.sqlite3")
+
+# These variables store the OCR cache and the version of tesseract once they
+# have been looked up.
+ocrCache = None
+tesseractVersion = None
+
+
+# This function is used to open the OCR cache the first time it is needed. It
+# returns None if the cache is disabled.
+def getOCRCache():
+    global ocrCache
+    if ocrCache is None and OCR_CACHE_FILE is not None:
+        ocrCache = OCRCache(OCR_CACHE_FILE)
+    return ocrCache
+
+
+# This function is used to describe the OCR engine and its settings for the
+# resolution provided as an argument, so that pages recognized with a different
+# version of tesseract, a different configuration or a different way of
+# rendering are not taken from the OCR cache.
+def getEngineKey(dpi=500):
+    global tesseractVersion
+    if tesseractVersion is None:
+        import pytesseract
+        try:
+            tesseractVersion = str(pytesseract.get_tesseract_version())
+        except Exception:
+            tesseractVersion = "unknown"
+    engineKey = "tesseract " + tesseractVersion + " " + TESSERACT_CONFIG
+    if dpi == "adaptive":
+        engineKey += (" adaptive " + ",".join(map(str, DPI_LADDER)) + " " +
+                      str(MINIMUM_CONFIDENCE))
+    if BINARIZE:
+        engineKey += " binarized " + str(BINARIZE_THRESHOLD)
+    return engineKey
+
+
+# This function is used to find the resolution stored in the OCR cache for the
+# resolution provided as an argument, where 0 stands for the adaptive one.
+def getCacheDpi(dpi):
+    return 0 if dpi == "adaptive" else int(dpi)
+
+
+# This function is used to find the resolution the pages are first rendered at.
+def getRenderDpi(dpi):
+    return DPI_LADDER[0] if dpi == "adaptive" else dpi
+
+
+# This function is used to prepare the image of a rendered page provided as an
+# argument for OCR, converting it to black and white if BINARIZE is True.
+def preprocessImage(page):
+    if not BINARIZE:
+        return page
+    return page.convert("L").point(
+        lambda value: 255 if value > BINARIZE_THRESHOLD else 0, mode="1")
+
+
+# This function is used to recognize the text of the image of a page provided
+# as an argument using pytesseract.
+def recognizeImage(page):
+    import pytesseract
+    return str(pytesseract.image_to_string(preprocessImage(page),
+                                           config=TESSERACT_CONFIG))
+
+
+# This function is used to recognize the text of the image of a page provided
+# as an argument using pytesseract, together with the average confidence of
+# its words. The text is put back together from the words, keeping the lines
+# and leaving an empty line between paragraphs, like image_to_string does. A
+# page without any words is reported with full confidence since rendering it
+# again would not find anything either.
+def recognizeImageWithConfidence(page):
+    import pytesseract
+
+    # This dictionary stores every word found together with its position in
+    # the layout of the page and its confidence.
+    data = pytesseract.image_to_data(preprocessImage(page),
+                                     config=TESSERACT_CONFIG,
+                                     output_type=pytesseract.Output.DICT)
+
+    # These variables store the lines and paragraphs of the page, and the
+    # confidence of every word.
+    paragraphs = []
+    confidences = []
+    currentParagraph = None
+    currentLine = None
+    for i in range(len(data["text"])):
+        word = str(data["text"][i]).strip()
+        if word == "":
+            continue
+        paragraph = (data["block_num"][i], data["par_num"][i])
+        if paragraph != currentParagraph:
+            paragraphs.append([])
+            currentParagraph = paragraph
+            currentLine = None
+        if data["line_num"][i] != currentLine:
+            paragraphs[-1].append([])
+            currentLine = data["line_num"][i]
+        paragraphs[-1][-1].append(word)
+        if float(data["conf"][i]) >= 0:
+            confidences.append(float(data["conf"][i]))
+
+    # This variable stores the text of the page.
+    text = "\n\n".join("\n".join(" ".join(line) for line in lines)
+                       for lines in paragraphs)
+
+    if confidences == []:
+        return text, 100.0
+    return text, sum(confidences) / len(confidences)
+
+
+# This function is used to recognize the text of a page of the PDF with the name
+# provided as an argument, which has already been rendered at the first
+# resolution for the given dpi. With a fixed resolution, the page is simply
+# recognized. With the adaptive resolution, the page is rendered again at the
+# next resolution of DPI_LADDER while its confidence stays below
+# MINIMUM_CONFIDENCE, and the text with the best confidence is kept.
+def recognizeRenderedPage(pdf, pageNumber, page, dpi):
+    if dpi != "adaptive":
+        with stage("ocr", pdf):
+            return recognizeImage(page)
+
+    # We recognize the page at the lowest resolution first.
+    with stage("ocr", pdf):
+        text, confidence = recognizeImageWithConfidence(page)
+
+    # We try the higher resolutions only while the confidence is poor.
+    for higherDpi in DPI_LADDER[1:]:
+        if confidence >= MINIMUM_CONFIDENCE:
+            break
+        for renderedPageNumber, higherPage in iterPageImages(pdf, higherDpi, 1,
+                                                             [pageNumber]):
+            with stage("ocr", pdf):
+                higherText, higherConfidence = recognizeImageWithConfidence(
+                    higherPage)
+            if higherConfidence >= confidence:
+                text, confidence = higherText, higherConfidence
+
+    return text
+
+
+# This function is used to find the total number of pages in the PDF with the
+# name provided as an argument without rendering any of them.
+def getPageCount(pdf):
+
+    # We only read the metadata of the PDF which is much cheaper than
+    # rasterizing it.
+    from pdf2image import pdfinfo_from_path
+    return int(pdfinfo_from_path(pdf)["Pages"])
+
+
+# This function is used to rasterize the pages of the PDF with the name provided
+# as an argument. The pages are rendered pageWindow at a time and each page is
+# yielded together with its page number (starting from 1), so at most
+# pageWindow images are held in memory at the same time. If a list of page
+# numbers is provided, only those pages are rendered.
+def iterPageImages(pdf, dpi=500, pageWindow=4, pageNumbers=None):
+    from pdf2image import convert_from_path
+
+    # A page window smaller than one page would never make progress.
+    pageWindow = max(1, int(pageWindow))
+
+    # If no page numbers are provided, we render every page of the PDF.
+    if pageNumbers is None:
+        pageNumbers = range(1, getPageCount(pdf) + 1)
+
+    # We iterate through the requested pages one window at a time. A window
+    # always covers consecutive pages so that it can be rendered in one call.
+    for firstPage, lastPage in getPageWindows(pageNumbers, pageWindow):
+
+        # This variable stores the pages of the current window only.
+        with stage("render", pdf):
+            pages = convert_from_path(pdf, dpi, first_page=firstPage,
+                                      last_page=lastPage, grayscale=True)
+
+        # We hand out the pages of the window one after another and release
+        # each image as soon as the caller is done with it.
+        for offset, page in enumerate(pages):
+            yield firstPage + offset, page
+            page.close()
+
+        # We drop the window before rendering the next one.
+        del pages
+
+
+# This function is used to group the page numbers provided as an argument into
+# windows of consecutive pages holding at most pageWindow pages each. Every
+# window is returned as a tuple of its first and last page.
+def getPageWindows(pageNumbers, pageWindow):
+
+    # This list stores the windows we have found so far.
+    windows = []
+
+    # We iterate through the page numbers in ascending order.
+    for pageNumber in sorted(pageNumbers):
+
+        # We extend the current window if the page follows straight after it
+        # and the window is not full yet, otherwise we start a new window.
+        if (windows and windows[-1][1] == pageNumber - 1 and
+                pageNumber - windows[-1][0] < pageWindow):
+            windows[-1] = (windows[-1][0], pageNumber)
+        else:
+            windows.append((pageNumber, pageNumber))
+
+    return windows
+
+
+# This function is used to decide if the text read from the text layer of a
+# page is good enough to be used instead of recognizing the page using OCR.
+# Scanned pages usually have no text layer at all, and broken text layers tend
+# to contain very few words, words glued together or mostly non-letters.
+def isTextLayerUsable(text, minimumWords=10, maximumAverageWordLength=15,
+                      minimumLetterRatio=0.6):
+
+    # This variable stores the words found in the text.
+    words = text.split()
+
+    # We reject pages that have (almost) no text.
+    if len(words) < minimumWords:
+        return False
+
+    # We reject pages where the spaces between the words have been lost.
+    if sum(len(word) for word in words) / len(words) > maximumAverageWordLength:
+        return False
+
+    # We reject pages that mostly contain symbols instead of letters.
+    characters = "".join(words)
+    letters = sum(character.isalpha() for character in characters)
+    return letters / len(characters) >= minimumLetterRatio
+
+
+# This function is used to read the text layer of every page of the PDF with
+# the name provided as an argument. It returns a list with the text of each page
+# in order, using an empty string for pages whose text could not be parsed.
+def getTextLayer(pdf):
+
+    from PyPDF2 import PdfFileReader
+
+    # This list stores the text of each page.
+    pageTexts = []
+
+    # We open the PDF in a binary-read mode.
+    with open(pdf, 'rb') as file:
+        reader = PdfFileReader(file, strict=False)
+
+        # We iterate through all the pages in the PDF.
+        for i in range(reader.getNumPages()):
+
+            # A damaged page should only send that page to OCR instead of
+            # stopping the whole document. Errors of the operating system,
+            # such as a file that cannot be read, are not about the text layer.
+            try:
+                pageTexts.append(reader.getPage(i).extractText() or "")
+            except OSError:
+                raise
+            except Exception:
+                pageTexts.append("")
+
+    return pageTexts
+
+
+# This function is used to read the text layer of the PDF with the name provided
+# as an argument, if useTextLayer is True. It always returns one entry per page,
+# using an empty string for every page when the text layer is not used or the
+# PDF cannot be parsed by PyPDF2, whatever its error, so those pages are
+# recognized using OCR. Only errors of the operating system, such as a missing
+# or unreadable file, are raised.
+def readTextLayer(pdf, useTextLayer=True):
+
+    with stage("textLayer", pdf):
+
+        # This list stores the text layer of each page.
+        pageTexts = []
+        if useTextLayer:
+            try:
+                pageTexts = getTextLayer(pdf)
+            except OSError:
+                raise
+            except Exception:
+                pageTexts = []
+
+        # If the text layer could not be read, we still need the number of
+        # pages.
+        if pageTexts == []:
+            pageTexts = [""] * getPageCount(pdf)
+
+    return pageTexts
+
+
+# This function is used to find the page numbers of the pages whose text layer
+# is not usable and that therefore need to be recognized using OCR. The text of
+# the pages found in the OCR cache is filled into the list of page texts
+# straight away, so only the remaining pages are returned together with the
+# hash of the PDF. It also adds the number of pages that took each path to the
+# pageCounts dictionary if one is provided.
+def getPagesForOCR(pdf, pageTexts, dpi=500, pageCounts=None):
+
+    # This list stores the page numbers that need to be recognized using OCR.
+    pagesForOCR = [i + 1 for i in range(len(pageTexts))
+                   if not isTextLayerUsable(pageTexts[i])]
+
+    # This variable stores the number of pages read from their text layer.
+    numberOfTextPages = len(pageTexts) - len(pagesForOCR)
+
+    # We look up the remaining pages in the OCR cache.
+    documentHash = None
+    cachedPages = {}
+    if pagesForOCR and getOCRCache() is not None:
+        with stage("ocrCache", pdf):
+            documentHash = getFileHash(pdf)
+            cachedPages = getOCRCache().getPages(documentHash, pagesForOCR,
+                                                 getCacheDpi(dpi),
+                                                 getEngineKey(dpi))
+        for pageNumber, text in cachedPages.items():
+            pageTexts[pageNumber - 1] = text
+        pagesForOCR = [pageNumber for pageNumber in pagesForOCR
+                       if pageNumber not in cachedPages]
+
+    # We make a note of how many pages took each path, also in the run report.
+    count("textLayerPages", numberOfTextPages, pdf)
+    count("ocrCacheHits", len(cachedPages), pdf)
+    count("ocrPages", len(pagesForOCR), pdf)
+    if pageCounts is not None:
+        pageCounts["text"] = pageCounts.get("text", 0) + numberOfTextPages
+        pageCounts["cached"] = pageCounts.get("cached", 0) + len(cachedPages)
+        pageCounts["ocr"] = pageCounts.get("ocr", 0) + len(pagesForOCR)
+
+    return pagesForOCR, documentHash
+
+
+# This function is used to add the text recognized from the pages of the PDF
+# with the hash provided as an argument to the OCR cache. The pages are given as
+# a dictionary mapping page numbers to texts.
+def cacheRecognizedPages(documentHash, pageTexts, dpi=500):
+    if documentHash is not None and pageTexts and getOCRCache() is not None:
+        with stage("ocrCache"):
+            getOCRCache().putPages(documentHash, pageTexts, getCacheDpi(dpi),
+                                   getEngineKey(dpi))
+
+
+# This function is used to render a single page of the PDF with the name
+# provided as an argument and recognize its text using pytesseract. It is the
+# unit of work handed to the worker processes.
+def recognizePage(pdf, pageNumber, dpi=500):
+
+    # We render only the requested page.
+    for renderedPageNumber, page in iterPageImages(pdf, getRenderDpi(dpi), 1,
+                                                   [pageNumber]):
+
+        # This recognizes the text as a string from the image using pytesseract.
+        return recognizeRenderedPage(pdf, pageNumber, page, dpi)
+
+    # A page that could not be rendered fails the document with an error
+    # naming the page, like it does when the pages are recognized in order, so
+    # no empty text is cached for it.
+    raise RuntimeError("Page " + str(pageNumber) + " of " + str(pdf) +
+                       " could not be rendered.")
+
+
+# This function is used to find the names of the PDFs that make up the document
+# provided as an argument, which is either the name of a PDF or a tuple of the
+# names of its parts.
+def getDocumentParts(document):
+    if isinstance(document, (str, os.PathLike)):
+        return [document]
+    return list(document)
+
+
+# This function is used to obtain the text of every page of the document
+# provided as an argument, which is either the name of a PDF or a tuple of the
+# names of the PDFs that make it up. The parts are read one after another and
+# their pages are numbered continuously, as if they had been merged.
+def iterPageTexts(pdf, dpi=500, pageWindow=4, useTextLayer=True,
+                  pageCounts=None):
+    pageOffset = 0
+    for part in getDocumentParts(pdf):
+        numberOfPages = 0
+        for numberOfPages, text in iterPartPageTexts(part, dpi, pageWindow,
+                                                     useTextLayer, pageCounts):
+            yield pageOffset + numberOfPages, text
+        pageOffset += numberOfPages
+
+
+# This function is used to obtain the text of every page of the PDF with the
+# name provided as an argument. It yields the page number together with the
+# text of the page. Pages with a usable text layer are read directly, and only
+# the remaining pages are taken from the OCR cache or rendered and passed to
+# pytesseract straight from memory. The dpi is either a fixed resolution or
+# "adaptive" to choose the resolution per page. If a pageCounts dictionary is
+# provided, the number of pages read from the text layer, taken from the OCR
+# cache and recognized using OCR are added to its "text", "cached" and "ocr"
+# entries.
+def iterPartPageTexts(pdf, dpi=500, pageWindow=4, useTextLayer=True,
+                      pageCounts=None):
+
+    # This list stores the text layer of each page.
+    pageTexts = readTextLayer(pdf, useTextLayer)
+
+    # This list stores the page numbers that need to be recognized using OCR.
+    pagesForOCR, documentHash = getPagesForOCR(pdf, pageTexts, dpi, pageCounts)
+
+    # This iterator renders only the pages that need OCR, in page order.
+    renderedPages = iterPageImages(pdf, getRenderDpi(dpi), pageWindow,
+                                   pagesForOCR)
+    pagesForOCR = set(pagesForOCR)
+
+    # We iterate through all the pages in order and replace the text of the
+    # pages that need OCR with the recognized text.
+    for pageNumber in range(1, len(pageTexts) + 1):
+        if pageNumber in pagesForOCR:
+
+            # A page missing from the rendered pages, because pdf2image
+            # returned fewer pages than the PDF has, fails the document with
+            # an error naming the page.
+            renderedPage = next(renderedPages, None)
+            if renderedPage is None:
+                raise RuntimeError("Page " + str(pageNumber) + " of " +
+                                   str(pdf) + " could not be rendered.")
+            renderedPageNumber, page = renderedPage
+
+            # This recognizes the text as a string from the image using
+            # pytesseract and keeps it in the OCR cache.
+            text = recognizeRenderedPage(pdf, pageNumber, page, dpi)
+            cacheRecognizedPages(documentHash, {pageNumber: text}, dpi)
+            yield pageNumber, text
+        else:
+            yield pageNumber, pageTexts[pageNumber - 1]
+
+
+# This function is used to obtain the text of every page of every document in
+# the list of documents provided as an argument, each of which is either the
+# name of a PDF or a tuple of the names of its parts. It yields each document
+# together with the list of the texts of its pages, always in the same order as
+# the list of documents so the results are identical to processing the
+# documents one after another. With more than one worker, the text layers and
+# the pages that need OCR from all the parts are fanned out to a pool of worker
+# processes, keeping a bounded number of parts in flight. If an errors
+# dictionary is provided, a document that cannot be read, such as a missing or
+# corrupt PDF, is yielded with None instead of its page texts and its error is
+# stored in the dictionary under the document, so the remaining documents are
+# still processed.
+def iterDocumentTexts(listOfDocuments, dpi=500, workers=1, pageWindow=4,
+                      useTextLayer=True, pageCounts=None, errors=None):
+
+    # This list stores the documents, and this iterator hands out the texts of
+    # the pages of their parts in order.
+    listOfDocuments = list(listOfDocuments)
+    partErrors = {} if errors is not None else None
+    partTexts = iterPartTexts([part for document in listOfDocuments
+                               for part in getDocumentParts(document)], dpi,
+                              workers, pageWindow, useTextLayer, pageCounts,
+                              partErrors)
+
+    # We put the pages of the parts of every document back together. A
+    # document fails with the error of its first part that cannot be read.
+    for document in listOfDocuments:
+        pageTexts = []
+        error = None
+        for part in getDocumentParts(document):
+            pdf, texts = next(partTexts)
+            if texts is None:
+                partError = partErrors.pop(pdf)
+                error = error or partError
+            elif error is None:
+                pageTexts.extend(texts)
+        if error is not None:
+            errors[document] = error
+            pageTexts = None
+        yield document, pageTexts
+
+
+# This function is used to obtain the text of every page of every PDF in the
+# list of PDFs provided as an argument, in the same way as iterDocumentTexts
+# does for documents made of a single PDF.
+def iterPartTexts(listOfPDFs, dpi=500, workers=1, pageWindow=4,
+                  useTextLayer=True, pageCounts=None, errors=None):
+
+    # With a single worker, we process the documents one after another in this
+    # process, which also keeps the memory bounded by the page window.
+    if workers is None or workers <= 1:
+        for pdf in listOfPDFs:
+            try:
+                pageTexts = [text for pageNumber, text in
+                             iterPartPageTexts(pdf, dpi, pageWindow,
+                                               useTextLayer, pageCounts)]
+            except Exception as error:
+                if errors is None:
+                    raise
+                errors[pdf] = error
+                pageTexts = None
+            yield pdf, pageTexts
+        return
+
+    # This variable stores how many documents can be in flight at the same
+    # time. Looking ahead keeps every worker busy when a document has few pages
+    # without holding the whole corpus in memory.
+    lookahead = 2 * workers
+
+    # This iterator hands out the PDFs in order.
+    documents = iter(listOfPDFs)
+
+    # This queue stores the documents in flight in order. Each entry is a list
+    # holding the PDF, the future (or result) of its text layer, the futures of
+    # the pages being recognized using OCR and the hash of the PDF.
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+
+            # We top up the documents in flight by reading their text layers.
+            while len(pending) < lookahead:
+                pdf = next(documents, None)
+                if pdf is None:
+                    break
+                pending.append([pdf, submitMeasured(executor, readTextLayer,
+                                                    pdf, useTextLayer), None,
+                                None])
+
+            # We stop once every document has been handed out.
+            if not pending:
+                break
+
+            # As soon as the text layer of a document is known, we fan the
+            # pages that need OCR and are not in the OCR cache out to the
+            # workers. A document whose text layer or page count cannot be
+            # read is kept in order with no pages to recognize.
+            for entry in pending:
+                if entry[2] is None:
+                    try:
+                        entry[1] = getMeasuredResult(entry[1], entry[0])
+                        pagesForOCR, entry[3] = getPagesForOCR(entry[0],
+                                                               entry[1], dpi,
+                                                               pageCounts)
+                    except Exception as error:
+                        if errors is None:
+                            raise
+                        entry[1] = error
+                        pagesForOCR = []
+                    entry[2] = {pageNumber: submitMeasured(executor,
+                                                           recognizePage,
+                                                           entry[0],
+                                                           pageNumber, dpi)
+                                for pageNumber in pagesForOCR}
+
+            # We wait for the first document in order, put its pages back
+            # together and keep the recognized pages in the OCR cache.
+            pdf, pageTexts, ocrFutures, documentHash = pending.popleft()
+            try:
+                if isinstance(pageTexts, Exception):
+                    raise pageTexts
+                for pageNumber, future in ocrFutures.items():
+                    pageTexts[pageNumber - 1] = getMeasuredResult(future,
+                                                                  pdf)
+            except Exception as error:
+                if errors is None:
+                    raise
+                errors[pdf] = error
+                yield pdf, None
+                continue
+            cacheRecognizedPages(documentHash,
+                                 {pageNumber: pageTexts[pageNumber - 1]
+                                  for pageNumber in ocrFutures}, dpi)
+
+            yield pdf, pageTexts
@@ -0,0 +1,145 @@
+"""
+SHARED REGULATOR INDEX
+
+A persistent lookup index over the data of the regulators, mapping every FDIC
+docket number, OCC order number and FED URL to the rows of the data that refer
+to it. The index is stored together with the columns of the data that are
+used, kept as one list per column, so finding a document takes constant time
+and neither requires FDIC.csv, FED.csv or OCC.xlsx to be parsed again nor
+pandas to be imported. The index is built from the rows as they are read, and
+is rebuilt automatically whenever its source file changes.
+"""
+
+# Importing the previously installed libraries.
+import os
+import re
+import pickle
+from Workspace import getTemporaryFileName
+
+
+# This variable stores the version of the format of the index files. Changing
+# it rebuilds every index.
+INDEX_VERSION = 2
+
+# This variable stores the directory where the index files are kept. Setting it
+# to None builds the index on every run without saving it.
+INDEX_DIRECTORY = os.path.join(".cache", "index")
+
+# This dictionary stores, for every regulator, the column holding the
+# identifiers of the documents.
+KEY_COLUMNS = {"FDIC": " Docket Number", "OCC": "Order Number", "FED": "URL"}
+
+# This variable stores the characters separating the docket numbers of a row of
+# the FDIC data, such as "FDIC-13-214e,FDIC-13-217k" or "FDIC-12-568e &
+# FDIC-13-115k".
+DOCKET_SEPARATORS = re.compile(r"[,&;]")
+
+
+# This function is used to normalize an FDIC docket number, OCC order number or
+# FED URL provided as an argument so that spacing, letter case and the host of
+# FED links do not prevent a match.
+def normalizeKey(regulatorName, key):
+    key = str(key).strip()
+    if regulatorName == "FED":
+        for prefix in ("https://www.federalreserve.gov", "http://www.federalr" +
+                       "eserve.gov"):
+            if key.lower().startswith(prefix):
+                key = key[len(prefix):]
+        if not key.startswith("/"):
+            key = "/" + key
+        return key
+    return key.upper()
+
+
+# This function is used to find all the normalized keys stored in a cell of the
+# key column of the regulator with the name provided as an argument. A cell of
+# the FDIC data may hold several docket numbers.
+def getKeysOfCell(regulatorName, cell):
+    if cell is None or cell != cell:
+        return []
+    if regulatorName == "FDIC":
+        return [normalizeKey(regulatorName, key) for key in
+                DOCKET_SEPARATORS.split(str(cell)) if key.strip() != ""]
+    return [normalizeKey(regulatorName, cell)]
+
+
+# This function is used to describe the source file provided as an argument so
+# that a change to it can be detected.
+def getFingerprint(sourceFile):
+    status = os.stat(sourceFile)
+    return (INDEX_VERSION, os.path.abspath(sourceFile), status.st_size,
+            status.st_mtime_ns)
+
+
+class RegulatorIndex:
+
+    # This function is used to build the index of the regulator with the name
+    # provided as an argument over the given rows, each of which is a
+    # dictionary mapping the columns of the data to their values.
+    def __init__(self, regulatorName, rows, fingerprint=None):
+        self.regulatorName = regulatorName
+        self.fingerprint = fingerprint
+
+        # This dictionary stores the values of every column, and this one maps
+        # every normalized key to the offsets of the rows that refer to it, in
+        # the order of the rows.
+        self.columns = {}
+        self.rowOffsets = {}
+        for offset, row in enumerate(rows):
+            for column, value in row.items():
+                self.columns.setdefault(column, []).append(value)
+            for key in dict.fromkeys(getKeysOfCell(
+                    regulatorName, row[KEY_COLUMNS[regulatorName]])):
+                self.rowOffsets.setdefault(key, []).append(offset)
+
+    # This function is used to obtain every row of the data in order, each as a
+    # dictionary mapping the columns to their values.
+    def iterRows(self):
+        for values in zip(*self.columns.values()):
+            yield dict(zip(self.columns, values))
+
+    # This function is used to find the rows that refer to the FDIC docket
+    # number, OCC order number or FED URL provided as an argument, including
+    # docket numbers that share a row with other docket numbers or are
+    # surrounded by spaces. Every row is returned as a dictionary mapping the
+    # columns to their values.
+    def lookup(self, identifier):
+        return [{column: values[offset] for column, values in
+                 self.columns.items()} for offset in
+                self.rowOffsets.get(normalizeKey(self.regulatorName,
+                                                 identifier), [])]
+
+
+# This function is used to load the index of the regulator with the name
+# provided as an argument. If there is no index for the current version of the
+# source file yet, the rows of the source file are read using the function
+# loadRows and a new index is built and saved, unless the index files are
+# disabled.
+def loadIndex(regulatorName, sourceFile, loadRows):
+
+    # Without an index directory, the index is only kept for this run.
+    if INDEX_DIRECTORY is None:
+        return RegulatorIndex(regulatorName, loadRows(), None)
+
+    # This variable stores the name of the index file.
+    indexFile = os.path.join(INDEX_DIRECTORY, regulatorName + ".pickle")
+    fingerprint = getFingerprint(sourceFile)
+
+    # We use the saved index if it was built from the same source file.
+    if os.path.exists(indexFile):
+        try:
+            with open(indexFile, 'rb') as file:
+                index = pickle.load(file)
+            if index.fingerprint == fingerprint:
+                return index
+        except Exception:
+            pass
+
+    # Otherwise we build the index and save it for the next runs.
+    index = RegulatorIndex(regulatorName, loadRows(), fingerprint)
+    os.makedirs(INDEX_DIRECTORY, exist_ok=True)
+    temporaryFileName = getTemporaryFileName(indexFile)
+    with open(temporaryFileName, 'wb') as file:
+        pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporaryFileName, indexFile)
+    return index
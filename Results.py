@@ -0,0 +1,99 @@
+"""
+SHARED RESULTS
+
+Helpers used by both the generalised code and the code specific for each
+regulator to collect the sentences with key information that end up in
+Output.csv. Rows are either collected in one list per column and turned into a
+dataframe once at the end, or streamed straight to the CSV file as they are
+found so that the memory used stays flat. Both produce exactly the same file as
+writing the dataframe with to_csv, including its index column. The file is
+written under a temporary name and only renamed once it is complete, so two runs
+writing the same output file never interleave their rows.
+"""
+
+# Importing the previously installed libraries.
+import os
+import csv
+import math
+from Workspace import getTemporaryFileName
+
+
+# This function is used to format a value the way pandas writes it to a CSV
+# file, where missing values are left empty.
+def formatValue(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
+
+class ResultBuilder:
+
+    # This function is used to create a builder for a table with the columns
+    # provided as an argument. If an output file is provided, every row is
+    # written to it straight away instead of being kept in memory.
+    def __init__(self, columns, outputFile=None):
+        self.columns = list(columns)
+        self.numberOfRows = 0
+
+        # This dictionary stores one list of values per column.
+        self.values = {column: [] for column in self.columns}
+
+        # We write the header of the CSV file, whose first column is the index
+        # of the row, if we are streaming the rows.
+        self.file = None
+        self.writer = None
+        self.outputFile = outputFile
+        if outputFile is not None:
+            self.temporaryFileName = getTemporaryFileName(outputFile)
+            self.file = open(self.temporaryFileName, 'w', newline='',
+                             encoding='utf-8')
+            self.writer = csv.writer(self.file, lineterminator=os.linesep)
+            self.writer.writerow([""] + self.columns)
+
+    # This function is used to add a row with the values provided as an
+    # argument, given in the same order as the columns.
+    def add(self, *values):
+        if self.writer is not None:
+            self.writer.writerow([self.numberOfRows] +
+                                 [formatValue(value) for value in values])
+        else:
+            for column, value in zip(self.columns, values):
+                self.values[column].append(value)
+        self.numberOfRows += 1
+
+    # This function is used to find the number of rows that have been added.
+    def __len__(self):
+        return self.numberOfRows
+
+    # This function is used to build the dataframe holding all the rows that
+    # have been added. It is only available if the rows are not streamed.
+    def toDataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.values, columns=self.columns)
+
+    # This function is used to write the rows to the CSV file with the name
+    # provided as an argument, or to finish writing the streamed CSV file.
+    def writeCSV(self, fileName=None):
+        if self.writer is not None:
+            self.close()
+        else:
+            temporaryFileName = getTemporaryFileName(fileName)
+            self.toDataframe().to_csv(temporaryFileName)
+            os.replace(temporaryFileName, fileName)
+
+    # This function is used to close the streamed CSV file and move it to its
+    # final name.
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.replace(self.temporaryFileName, self.outputFile)
+
+    # This function is used to close the streamed CSV file and delete it
+    # without replacing the output file, when the run stops before the output
+    # is complete.
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.temporaryFileName)
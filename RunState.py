@@ -0,0 +1,100 @@
+"""
+SHARED RUN STATE
+
+A persistent record of the rows of Data.csv, FDIC.csv and FED.csv that have
+already been processed, stored in a SQLite database. For every row, or every
+identifier looked up in the data of a regulator, the database keeps a
+fingerprint of the values that decide what is downloaded (such as the Record ID
+and the link to the file) together with the rows it contributed to the output
+for a given set of filters. A later run only downloads and processes the rows
+that were added or whose fingerprint changed, takes the output of the other
+rows from the database and forgets the rows that are no longer in the data.
+"""
+
+# Importing the previously installed libraries.
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+
+# This variable stores the database file of the run state. Setting it to None
+# processes every row on every run.
+STATE_FILE = os.path.join(".cache", "state.sqlite3")
+
+
+# This function is used to compute the fingerprint of the values provided as
+# arguments, such as the Record ID and the link of a row.
+def getFingerprint(*values):
+    return hashlib.sha256(json.dumps(values, default=str).encode(
+        "utf-8")).hexdigest()
+
+
+# This function is used to describe the filters provided as a dictionary as a
+# string, so that the output of the rows is only reused for the same filters.
+def getFiltersKey(filters):
+    return json.dumps(filters, sort_keys=True)
+
+
+class RunState:
+
+    # This function is used to open the run state stored in the database file
+    # provided as an argument.
+    def __init__(self, databaseFile):
+
+        # The lock protects the connection if the state is shared by threads.
+        self.lock = threading.Lock()
+
+        # We create the database and its table the first time it is used.
+        directory = os.path.dirname(databaseFile)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(databaseFile,
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS records ("
+                                "source TEXT NOT NULL, "
+                                "filters TEXT NOT NULL, "
+                                "record TEXT NOT NULL, "
+                                "fingerprint TEXT NOT NULL, "
+                                "rows TEXT NOT NULL, "
+                                "PRIMARY KEY (source, filters, record))")
+        self.connection.commit()
+
+    # This function is used to look up every record of the source provided as
+    # an argument that was processed with the given filters. It returns a
+    # dictionary mapping every record to its fingerprint and its output rows.
+    def getRecords(self, source, filters):
+        with self.lock:
+            return {record: (fingerprint, json.loads(rows))
+                    for record, fingerprint, rows in self.connection.execute(
+                        "SELECT record, fingerprint, rows FROM records WHERE "
+                        "source = ? AND filters = ?",
+                        (source, getFiltersKey(filters)))}
+
+    # This function is used to store the output rows of the record provided as
+    # an argument together with its fingerprint. The record is written to the
+    # disk straight away, so an interrupted run keeps the records it finished.
+    def putRecord(self, source, filters, record, fingerprint, rows):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                (source, getFiltersKey(filters), record, fingerprint,
+                 json.dumps([list(row) for row in rows], default=str)))
+            self.connection.commit()
+
+    # This function is used to forget the records provided as an argument for
+    # the given source and filters.
+    def removeRecords(self, source, filters, listOfRecords):
+        with self.lock:
+            self.connection.executemany(
+                "DELETE FROM records WHERE source = ? AND filters = ? AND "
+                "record = ?", [(source, getFiltersKey(filters), record)
+                               for record in listOfRecords])
+            self.connection.commit()
+
+    # This function is used to close the database.
+    def close(self):
+        with self.lock:
+            self.connection.close()
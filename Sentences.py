@@ -0,0 +1,120 @@
+"""
+SHARED SENTENCE SEGMENTATION
+
+The sentence segmenter used by both the generalised code and the code specific
+for each regulator to split the text of a page into the sentences that are
+written to the output. The text is never copied: the segmenter returns the
+position where every sentence starts and ends in the text of the page, after
+the hyphens at the ending of the lines have been removed.
+
+A sentence ends with a period followed by any whitespace, so a sentence ending
+at the end of a line of OCR text (".\n") is split as well as one followed by a
+space. A period is not treated as the end of a sentence when it ends a common
+abbreviation such as "Inc." or "No.", written in any case, an abbreviation
+written with periods such as "U.S.C." or "N.A.", or when the next sentence
+would start with a lowercase letter. A single capital letter is only treated
+as an initial, such as the "Q." of "John Q. Smith", when it is followed by a
+capitalised name or another initial, so "Exhibit A. The Bank" is still split.
+Line breaks inside a sentence never split it, so a date such as "June\n3,
+2019" stays in one sentence.
+"""
+
+# Importing the previously installed libraries.
+import re
+
+
+# This variable stores the version of the segmenter, which changes whenever the
+# sentences it finds change, so that stored sentences can be found again.
+SEGMENTER_VERSION = 3
+
+# This variable stores the abbreviations, without their final period, that are
+# common in enforcement orders and never end a sentence.
+ABBREVIATIONS = ["Inc", "Co", "Corp", "Ltd", "No", "Nos", "Mr", "Mrs", "Ms",
+                 "Dr", "Jr", "Sr", "St", "Sec", "Secs", "Art", "Par", "Para",
+                 "Vol", "Ch", "Cf", "Fed", "Reg", "Stat", "App", "Cir", "Supp",
+                 "Jan", "Feb", "Mar", "Apr", "Aug", "Sep", "Sept", "Oct", "Nov",
+                 "Dec", "vs"]
+
+# This variable stores the pattern of the end of a sentence: a period followed
+# by whitespace.
+BOUNDARY_PATTERN = re.compile(r'\.\s+')
+
+# This variable stores the abbreviations in lowercase, so that they are found
+# in any case. "v" is only an abbreviation in lowercase, since "V." is usually
+# the Roman numeral.
+LOWERCASE_ABBREVIATIONS = frozenset(abbreviation.lower() for abbreviation in
+                                    ABBREVIATIONS)
+
+# This variable stores the pattern of the word before a period that may not
+# end a sentence. It is searched for right before the period, and matches
+# either an abbreviation written with periods or a short word, which is kept
+# in its group so that it can be looked up in the abbreviations.
+ABBREVIATION_PATTERN = re.compile(r'(?<![\w.])(?:(?:[A-Za-z]\.)+[A-Za-z]|' +
+                                  r'([A-Za-z]{1,5}))$')
+
+# This variable stores the pattern of the word after the period of an initial
+# when it is part of a name: a capitalised word or another initial.
+NAME_PATTERN = re.compile(r'([A-Z][a-z]+)\b|[A-Z]\.')
+
+# This variable stores the capitalised words that commonly start a sentence in
+# enforcement orders, which are never taken for a name after an initial.
+SENTENCE_OPENINGS = frozenset(["The", "This", "That", "These", "Those", "A",
+                               "An", "Any", "All", "Each", "Such", "No",
+                               "It", "Its", "In", "On", "At", "By", "For",
+                               "From", "To", "If", "As", "Upon", "Under",
+                               "Pursuant", "Within", "Accordingly",
+                               "Therefore", "Further", "Furthermore",
+                               "Respondent", "Respondents", "Bank", "Board",
+                               "Management", "Notwithstanding", "Except",
+                               "Nothing", "There", "Whereas"])
+
+# This variable stores how many characters before a period are searched for an
+# abbreviation, which is longer than the longest abbreviation.
+ABBREVIATION_WINDOW = 16
+
+
+# This function is used to check whether the word provided as an argument,
+# found before a period by ABBREVIATION_PATTERN, keeps the sentence going. The
+# word is None for an abbreviation written with periods. A single capital
+# letter is an initial if the text continues with a name at the given position.
+def isAbbreviation(word, text, position):
+    if word is None or word == "v" or word.lower() in LOWERCASE_ABBREVIATIONS:
+        return True
+    if len(word) == 1 and word.isupper():
+        nameMatch = NAME_PATTERN.match(text, position)
+        return nameMatch is not None and \
+            nameMatch.group(1) not in SENTENCE_OPENINGS
+    return False
+
+
+# This function is used to split the text provided as an argument into
+# sentences without copying it. It returns a list of the positions where the
+# sentences start and a list of the positions where they end. The period ending
+# a sentence and the whitespace after it belong to neither sentence.
+def getSentenceOffsets(text):
+    sentenceStarts = [0]
+    sentenceEnds = []
+    for boundary in BOUNDARY_PATTERN.finditer(text):
+        position = boundary.start()
+        nextPosition = boundary.end()
+
+        # A period before a lowercase letter or after an abbreviation does not
+        # end the sentence.
+        if nextPosition < len(text) and text[nextPosition].islower():
+            continue
+        abbreviationMatch = ABBREVIATION_PATTERN.search(
+            text, max(0, position - ABBREVIATION_WINDOW), position)
+        if abbreviationMatch is not None and isAbbreviation(
+                abbreviationMatch.group(1), text, nextPosition):
+            continue
+
+        sentenceEnds.append(position)
+        sentenceStarts.append(nextPosition)
+    sentenceEnds.append(len(text))
+    return sentenceStarts, sentenceEnds
+
+
+# This function is used to obtain the sentences of the text provided as an
+# argument as strings, which is only meant for inspecting the segmenter.
+def splitSentences(text):
+    return [text[start:end] for start, end in zip(*getSentenceOffsets(text))]
@@ -0,0 +1,113 @@
+"""
+SHARED SOURCE READING
+
+The reader used by both the generalised code and the code specific for each
+regulator to read the exports of the regulators, such as Data.csv, FDIC.csv,
+FED.csv and OCC.xlsx. Only the columns that are used are read, every one of
+them as text so that identifiers keep their exact spelling, and every row is
+handed out as a dictionary of these columns. CSV files are parsed in chunks of
+CHUNK_SIZE rows, so the memory used while reading an export does not grow with
+its size. An Excel workbook cannot be parsed in chunks and is slow to parse, so
+it is converted once to a columnar cache file holding every column, which is
+used instead until the workbook changes. pandas is only imported when a file
+is actually parsed.
+"""
+
+# Importing the previously installed libraries.
+import os
+import pickle
+import hashlib
+from Workspace import getTemporaryFileName
+
+
+# This variable stores the number of rows of a CSV file parsed at a time.
+CHUNK_SIZE = 50000
+
+# This variable stores the version of the format of the cache files. Changing
+# it converts every workbook again.
+SOURCE_CACHE_VERSION = 1
+
+# This variable stores the directory of the converted workbooks. Setting it to
+# None disables the cache.
+SOURCE_CACHE_DIRECTORY = os.path.join(".cache", "sources")
+
+# This variable stores the extensions of the files read as Excel workbooks.
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+# This function is used to describe the source file provided as an argument so
+# that a change to it can be detected.
+def getSourceFingerprint(sourceFile):
+    status = os.stat(sourceFile)
+    return (SOURCE_CACHE_VERSION, os.path.abspath(sourceFile), status.st_size,
+            status.st_mtime_ns)
+
+
+# This function is used to find the cache file of the workbook provided as an
+# argument, which is named after the workbook and the hash of its path.
+def getSourceCacheFile(sourceFile):
+    pathHash = hashlib.sha256(os.path.abspath(sourceFile).encode(
+        "utf-8")).hexdigest()[:16]
+    return os.path.join(SOURCE_CACHE_DIRECTORY, os.path.basename(sourceFile) +
+                        "." + pathHash + ".pickle")
+
+
+# This function is used to read every column of the first sheet of the Excel
+# workbook provided as an argument as text. It returns a dictionary mapping
+# every column to the list of its values. The workbook is only parsed if it has
+# changed since it was last converted.
+def readExcelColumns(sourceFile):
+    fingerprint = getSourceFingerprint(sourceFile)
+    cacheFile = (getSourceCacheFile(sourceFile)
+                 if SOURCE_CACHE_DIRECTORY is not None else None)
+
+    # We use the converted workbook if it was converted from the same file.
+    if cacheFile is not None and os.path.exists(cacheFile):
+        try:
+            with open(cacheFile, 'rb') as file:
+                storedFingerprint, columns = pickle.load(file)
+            if storedFingerprint == fingerprint:
+                return columns
+        except Exception:
+            pass
+
+    # Otherwise we parse the workbook and convert it for the next runs.
+    import pandas as pd
+    dataframe = pd.read_excel(sourceFile, dtype=str)
+    columns = {column: dataframe[column].tolist()
+               for column in dataframe.columns}
+    if cacheFile is not None:
+        os.makedirs(SOURCE_CACHE_DIRECTORY, exist_ok=True)
+        temporaryFileName = getTemporaryFileName(cacheFile)
+        with open(temporaryFileName, 'wb') as file:
+            pickle.dump((fingerprint, columns), file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaryFileName, cacheFile)
+    return columns
+
+
+# This function is used to read the rows of the export provided as an argument,
+# which is a CSV file or an Excel workbook. Only the given columns are read, as
+# text, and every row is yielded as a dictionary mapping these columns to their
+# values, where missing values are NaN like in a dataframe. A CSV file is
+# parsed chunkSize rows at a time.
+def iterSourceRows(sourceFile, columns, chunkSize=CHUNK_SIZE):
+    columns = list(columns)
+
+    # A workbook is read from its columnar cache.
+    if str(sourceFile).lower().endswith(EXCEL_EXTENSIONS):
+        table = readExcelColumns(sourceFile)
+        missingColumns = [column for column in columns if column not in table]
+        if missingColumns:
+            raise KeyError("The columns " + ", ".join(map(repr,
+                                                          missingColumns)) +
+                           " are not in " + str(sourceFile) + ".")
+        for values in zip(*[table[column] for column in columns]):
+            yield dict(zip(columns, values))
+        return
+
+    import pandas as pd
+    for chunk in pd.read_csv(sourceFile, usecols=columns, dtype=str,
+                             chunksize=chunkSize):
+        for values in zip(*[chunk[column].tolist() for column in columns]):
+            yield dict(zip(columns, values))
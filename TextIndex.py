@@ -0,0 +1,267 @@
+"""
+SHARED TEXT INDEX
+
+A persistent full-text index over the text of the pages of the documents that
+have already been processed, stored in a SQLite database, so that a new list of
+keywords or new date filters can be answered without downloading, rendering or
+recognizing any PDF again. Every sentence of every page is stored once together
+with its position in the page and the first date it mentions, which is also
+stored as an ordinal so that date ranges are looked up in an index. An FTS5
+index of the trigrams of the sentences finds the sentences that may contain a
+keyword or a phrase, and these are checked with the same TextMatcher as the
+scripts, so a query returns the same rows as processing the PDFs again would.
+Documents are added one at a time as they are processed and are only indexed
+again when their fingerprint or the version of the sentence segmenter changes.
+If the SQLite library has no trigram tokenizer, or a keyword is shorter than a
+trigram, every sentence is checked instead, which gives the same rows more
+slowly.
+"""
+
+# Importing the previously installed libraries.
+import os
+import sqlite3
+import threading
+from datetime import date
+from Hits import PageText
+from Sentences import SEGMENTER_VERSION, getSentenceOffsets
+from TextMatching import DATE_PATTERN, TextMatcher, getDateOrdinal
+
+
+# This variable stores the database file of the text index. Setting it to None
+# disables the index.
+TEXT_INDEX_FILE = os.path.join(".cache", "text.sqlite3")
+
+
+# This function is used to write the keyword provided as an argument as a phrase
+# of an FTS5 query, which matches the keyword anywhere in a sentence when the
+# trigram tokenizer is used.
+def getPhraseQuery(keyword):
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+class TextIndex:
+
+    # This function is used to open the text index stored in the database file
+    # provided as an argument.
+    def __init__(self, databaseFile):
+
+        # The lock protects the connection if the index is shared by threads.
+        self.lock = threading.Lock()
+
+        # We create the database and its tables the first time it is used.
+        directory = os.path.dirname(databaseFile)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(databaseFile,
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS documents ("
+                                "id INTEGER PRIMARY KEY, "
+                                "source TEXT NOT NULL, "
+                                "record TEXT NOT NULL, "
+                                "fingerprint TEXT NOT NULL, "
+                                "institution TEXT, "
+                                "segmenter INTEGER NOT NULL, "
+                                "UNIQUE (source, record))")
+
+        # An index written before the version of the segmenter was recorded
+        # was split into sentences by the first version.
+        if "segmenter" not in [column[1] for column in self.connection.execute(
+                "PRAGMA table_info(documents)")]:
+            self.connection.execute("ALTER TABLE documents ADD COLUMN segmen" +
+                                    "ter INTEGER NOT NULL DEFAULT 1")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS sentences ("
+                                "id INTEGER PRIMARY KEY, "
+                                "document INTEGER NOT NULL, "
+                                "page INTEGER NOT NULL, "
+                                "sentenceStart INTEGER NOT NULL, "
+                                "text TEXT NOT NULL, "
+                                "dateText TEXT, "
+                                "dateOrdinal INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sentencesByDocum" +
+                                "ent ON sentences (document, page, sentenceS" +
+                                "tart)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sentencesByDate " +
+                                "ON sentences (dateOrdinal)")
+
+        # The trigrams of the sentences are indexed without storing their text
+        # a second time.
+        try:
+            self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS sent" +
+                                    "enceTrigrams USING fts5(text, content='" +
+                                    "sentences', content_rowid='id', tokeniz" +
+                                    "e='trigram')")
+            self.hasTrigrams = True
+        except sqlite3.OperationalError:
+            self.hasTrigrams = False
+        self.connection.commit()
+
+    # This function is used to find the fingerprint the record of the source
+    # provided as an argument was indexed with. It returns None if the record
+    # has not been indexed, or was split into sentences by another version of
+    # the segmenter, so that it is indexed again the next time it is processed.
+    def getFingerprint(self, source, record):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM documents WHERE source = ? AND "
+                "record = ? AND segmenter = ?",
+                (source, str(record), SEGMENTER_VERSION)).fetchone()
+        return row[0] if row is not None else None
+
+    # This function is used to find every record of the source provided as an
+    # argument that has been indexed.
+    def getRecords(self, source):
+        with self.lock:
+            return [record for record, in self.connection.execute(
+                "SELECT record FROM documents WHERE source = ? ORDER BY id",
+                (source,))]
+
+    # This function is used to remove the sentences of the document with the id
+    # provided as an argument. The lock should already be held.
+    def removeSentences(self, documentID):
+        if self.hasTrigrams:
+            self.connection.execute(
+                "INSERT INTO sentenceTrigrams (sentenceTrigrams, rowid, text) "
+                "SELECT 'delete', id, text FROM sentences WHERE document = ?",
+                (documentID,))
+        self.connection.execute("DELETE FROM sentences WHERE document = ?",
+                                (documentID,))
+
+    # This function is used to add the text of the pages of the record of the
+    # source provided as an argument, given in order starting from page 1, to
+    # the index, replacing the text indexed for it earlier. The fingerprint and
+    # the name of the institution are stored with the record.
+    def addDocument(self, source, record, fingerprint, institutionName,
+                    pageTexts):
+
+        # This list stores every sentence of the document that is not empty,
+        # with the first date it mentions.
+        listOfSentences = []
+        for pageNumber, text in enumerate(pageTexts, 1):
+            text = PageText(pageNumber, text).text
+            for sentenceStart, sentenceEnd in zip(*getSentenceOffsets(text)):
+                sentence = text[sentenceStart:sentenceEnd]
+                if sentence.strip() == "":
+                    continue
+                dateMatch = DATE_PATTERN.search(sentence)
+                listOfSentences.append((pageNumber, sentenceStart, sentence,
+                                        dateMatch and dateMatch.group(1),
+                                        dateMatch and getDateOrdinal(
+                                            dateMatch)))
+
+        # The record keeps its place in the index when it is indexed again, so
+        # the order of the results does not change.
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO documents (source, record, fingerprint, "
+                "institution, segmenter) VALUES (?, ?, ?, ?, ?) ON CONFLICT "
+                "(source, record) DO UPDATE SET fingerprint = "
+                "excluded.fingerprint, institution = excluded.institution, "
+                "segmenter = excluded.segmenter",
+                (source, str(record), fingerprint, institutionName,
+                 SEGMENTER_VERSION))
+            documentID, = self.connection.execute(
+                "SELECT id FROM documents WHERE source = ? AND record = ?",
+                (source, str(record))).fetchone()
+            self.removeSentences(documentID)
+            self.connection.executemany(
+                "INSERT INTO sentences (document, page, sentenceStart, text, "
+                "dateText, dateOrdinal) VALUES (?, ?, ?, ?, ?, ?)",
+                [(documentID,) + sentence for sentence in listOfSentences])
+            if self.hasTrigrams:
+                self.connection.execute(
+                    "INSERT INTO sentenceTrigrams (rowid, text) SELECT id, "
+                    "text FROM sentences WHERE document = ?", (documentID,))
+            self.connection.commit()
+
+    # This function is used to forget the records of the source provided as an
+    # argument.
+    def removeDocuments(self, source, listOfRecords):
+        with self.lock:
+            for record in listOfRecords:
+                row = self.connection.execute(
+                    "SELECT id FROM documents WHERE source = ? AND record = ?",
+                    (source, str(record))).fetchone()
+                if row is not None:
+                    self.removeSentences(row[0])
+                    self.connection.execute("DELETE FROM documents WHERE id " +
+                                            "= ?", row)
+            self.connection.commit()
+
+    # This function is used to find the dates and keywords in the indexed
+    # documents, like the scripts do when they process the PDFs. Dates are only
+    # kept if they are in between the starting and ending dates, either of
+    # which may be None, and are not looked for at all if matchDates is False.
+    # The documents can be limited to a source. For every hit it yields the
+    # record, the name of the institution, the page number, the key information
+    # and the sentence containing it, document by document in the order they
+    # were first indexed.
+    def search(self, listOfKeywords=(), startDate=None, endDate=None,
+               source=None, matchDates=True):
+
+        # This variable stores the keywords compiled once for all the
+        # sentences.
+        matcher = TextMatcher(listOfKeywords, matchDates=False)
+
+        # These variables store the ordinals of the date filters.
+        startOrdinal = (startDate.toordinal() if startDate is not None else
+                        date.min.toordinal())
+        endOrdinal = (endDate.toordinal() if endDate is not None else
+                      date.max.toordinal())
+
+        # These lists store the queries finding the candidate sentences and
+        # their parameters.
+        listOfQueries = []
+        parameters = []
+        if matchDates:
+            listOfQueries.append("SELECT id FROM sentences WHERE dateOrdinal "
+                                 "BETWEEN ? AND ?")
+            parameters += [startOrdinal, endOrdinal]
+        if matcher.listOfKeywords:
+            if self.hasTrigrams and min(len(keyword) for keyword in
+                                        matcher.listOfKeywords) >= 3:
+                listOfQueries.append("SELECT rowid FROM sentenceTrigrams "
+                                     "WHERE sentenceTrigrams MATCH ?")
+                parameters.append(" OR ".join(getPhraseQuery(keyword) for
+                                              keyword in
+                                              matcher.listOfKeywords))
+            else:
+                listOfQueries.append("SELECT id FROM sentences")
+        if listOfQueries == []:
+            return
+
+        # This variable stores the query returning the candidate sentences in
+        # the order of the documents and of their pages.
+        query = ("SELECT documents.record, documents.institution, "
+                 "sentences.page, sentences.text, sentences.dateText, "
+                 "sentences.dateOrdinal FROM sentences JOIN documents ON "
+                 "documents.id = sentences.document WHERE sentences.id IN (" +
+                 " UNION ".join(listOfQueries) + ")")
+        if source is not None:
+            query += " AND documents.source = ?"
+            parameters.append(source)
+        query += (" ORDER BY documents.id, sentences.page, "
+                  "sentences.sentenceStart")
+
+        with self.lock:
+            rows = self.connection.execute(query, parameters).fetchall()
+
+        # We check every candidate sentence. The date is reported first,
+        # followed by every keyword it contains in the order of the list of
+        # keywords.
+        for record, institutionName, pageNumber, text, dateText, \
+                dateOrdinal in rows:
+            sentence = text.replace('\n', ' ')
+            if matchDates and dateOrdinal is not None and \
+                    startOrdinal <= dateOrdinal <= endOrdinal:
+                yield (record, institutionName, pageNumber,
+                       dateText.replace('\n', ' '), sentence)
+            for sentenceStart, sentenceEnd, dateMatch, position in \
+                    matcher.iterMatchOffsets(text):
+                yield (record, institutionName, pageNumber,
+                       matcher.listOfKeywords[position], sentence)
+
+    # This function is used to close the database.
+    def close(self):
+        with self.lock:
+            self.connection.close()
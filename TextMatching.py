@@ -0,0 +1,201 @@
+"""
+SHARED TEXT MATCHING
+
+The matching engine used by both the generalised code and the code specific for
+each regulator to look for dates and keywords in the text of a page. The date
+pattern is compiled once, and all the keywords are compiled once into a single
+regular expression shaped like a trie, so every date and every keyword in a page
+is found in one pass over its text instead of running the date pattern and
+every keyword against every sentence. The text is split into sentences by the
+segmenter of Sentences.py.
+"""
+
+# Importing the previously installed libraries.
+import re
+from bisect import bisect_right
+from datetime import date
+from Sentences import getSentenceOffsets
+
+
+# This variable stores the pattern of the dates we are looking for, such as
+# "June 3, 2019". The month, the day and the year are captured separately so
+# that the date can be converted without parsing the text again.
+DATE_PATTERN = re.compile(r'((January|February|March|April|May|June|July|' +
+                          'August|September|October|November|December' +
+                          r')\s+(\d{1,2}),\s+(\d{4}))')
+
+# This dictionary stores the number of every month.
+MONTH_NUMBERS = {month: number for number, month in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July", "August",
+     "September", "October", "November", "December"], 1)}
+
+
+# This function is used to build a regular expression that matches any of the
+# words provided as an argument. The words are stored in a trie and the
+# expression follows the shape of the trie, so the regular expression engine
+# only ever tries the characters that can continue a word instead of trying
+# every word at every position. The longest word is always preferred.
+def buildTriePattern(words):
+
+    # This dictionary stores the trie. The empty string marks the end of a word.
+    trie = {}
+    for word in words:
+        node = trie
+        for character in word:
+            node = node.setdefault(character, {})
+        node[""] = {}
+
+    # This function turns a node of the trie into a regular expression.
+    def getPattern(node):
+        alternatives = [re.escape(character) + getPattern(child)
+                        for character, child in sorted(node.items())
+                        if character != ""]
+        if alternatives == []:
+            return ""
+        pattern = (alternatives[0] if len(alternatives) == 1 else
+                   "(?:" + "|".join(alternatives) + ")")
+
+        # If a word ends here, continuing is optional. The group is greedy so
+        # the longest word is tried first.
+        if "" in node:
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return getPattern(trie)
+
+
+class TextMatcher:
+
+    # This function is used to compile the list of keywords provided as an
+    # argument. Empty keywords are ignored. Dates are only looked for if
+    # matchDates is True.
+    def __init__(self, listOfKeywords=(), matchDates=True):
+        self.listOfKeywords = [keyword for keyword in listOfKeywords
+                               if keyword != ""]
+        self.matchDates = matchDates
+
+        # This dictionary maps every lowercase keyword to the positions of the
+        # keywords in the list that are spelled that way, ignoring the case.
+        self.keywordPositions = {}
+        for position, keyword in enumerate(self.listOfKeywords):
+            self.keywordPositions.setdefault(keyword.lower(), []).append(
+                position)
+
+        # This dictionary maps every lowercase keyword to the keywords that are
+        # a prefix of it (including itself), as tuples of their length and
+        # their positions. When the longest keyword starting at a position is
+        # found, these are all the keywords starting at that position.
+        self.prefixes = {}
+        for keyword in self.keywordPositions:
+            self.prefixes[keyword] = [(length,
+                                       self.keywordPositions[keyword[:length]])
+                                      for length in range(1, len(keyword) + 1)
+                                      if keyword[:length] in
+                                      self.keywordPositions]
+
+        # These variables store the expression matching every keyword in
+        # lowercase text, and the same expression ignoring the case for the
+        # rare texts whose length changes when they are lowercased.
+        self.keywordPattern = None
+        self.caselessKeywordPattern = None
+        if self.keywordPositions:
+            triePattern = buildTriePattern(self.keywordPositions)
+            self.keywordPattern = re.compile(triePattern)
+            self.caselessKeywordPattern = re.compile(triePattern,
+                                                     re.IGNORECASE)
+
+    # This function is used to find the dates and keywords in the text of a page
+    # provided as an argument. The text is split into sentences by the
+    # segmenter, and for every sentence with a hit it yields the sentence, a
+    # boolean value to indicate if the key information is a date (True if it
+    # is a date) and the key information itself. For every sentence, the first
+    # date is reported first, followed by every keyword it contains in the
+    # order of the list of keywords.
+    def iterMatches(self, text):
+        for sentenceStart, sentenceEnd, dateMatch, position in \
+                self.iterMatchOffsets(text):
+            if dateMatch is not None:
+                yield (text[sentenceStart:sentenceEnd], True,
+                       dateMatch.group(1))
+            else:
+                yield (text[sentenceStart:sentenceEnd], False,
+                       self.listOfKeywords[position])
+
+    # This function is used to find the same hits as iterMatches without
+    # copying any text. For every hit it yields the position where the sentence
+    # starts and ends in the text, followed by the match of the date and None
+    # for a date, or by None and the position of the keyword in the list of
+    # keywords for a keyword.
+    def iterMatchOffsets(self, text):
+
+        # These lists store the position where each sentence starts, and the
+        # position where each sentence ends.
+        sentenceStarts, sentenceEnds = getSentenceOffsets(text)
+
+        # These dictionaries store the first date and the positions of the
+        # keywords found in each sentence.
+        dates = {}
+        keywords = {}
+
+        # We find all the dates in one pass. A date can never cross the end of a
+        # sentence since it does not contain a period.
+        if self.matchDates:
+            for match in DATE_PATTERN.finditer(text):
+                sentence = bisect_right(sentenceStarts, match.start()) - 1
+                if sentence not in dates:
+                    dates[sentence] = match
+
+        # We find all the keywords in one pass over the lowercase text, which is
+        # much faster than ignoring the case in the expression. After each
+        # match, the search continues from the next character rather than from
+        # the end of the match, so that overlapping keywords are found too. For
+        # every position where a keyword starts, we keep the keywords that end
+        # within the sentence.
+        if self.keywordPattern is not None:
+            searchedText = text.lower()
+            keywordPattern = self.keywordPattern
+            if len(searchedText) != len(text):
+                searchedText = text
+                keywordPattern = self.caselessKeywordPattern
+            match = keywordPattern.search(searchedText)
+            while match is not None:
+                start = match.start()
+                sentence = bisect_right(sentenceStarts, start) - 1
+                for length, positions in self.prefixes.get(
+                        match.group().lower(), []):
+                    if start + length > sentenceEnds[sentence]:
+                        break
+                    keywords.setdefault(sentence, set()).update(positions)
+                match = keywordPattern.search(searchedText, start + 1)
+
+        # We report the hits sentence by sentence.
+        for sentence in sorted(set(dates) | set(keywords)):
+            if sentence in dates:
+                yield (sentenceStarts[sentence], sentenceEnds[sentence],
+                       dates[sentence], None)
+            for position in sorted(keywords.get(sentence, ())):
+                yield (sentenceStarts[sentence], sentenceEnds[sentence], None,
+                       position)
+
+
+# This function is used to convert the match of a date provided as an argument
+# into its ordinal, the number of days since January 1 of year 1, so that dates
+# can be compared as integers. It returns None for impossible dates such as
+# "February 30, 2019".
+def getDateOrdinal(dateMatch):
+    try:
+        return date(int(dateMatch.group(4)), MONTH_NUMBERS[dateMatch.group(2)],
+                    int(dateMatch.group(3))).toordinal()
+    except ValueError:
+        return None
+
+
+# This function is used to read the date written in the text provided as an
+# argument, such as the key information of a row of the output. It returns None
+# if the text is not a date or if the date is impossible.
+def getDateFromText(text):
+    dateMatch = DATE_PATTERN.fullmatch(text)
+    if dateMatch is None:
+        return None
+    ordinal = getDateOrdinal(dateMatch)
+    return date.fromordinal(ordinal) if ordinal is not None else None
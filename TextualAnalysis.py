@@ -0,0 +1,180 @@
+"""
+LIBRARY
+
+The functions of the generalised code and of the code specific for each
+regulator, gathered so they can be imported and used from another program. The
+functions take explicit paths, bytes or streams instead of reading fixed file
+names from the current directory, and return Hit records instead of writing
+Output.csv. Importing this module is cheap: pandas, requests and the OCR stack
+are only imported by the functions that need them, so a program that only looks
+for dates and keywords in text it already has never loads them.
+
+Steps for Using the Library:
+1. Import the module from the folder containing the code, for instance with from TextualAnalysis import analyzePDF.
+2. Call analyzePDF with the path, the bytes or an open binary file of a PDF, the keywords and the date filters to obtain the hits of the document.
+3. Call findKeyInformation with the text of a page to look for dates and keywords without any OCR, or analyzeDataFile and analyzeIdentifiers to process Data.csv or a list of identifiers and write the output files like the scripts do.
+4. Call searchTextIndex with the text index written by earlier runs to search for other keywords and dates without processing the PDFs again.
+"""
+
+# Importing the previously installed libraries.
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from Hits import Hit, isInDateRange, iterPageHits
+
+
+# This variable stores the version of the code.
+__version__ = "2.0.0"
+
+
+# This function is used to find the dates and keywords in the text of a page
+# provided as an argument. It returns a list of hits in the order they appear,
+# each giving its pageNumber, isDate, keyInformation, sentence and date. A
+# TextMatcher compiled once can be provided instead of the list of keywords
+# when many pages are searched for the same keywords.
+def findKeyInformation(text, listOfKeywords=(), pageNumber=None, matcher=None):
+    from TextMatching import TextMatcher
+    if matcher is None:
+        matcher = TextMatcher(listOfKeywords)
+    return list(iterPageHits((pageNumber, text), matcher))
+
+
+# This function is used to obtain the path of the PDF provided as an argument,
+# which can be a path, the bytes of the PDF or a binary file opened for reading.
+# Bytes and files are written to a temporary workspace that is removed once the
+# with statement using this function ends.
+@contextmanager
+def openPDF(source):
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+
+    from Workspace import Workspace
+    with Workspace() as workspace:
+        pdf = workspace.getPath("document.pdf")
+        with open(pdf, 'wb') as file:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                file.write(source)
+            else:
+                for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                    file.write(chunk)
+        yield pdf
+
+
+# This function is used to obtain the text of every page of the PDF provided as
+# an argument, which can be a path, bytes or a binary file. It returns a list
+# with the text of each page in order. Pages with a usable text layer are read
+# directly and the other pages are recognized using OCR, rendered at the given
+# resolution or at the lowest one that gives a confident result. If a
+# pageCounts dictionary is provided, the number of pages that took each path is
+# added to it.
+def getPageTexts(source, dpi="adaptive", pageWindow=4, useTextLayer=True,
+                 pageCounts=None):
+    from PDFProcessing import iterPageTexts
+    with openPDF(source) as pdf:
+        return [text for pageNumber, text in
+                iterPageTexts(pdf, dpi, pageWindow, useTextLayer, pageCounts)]
+
+
+# This function is used to find the dates and keywords mentioned in the PDF
+# provided as an argument, which can be a path, bytes or a binary file. Dates
+# are only kept if they are in between the starting and ending dates, when they
+# are provided. It returns a list of hits in the order of the pages.
+def analyzePDF(source, listOfKeywords=(), startDate=None, endDate=None,
+               dpi="adaptive", pageCounts=None):
+    from TextMatching import TextMatcher
+
+    # This variable stores the dates and keywords compiled once for all the
+    # pages.
+    matcher = TextMatcher(listOfKeywords)
+
+    # These variables store the ordinals of the date filters.
+    startOrdinal = startDate.toordinal() if startDate is not None else None
+    endOrdinal = endDate.toordinal() if endDate is not None else None
+
+    # This list stores the hits we keep.
+    listOfHits = []
+    for pageNumber, text in enumerate(getPageTexts(source, dpi,
+                                                   pageCounts=pageCounts), 1):
+        listOfHits.extend(hit for hit in
+                          findKeyInformation(text, pageNumber=pageNumber,
+                                             matcher=matcher)
+                          if isInDateRange(hit, startOrdinal, endOrdinal))
+
+    return listOfHits
+
+
+# This function is used to process every record of the data file provided as an
+# argument, which has the same columns as Data.csv, and write the output file,
+# like the generalised code does. The PDFs are read from pdfDirectory, or
+# downloaded into a temporary workspace if download is True. If deduplicate is
+# True, the repeated hits of a record are only written once. If a columnar
+# output directory is provided, the output is also written there as Parquet or
+# Arrow files partitioned by regulator and by year. If a text index file is
+# provided, the text of the PDFs is added to it for searchTextIndex.
+def analyzeDataFile(dataFile, startDate=None, endDate=None, listOfKeywords=(),
+                    outputFile='Output.csv', pdfDirectory=".", download=False,
+                    workers=1, journalFile=None, stateFile=None,
+                    deduplicate=False, columnarOutput=None,
+                    columnarFormat="parquet", textIndexFile=None):
+    from Workspace import Workspace
+    from TextualAnalysisForAnyRegulator import getDataFromDataframe
+
+    workspace = Workspace() if download else None
+    try:
+        getDataFromDataframe(startDate or datetime.min, endDate or datetime.max,
+                             list(listOfKeywords), workers,
+                             workspace.directory if workspace is not None else
+                             pdfDirectory, outputFile, journalFile=journalFile,
+                             stateFile=stateFile, download=download,
+                             dataFile=dataFile, deduplicate=deduplicate,
+                             columnarOutput=columnarOutput,
+                             columnarFormat=columnarFormat,
+                             textIndexFile=textIndexFile)
+    finally:
+        if workspace is not None:
+            workspace.close()
+
+
+# This function is used to process the FDIC docket numbers, OCC order numbers or
+# FED URLs provided as an argument and write the output and status files, like
+# the code specific for each regulator does. The data of the regulator is read
+# from the given data file, or from its usual file if none is provided. Only the
+# dates from the minimum year onwards are kept, and the output can also be
+# written to a columnar output directory and the text of the documents to a
+# text index like analyzeDataFile does.
+def analyzeIdentifiers(regulatorName, listOfIdentifiers, dataFile=None,
+                       outputFile='Output.csv', statusFile='Status.csv',
+                       stateFile=None, minimumYear=1990, columnarOutput=None,
+                       columnarFormat="parquet", textIndexFile=None):
+    from TextualAnalysisForSpecificRegulator import getDataForIdentifiers
+    getDataForIdentifiers(regulatorName, listOfIdentifiers, outputFile,
+                          statusFile, stateFile, dataFile, minimumYear,
+                          columnarOutput, columnarFormat, textIndexFile)
+
+
+# This function is used to find the dates and keywords in the documents already
+# added to the text index file provided as an argument, without processing any
+# PDF again. Dates are only kept if they are in between the starting and ending
+# dates, when they are provided, and the documents can be limited to a source
+# such as "Data.csv" or "FDIC". It returns a list of the record, the name of
+# the institution, the page number, the key information and the sentence of
+# every hit.
+def searchTextIndex(textIndexFile, listOfKeywords=(), startDate=None,
+                    endDate=None, source=None, matchDates=True):
+    from TextIndex import TextIndex
+    textIndex = TextIndex(textIndexFile)
+    try:
+        return list(textIndex.search(listOfKeywords, startDate, endDate, source,
+                                     matchDates))
+    finally:
+        textIndex.close()
+
+
+# This function is used to find the rows of the data of the regulator with the
+# name provided as an argument that refer to the given FDIC docket number, OCC
+# order number or FED URL, without downloading anything. Every row is a
+# dictionary of the columns that are used.
+def lookupDocuments(regulatorName, identifier, dataFile=None):
+    from TextualAnalysisForSpecificRegulator import loadRegulatorData
+    return loadRegulatorData(regulatorName, dataFile).lookup(identifier)
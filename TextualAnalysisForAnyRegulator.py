@@ -3,291 +3,569 @@ GENERALISED CODE
 
 Steps for Executing Code For All Regulators:
 1. Upload the CSV file containing the relevant data from different regulators and rename it to Data.csv. The CSV file should only contain the case sensitive headers Record ID, Institution Name and Link to File.
-2. Create a new empty folder called Pages. This will store all the converted pages of the downloaded PDF file in an image format.
-3. Execute the main part of the code and provide filters for the starting date, the ending date, as well as for a specific keyword if necessary.
+2. Execute the main part of the code and provide filters for the starting date, the ending date, as well as for a specific keyword if necessary.
+3. If a run is interrupted, execute the code again with the same filters. The records already completed are recorded in Output.journal and are not processed again. A run with other filters, another data file or another output file starts Output.journal again.
+4. Alternatively, execute the code with command line arguments to run it without any prompts, for instance python TextualAnalysisForAnyRegulator.py --download --start 01/01/2015 --end 31/12/2020 --keywords "Wyomissing;Reginald". Execute python CommandLine.py any --help to see every option.
+5. When Data.csv is updated, execute the code again with the same filters. Only the records that were added or whose link changed since the last run are downloaded and processed, and the records removed from Data.csv are dropped from Output.csv.
+6. The text of every PDF that is processed is kept in a text index, so other keywords and dates can be searched for without processing the PDFs again, for instance python CommandLine.py search --start 01/01/2015 --end 31/12/2020 --keywords "Wyomissing;Reginald".
 """
 
-# Importing the previously installed libraries.
-import sys, os, re, requests, pytesseract, urllib.request, pandas as pd
-from PyPDF2 import PdfFileMerger, PdfFileReader
-from pdf2image import convert_from_path
-from urllib.parse import urljoin
+# Importing the previously installed libraries. pandas and the libraries used
+# for reading the data, downloading and OCR are only imported when they are
+# needed.
+import sys, os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from bs4 import BeautifulSoup
-from PIL import Image
-
-
-# This function is used to download all the PDFs from a given CSV file and 
-# returns a list of the names of all the PDFs that have been downloaded.
-def downloadPDFs():
-
-    # We read the data and load it using pandas into a dataframe.
-    dataframe = pd.read_csv("Data.csv")
-
-    # We iterate through all the rows in the dataframe.
-    for index, row in dataframe.iterrows():
-
-        # This variable stores the link to the PDF file.
-        link = row["Link to File"]
+from Downloading import downloadFile, getPDFLinks, printDownloadReport
+from Hits import HitColumns, iterDocumentHits, printInstitutionSummary
+from Instrumentation import measureRecord, setDocumentRecord, stage
+from Journal import RunJournal
+from PDFProcessing import iterDocumentTexts, iterPageTexts
+from Results import ResultBuilder
+from RunState import RunState, STATE_FILE, getFingerprint
+from Sentences import SEGMENTER_VERSION
+from SourceReader import iterSourceRows
+from TextIndex import TextIndex, TEXT_INDEX_FILE
+from TextMatching import TextMatcher, getDateFromText
+from Workspace import Workspace, getTemporaryFileName
+
+
+# This variable stores the columns of Data.csv that are used.
+DATA_COLUMNS = ["Record ID", "Institution Name", "Link to File"]
+
+
+# This function is used to find the link to the PDF of a row of Data.csv
+# provided as an argument.
+def getRecordLink(row):
+
+    # This variable stores the link to the PDF file.
+    link = row["Link to File"]
+
+    # We modify the link if it is incomplete (links from the FED tend to be 
+    # incomplete).
+    if link[:5] != "https":
+        link = "https://www.federalreserve.gov/" + link
+
+    return link
+
+
+# This dictionary stores the regulator of the links of every website.
+REGULATOR_HOSTS = {"occ.gov": "OCC", "fdic.gov": "FDIC",
+                   "federalreserve.gov": "FED"}
+
+
+# This function is used to find the regulator that published the PDF of a row
+# of Data.csv provided as an argument from the website of its link. It returns
+# None if the website is not one of the regulators.
+def getRecordRegulator(row):
+    from urllib.parse import urlparse
+    host = urlparse(getRecordLink(row)).netloc.lower()
+    for website, regulatorName in REGULATOR_HOSTS.items():
+        if host == website or host.endswith("." + website):
+            return regulatorName
+    return None
+
+
+# This function is used to compute the fingerprint of a row of Data.csv provided
+# as an argument from its Record ID and its link. If the PDFs are not
+# downloaded, the size and modification time of the local PDF in the given
+# directory are included too, or the name, size and modification time of every
+# part of a document made of several PDFs, so that a PDF or a part replaced
+# locally is processed again.
+def getRecordFingerprint(row, directory=".", download=True):
+    uniqueID = str(row["Record ID"])
+    if download:
+        return getFingerprint(uniqueID, getRecordLink(row))
+    document = getRecordDocument(directory, uniqueID)
+    if isinstance(document, tuple):
+        listOfStatuses = []
+        for part in document:
+            status = os.stat(part) if os.path.exists(part) else None
+            listOfStatuses.append((os.path.basename(part), status and
+                                   (status.st_size, status.st_mtime_ns)))
+        return getFingerprint(uniqueID, getRecordLink(row), listOfStatuses)
+    status = os.stat(document) if os.path.exists(document) else None
+    return getFingerprint(uniqueID, getRecordLink(row), status and
+                          (status.st_size, status.st_mtime_ns))
+
+
+# This function is used to download all the PDFs from a given CSV file into the
+# given directory and returns the timing of every file that has been downloaded.
+# The records are downloaded by the number of threads given as an argument,
+# sharing one pooled session per host. If a list of unique IDs is provided, only
+# those records are downloaded. The records are streamed from the given data
+# file, unless its rows have already been read and are provided as a list.
+def downloadPDFs(workers=8, directory=".", listOfIDs=None, dataFile="Data.csv",
+                 listOfRows=None):
+
+    # This list stores the link, the unique ID and the regulator of every row.
+    listOfRecords = []
+
+    # This variable stores the unique IDs of the records to download.
+    if listOfIDs is not None:
+        listOfIDs = set(listOfIDs)
+
+    # We iterate through all the rows of the data file.
+    if listOfRows is None:
+        listOfRows = iterSourceRows(dataFile, DATA_COLUMNS)
+    for row in listOfRows:
 
         # This variable stores the unique ID of the row.
         uniqueID = str(row["Record ID"])
 
-        # We modify the link if it is incomplete (links from the FED tend to be 
-        # incomplete).
-        if link[:5] != "https":
-            link = "https://www.federalreserve.gov/" + link
-
-        # If the link provided in the argument of the function is a webpage 
-        # instead of a link that directly leads to a PDF download, we handle it 
-        # differently using a Python library called Beautiful Soup. This helps 
-        # us pull data out of HTML files.
-        if link[-3:] == "htm":
+        # We add the record to the list of records to download.
+        if listOfIDs is None or uniqueID in listOfIDs:
+            listOfRecords.append((getRecordLink(row), uniqueID,
+                                  getRecordRegulator(row)))
+
+    # We download the records at the same time and collect the timing of every
+    # file that has been downloaded.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        listOfTimings = [timing for timings in
+                         executor.map(lambda record: downloadRecord(
+                                          record[0], record[1], directory,
+                                          record[2]),
+                                      listOfRecords)
+                         for timing in timings]
+
+    # We display the timing of every file.
+    printDownloadReport(listOfTimings)
+
+    return listOfTimings
+
+
+# This function is used to download the PDF for the link provided as an argument
+# and save it in the given directory using the unique ID of its record. It
+# returns the timing of every file that has been downloaded. A record that
+# cannot be downloaded is reported without stopping the other downloads, and
+# its missing PDF is reported again when the records are processed. The
+# downloads count for the record and its regulator in the run report.
+def downloadRecord(link, uniqueID, directory=".", regulatorName=None):
+    try:
+        with measureRecord(uniqueID, regulatorName):
+            return downloadRecordFiles(link, uniqueID, directory)
+    except Exception as error:
+        print("The PDF of the record with the Record ID " + uniqueID +
+              " could not be downloaded: " + repr(error))
+        return []
+
+
+# This function is used to download the files of the record with the unique ID
+# provided as an argument into the given directory.
+def downloadRecordFiles(link, uniqueID, directory="."):
+
+    # This variable stores the path of the PDF without its extension.
+    path = os.path.join(directory, uniqueID)
+
+    # If the link provided in the argument of the function is a webpage 
+    # instead of a link that directly leads to a PDF download, we handle it 
+    # differently using a Python library called Beautiful Soup. This helps 
+    # us pull data out of HTML files.
+    if link[-3:] == "htm":
+
+        # Some webpages may contain multiple PDFs, so we name the PDF files 
+        # using the unique ID and a counter to rename the different files 
+        # uniquely. Each file is streamed to disk as it is downloaded.
+        listOfLinks = getPDFLinks(link)
+        listOfFiles = [uniqueID + "-" + str(counter) + ".pdf"
+                       for counter in range(1, len(listOfLinks) + 1)]
+        listOfTimings = [downloadFile(pdfLink, os.path.join(directory,
+                                                            fileName))
+                         for pdfLink, fileName in zip(listOfLinks,
+                                                      listOfFiles)]
+
+        # Instead of merging the files into one PDF, we record the files that
+        # make up the document, which are read one after another as one
+        # document when it is processed.
+        writeDocumentParts(directory, uniqueID, listOfFiles)
 
-            # This is used to open the link provided as an argument to the 
-            # function.
-            response = requests.get(link)
-
-            # This variable obtains the HTML code for the webpage.
-            soup = BeautifulSoup(response.text, "html.parser")    
+    else:
 
-            # Some webpages may contain multiple PDFs and this variable is used 
-            # as a counter to rename the different files uniquely.
-            counter = 1
+        # We stream the PDF to disk using its unique ID as its file name.
+        listOfTimings = [downloadFile(link, path + ".pdf")]
 
-            # We iterate through all the PDFs available in the webpage.  
-            for url in soup.select("a[href$='.pdf']"):
+    return listOfTimings
 
-                # We name the PDF files using the last portion of each link 
-                # which are unique.
-                fileName = uniqueID + "-" + str(counter) + ".pdf"
 
-                # If the file has successfully been downloaded, we make a note 
-                # of it.
-                with open(fileName, 'wb') as f:
-                    f.write(requests.get(urljoin(link, url['href'])).content)
+# This function is used to record the names of the PDF files provided as an
+# argument as the parts of the document of the record with the given unique ID.
+# They are written to a file next to them named after the unique ID with a
+# ".parts" extension, one name per line.
+def writeDocumentParts(directory, uniqueID, listOfFiles):
+    partsFile = os.path.join(directory, uniqueID + ".parts")
+    temporaryFileName = getTemporaryFileName(partsFile)
+    with open(temporaryFileName, 'w', encoding='utf-8') as file:
+        file.writelines(fileName + "\n" for fileName in listOfFiles)
+    os.replace(temporaryFileName, partsFile)
 
-                # We increment the counter variable for every PDF that is 
-                # downloaded from a specific web page.
-                counter += 1
 
-            # This object is used to merge several different PDFs obtained from
-            # one link into one PDF that can be processed.
-            mergedObject = PdfFileMerger()
+# This function is used to find the document of the record with the unique ID
+# provided as an argument in the given directory. It is the PDF named after the
+# unique ID, or the tuple of the PDFs that make it up if the record links to a
+# webpage with several PDFs.
+def getRecordDocument(directory, uniqueID):
+    partsFile = os.path.join(directory, uniqueID + ".parts")
+    if os.path.exists(partsFile):
+        with open(partsFile, encoding='utf-8') as file:
+            return tuple(os.path.join(directory, line.strip()) for line in file
+                         if line.strip() != "")
+    return os.path.join(directory, uniqueID + ".pdf")
 
-            # Every file is saved with its unique ID as well as a number to 
-            # identify how many files are associated with that unique ID.
-            for fileNumber in range(1, counter):
-                mergedObject.append(PdfFileReader(uniqueID + "-" + 
-                                                str(fileNumber) + '.pdf', 'rb'))
- 
-            # We store the merged file with its unique ID as its file name.
-            mergedObject.write(uniqueID + ".pdf")
 
-        else:
+# This function is used to convert the different pages of the PDF with the name 
+# provided as an argument into text which can be processed to look for dates. 
+# It also takes a keyword filter as an argument to look for the keyword in the
+# PDF. Pages with a usable text layer are read directly, and the remaining pages
+# are rendered and recognized pageWindow at a time, so the memory used does not
+# grow with the length of the document. Each page is rendered at the lowest
+# resolution that gives a confident OCR result. The number of pages that took
+# each path is added to the pageCounts dictionary if one is provided.
+def processPDF(pdfFile, listOfKeywords, pageWindow=4, pageCounts=None):
 
-            # This is used to open the link provided as an argument to the 
-            # function.
-            response = urllib.request.urlopen(link)
+    # Name of the PDF file.
+    pdf = pdfFile + ".pdf"
 
-            # This opens the file in a binary-write mode.    
-            file = open(uniqueID + ".pdf", 'wb')
+    # We look for the key information in the text of each page of the PDF, which
+    # is either read from its text layer or recognized by passing the page to
+    # pytesseract straight from memory.
+    return processText((text for pageNumber, text in
+                        iterPageTexts(pdf, "adaptive", pageWindow,
+                                      pageCounts=pageCounts)),
+                       TextMatcher(listOfKeywords))
 
-            # If the file has successfully been downloaded, we make a note of 
-            # it.
-            file.write(response.read())
 
-            # We close the file.
-            file.close()
+# This function is used to look for dates and keywords in the text of the pages
+# of a PDF provided as an argument. It also takes a matcher compiled from the
+# keyword filter as an argument to look for the keywords in the text.
+def processText(pageTexts, matcher):
 
+    # This list stores a hit for every sentence that contains a date or a
+    # keyword mentioned in the PDF. Each hit records whether the key information
+    # is a date, the date already converted to an ordinal and the position of
+    # the sentence in the text of its page, so no sentence is copied until it
+    # is written to the output.
+    return list(iterDocumentHits(pageTexts, matcher))
 
-# This function is used to convert the different pages of the PDF with the name 
-# provided as an argument into images which can be processed to look for dates. 
-# It also takes a keyword filter as an argument to look for the keyword in the
-# PDF. 
-def processPDF(pdfFile, listOfKeywords):
 
-    # Name of the PDF file.
-    pdf = pdfFile + ".pdf"
+# This function is used to keep the rows of the output found in the list of
+# hits provided as an argument. Keywords are always kept, whereas dates are only
+# kept if they are in between the starting and ending date filters. Each row is
+# a list of the key information and the sentence containing it. If deduplicate
+# is True, a sentence repeated with the same key information, such as a header
+# printed on every page, is only kept once.
+def getOutputRows(listOfHits, startDate, endDate, deduplicate=False):
 
-    # This variable stores all the pages of the PDF.
-    pages = convert_from_path(pdf, 500)
-
-    # This variable is a counter to store each page of the PDF to an image.
-    imageCounter = 1
-
-    # We iterate through all the pages stored above.
-    for page in pages:
-
-        # We are specifying the file name for each page of the PDF to be stored 
-        # as its corresponding image file. For instance, page 1 of the PDF will 
-        # be stored as an image with the name Page 1.jpg in the Pages folder.
-        fileName = "Pages/Page " + str(imageCounter) + ".jpg"
-
-        # This will save the image of the page in our system.
-        page.save(fileName, 'JPEG')
-
-        # This will increment the image counter to show how many images we have.
-        imageCounter = imageCounter + 1
-
-    # This variable stores the total number of pages we have in our file.
-    fileLimit = imageCounter - 1
-
-    # This list of sentences stores the sentence that contains a date or a 
-    # keyword mentioned in the PDF. It is a list of lists with the first element  
-    # being a boolean value to indicate if the key information is a date or not 
-    # (True if it is a date), the second element being the sentence and the 
-    # third element being the date only if the first element is True.
-    listOfSentencesWithKeyInformation = []
-
-    # We iterate again from 1 to the total number of pages in the PDF.
-    for i in range(1, fileLimit + 1):
-
-        # We set the file name to recognize text from the respective image of 
-        # each page. Again, these files will be Page 1.jpg, Page 2.jpg, etc.
-        fileName = "Pages/Page " + str(i) + ".jpg"
-
-        # This recognizes the text as a string from the image using pytesseract.
-        text = str(((pytesseract.image_to_string(Image.open(fileName)))))
-
-        # This variable stores the recognized text. In many PDFs, at the ending 
-        # of a line, if a word cannot be written fully, a 'hyphen' is added and
-        # the rest of the word is written in the next line. We are removing 
-        # that.
-        text = text.replace('-\n', '')
-
-        # We split the text up into a list of different sentences.
-        sentences = text.split(". ")
-
-        # We iterate through all the sentences.
-        for sentence in sentences:
-
-            # The date variable stores the date that occurs in the current 
-            # sentence we are looking at and stores it as a list using regular 
-            # expression.
-            date = re.findall(r'((January|February|March|April|May|June|July|' + 
-                           'August|September|October|November|December' + 
-                           ')\s+\d{1,2},\s+\d{4})', sentence)
-            
-            # We are checking if the current sentence does contain a date.
-            if date != []:
-                
-                # We add the sentence and the date in the form of a list to the 
-                # listOfSentencesWithKeyInformation variable.
-                listOfSentencesWithKeyInformation.append([True, 
-                                                sentence.replace('\n', ' '), 
-                                                date[0][0].replace('\n', ' ')])
-                
-            # We are checking if the current sentence does contain the keyword.    
-            if (listOfKeywords != ['']):
-
-                # We iterate through all the keywords in the list of keywords to
-                # check each of them.
-                for keyword in listOfKeywords:
-
-                    # We are checking if the current keyword is present in the
-                    # current sentence.
-                    if (keyword.lower() in sentence.lower()):
-
-                        # We add the sentence along with the keyword that it 
-                        # contains in the form of a list to the 
-                        # listOfSentencesWithKeyInformation variable.
-                        listOfSentencesWithKeyInformation.append([False, 
-                                        sentence.replace('\n', ' '), keyword])
-
-    # We are returning the listOfSentencesWithKeyInformation so it can be 
-    # presented in a CSV file.
-    return listOfSentencesWithKeyInformation
+    # We compare the dates of all the hits at once in columns.
+    hitColumns = HitColumns(listOfHits)
+    return hitColumns.getRows(hitColumns.getDateMask(startDate, endDate),
+                              deduplicate)
 
 
 # This function is used to read all PDFs obtained from a CSV file and output the 
 # relevant information after considering the appropriate filters given as input. 
-# The output should be in the form of a CSV file. 
-def getDataFromDataframe(startDate, endDate, listOfKeywords):
+# The output should be in the form of a CSV file. The pages of all the PDFs are
+# processed by the number of worker processes given as an argument, and the
+# results are put back together in the same order as the rows of Data.csv. The
+# PDFs are read from the given directory and the output is written to the given
+# output file. A record whose PDF cannot be read is reported and skipped
+# without stopping the run. If a journal file is provided, every completed
+# record is recorded in it as soon as it is processed, and a run that was
+# interrupted is resumed by skipping the records already completed. The journal
+# is removed once every record has been completed. If a state file is provided,
+# the records whose Record ID and link have not changed since an earlier run
+# with the same filters are taken from it instead of being processed again. If
+# download is True, the PDFs of the records that need to be processed are
+# downloaded into the given directory first. The records are read from the given
+# data file, which has the same columns as Data.csv. If deduplicate is True, the
+# repeated hits of a record are only written once. If a columnar output
+# directory is provided, the output is also written there in the given format
+# ("parquet" or "arrow"), partitioned by regulator and by year. If a text index
+# file is provided, the text of every PDF that is processed is added to the
+# index, so that other keywords and dates can be searched for later without
+# processing the PDFs again.
+def getDataFromDataframe(startDate, endDate, listOfKeywords, workers=1,
+                         directory=".", outputFile='Output.csv',
+                         journalFile=None, stateFile=None, download=False,
+                         dataFile="Data.csv", deduplicate=False,
+                         columnarOutput=None, columnarFormat="parquet",
+                         textIndexFile=None):
    
-    # We read the data and load it using pandas into a dataframe.
-    dataframe = pd.read_csv("Data.csv")
-
-    # We create an appropriate output dataframe with four different columns as 
-    # requested.
-    outputDataframe = pd.DataFrame(columns=['Record ID', 'Name of Institution',
-                                            'Key Information', 'Sentence Cont' + 
-                                            'aining Key Information'])
+    # This list stores every row of the data file, keeping only the columns
+    # that are used, and these dictionaries store the fingerprint and the
+    # regulator of every row. The data file is parsed only once, in chunks, and
+    # the same rows are used to download and to process the records.
+    listOfRows = []
+    fingerprints = {}
+    regulators = {}
+    with stage("readData"):
+        for row in iterSourceRows(dataFile, DATA_COLUMNS):
+            uniqueID = str(row["Record ID"])
+            fingerprints[uniqueID] = getRecordFingerprint(row, directory,
+                                                          download)
+            regulators[uniqueID] = getRecordRegulator(row)
+            listOfRows.append(row)
+
+    # We create the columnar output, which also records the date of every row
+    # so that it can be queried without reading the dates again.
+    columnarBuilder = None
+    if columnarOutput is not None:
+        from ColumnarResults import PartitionedWriter
+        columnarBuilder = PartitionedWriter(
+            columnarOutput, {"Record ID": "string",
+                             "Name of Institution": "string",
+                             "Key Information": "string",
+                             "Sentence Containing Key Information": "string",
+                             "Date": "date"}, ["Regulator", "Year"],
+            columnarFormat)
+
+    # This dictionary stores how many pages were read from their text layer, how
+    # many were taken from the OCR cache and how many had to be recognized using
+    # OCR.
+    pageCounts = {"text": 0, "cached": 0, "ocr": 0}
     
-    # We iterate through all the rows in the dataframe.
-    for index, row in dataframe.iterrows():
-
-        # This variable stores the unique ID of the row.
-        uniqueID = str(row["Record ID"])
-
-        # This variable stores the name of the bank involved.
-        institutionName = row["Institution Name"]
-
-        # We find the list of sentences with the key information they contain 
-        # mentioned in the PDF using the previous function we created.
-        listOfSentencesWithKeyInformation = processPDF(uniqueID, listOfKeywords)
-
-        # We iterate through every sentence and key information combination in 
-        # the listOfSentencesWithKeyInformation variable. 
-        for i in range(len(listOfSentencesWithKeyInformation)):
-            
-            # We check if the key information contained in the sentence is a 
-            # date or not.
-            if listOfSentencesWithKeyInformation[i][0] == True:
-
-                # We convert the date to a datetime object.
-                date = datetime.strptime(listOfSentencesWithKeyInformation[i][2], 
-                                            '%B %d, %Y')
-                
-                # We check if the date is in between our starting and ending
-                # date filters. 
-                if ((date >= startDate) and (date <= endDate)):
-                    
-                    # We output the relevant information in the output 
-                    # dataframe we created earlier.
-                    outputDataframe = outputDataframe.append({'Record ID': 
-                                        uniqueID, 
-                                        'Name of Institution': 
-                                        institutionName, 
-                                        'Key Information': 
-                                        listOfSentencesWithKeyInformation[i][2],
-                                        'Sentence Containing Key Information': 
-                                        listOfSentencesWithKeyInformation[i][1]}, 
-                                        ignore_index = True)
-                    
-            # We check if the key information contained in the sentence is a 
-            # keyword or not.
-            else:
-
-                # We output the relevant information in the output 
-                # dataframe we created earlier.
-                outputDataframe = outputDataframe.append({'Record ID': 
-                                        uniqueID, 
-                                        'Name of Institution': 
-                                        institutionName, 
-                                        'Key Information': 
-                                        listOfSentencesWithKeyInformation[i][2],
-                                        'Sentence Containing Key Information': 
-                                        listOfSentencesWithKeyInformation[i][1]}, 
-                                        ignore_index = True)
-
-    # The outputDataframe is converted into an Output.csv file which can be 
-    # viewed by the user.
-    outputDataframe.to_csv('Output.csv')
+    # This variable stores the dates and keywords compiled once for all the
+    # PDFs.
+    matcher = TextMatcher(listOfKeywords)
+
+    # This dictionary stores the filters of the run.
+    filters = getJournalFilters(startDate, endDate, listOfKeywords)
+    if deduplicate:
+        filters["deduplicate"] = True
+
+    # This variable stores the state of the earlier runs, if there is one, and
+    # this dictionary stores the rows of the records that have not changed
+    # since then.
+    state = None
+    completedRecords = {}
+    if stateFile is not None:
+        state = RunState(stateFile)
+        storedRecords = state.getRecords(dataFile, filters)
+        completedRecords = {uniqueID: rows for uniqueID, (fingerprint, rows)
+                            in storedRecords.items()
+                            if fingerprints.get(uniqueID) == fingerprint}
+
+        # We forget the records that have been removed from Data.csv.
+        state.removeRecords(dataFile, filters,
+                            [uniqueID for uniqueID in storedRecords
+                             if uniqueID not in fingerprints])
+
+    # This variable stores the text index, if there is one, which forgets the
+    # records that have been removed from Data.csv.
+    textIndex = None
+    if textIndexFile is not None:
+        textIndex = TextIndex(textIndexFile)
+        textIndex.removeDocuments(dataFile, [uniqueID for uniqueID in
+                                             textIndex.getRecords(dataFile)
+                                             if uniqueID not in fingerprints])
+
+    # This variable stores the journal of the run, if there is one, and we add
+    # the records it already completed.
+    journal = None
+    if journalFile is not None:
+        journal = RunJournal(journalFile, getJournalFiles(
+            filters, dataFile, outputFile, None if download else directory))
+        if journal.completedRecords:
+            print("Resuming from " + journalFile + ": " +
+                  str(len(journal.completedRecords)) + " records were alrea" +
+                  "dy completed.")
+        completedRecords.update(journal.completedRecords)
+
+    # This list stores the unique ID of every row of the data file that still
+    # needs to be processed.
+    listOfIDs = [str(row["Record ID"]) for row in listOfRows
+                 if str(row["Record ID"]) not in completedRecords]
+    if state is not None:
+        print(str(len(fingerprints) - len(set(listOfIDs))) + " records are un" +
+              "changed since the last run and " + str(len(set(listOfIDs))) +
+              " records need to be processed.")
+
+    # We download the PDFs of the records that need to be processed.
+    if download and listOfIDs != []:
+        downloadPDFs(directory=directory, listOfIDs=listOfIDs,
+                     dataFile=dataFile, listOfRows=listOfRows)
+
+    # This dictionary stores the error of every PDF that could not be read.
+    errors = {}
+
+    # This iterator hands out the text of the pages of every PDF in the same
+    # order as the rows of the data file, while the pages themselves are read
+    # and recognized by the worker processes. The documents are registered
+    # with their records in the run report, since the worker processes work on
+    # several documents at the same time.
+    listOfDocuments = [getRecordDocument(directory, uniqueID)
+                       for uniqueID in listOfIDs]
+    for uniqueID, document in zip(listOfIDs, listOfDocuments):
+        setDocumentRecord(document, uniqueID, regulators[uniqueID])
+    documentTexts = iterDocumentTexts(listOfDocuments, "adaptive", workers,
+                                      pageCounts=pageCounts, errors=errors)
+
+    # This list stores the unique ID of every record that failed.
+    listOfFailures = []
+
+    # These lists store the institution of every record that was output and
+    # the number of rows it added, which are grouped by institution at the end.
+    listOfInstitutions = []
+    listOfRowCounts = []
+
+    # We create an appropriate output with four different columns as requested.
+    # The rows are streamed straight to the Output.csv file as they are found
+    # so the memory used does not grow with the number of rows.
+    outputBuilder = ResultBuilder(['Record ID', 'Name of Institution',
+                                   'Key Information', 'Sentence Cont' +
+                                   'aining Key Information'], outputFile)
+
+    # A record that raises an error or a run that is interrupted leaves no
+    # half written output behind.
+    try:
+        # We iterate through all the rows of the data file.
+        for row in listOfRows:
+
+            # This variable stores the unique ID of the row.
+            uniqueID = str(row["Record ID"])
+
+            # This variable stores the name of the bank involved.
+            institutionName = row["Institution Name"]
+
+            # Everything measured while the row is processed counts for its
+            # record and its regulator in the run report.
+            regulatorName = regulators[uniqueID]
+            with measureRecord(uniqueID, regulatorName):
+
+                # The rows of a record completed by an earlier run are taken
+                # from the journal.
+                if uniqueID in completedRecords:
+                    outputRows = completedRecords[uniqueID]
+
+                else:
+                    pdf, pageTexts = next(documentTexts)
+
+                    # We find the list of sentences with the key information
+                    # they contain mentioned in the PDF using the previous
+                    # functions we created, and keep the ones that pass the
+                    # filters. A record that fails is reported without
+                    # stopping the others.
+                    try:
+                        if pageTexts is None:
+                            raise errors.pop(pdf)
+                        with stage("matching"):
+                            outputRows = getOutputRows(processText(pageTexts,
+                                                                   matcher),
+                                                       startDate, endDate,
+                                                       deduplicate)
+                    except Exception as error:
+                        print("The PDF of the record with the Record ID " +
+                              uniqueID + " could not be processed: " +
+                              repr(error))
+                        listOfFailures.append(uniqueID)
+                        if journal is not None:
+                            journal.recordFailure(uniqueID, error)
+                        continue
+
+                    # We add the text of the PDF to the text index unless it
+                    # is already there.
+                    if textIndex is not None and textIndex.getFingerprint(
+                            dataFile, uniqueID) != fingerprints[uniqueID]:
+                        with stage("textIndex"):
+                            textIndex.addDocument(dataFile, uniqueID,
+                                                  fingerprints[uniqueID],
+                                                  institutionName, pageTexts)
+
+                    # We make a note in the journal and in the state that the
+                    # record is completed.
+                    if journal is not None:
+                        journal.recordSuccess(uniqueID, outputRows)
+                    if state is not None:
+                        state.putRecord(dataFile, filters, uniqueID,
+                                        fingerprints[uniqueID], outputRows)
+
+                # We output the relevant information in the output we created
+                # earlier.
+                listOfInstitutions.append(institutionName)
+                listOfRowCounts.append(len(outputRows))
+                with stage("output"):
+                    for keyInformation, sentence in outputRows:
+                        outputBuilder.add(uniqueID, institutionName,
+                                          keyInformation, sentence)
+                        if columnarBuilder is not None:
+                            dateOfKey = getDateFromText(keyInformation)
+                            columnarBuilder.add((regulatorName, dateOfKey and
+                                                 dateOfKey.year), uniqueID,
+                                                institutionName, keyInformation,
+                                                sentence, dateOfKey)
+    except BaseException:
+        outputBuilder.abort()
+        raise
+
+    # We finish writing the Output.csv file which can be viewed by the user.
+    # The journal is only kept if some records still need to be processed.
+    with stage("output"):
+        outputBuilder.writeCSV()
+        if columnarBuilder is not None:
+            columnarBuilder.close()
+    if journal is not None:
+        journal.close(remove=listOfFailures == [])
+    if state is not None:
+        state.close()
+    if textIndex is not None:
+        textIndex.close()
     print()
-    print("Please open the Output.csv file to see the relevant date informati" +
-          "on.")
+    print(str(pageCounts["text"]) + " pages were read from their text layer, " +
+          str(pageCounts["cached"]) + " pages were taken from the OCR cache " +
+          "and " + str(pageCounts["ocr"]) + " pages were recognized using OCR.")
+    printInstitutionSummary(listOfInstitutions, listOfRowCounts)
+    if listOfFailures != []:
+        print(str(len(listOfFailures)) + " records could not be processed: " +
+              ", ".join(listOfFailures) + ".")
+        if journal is not None:
+            print("Run the program again to retry them.")
+    print("Please open the " + outputFile + " file to see the relevant date " +
+          "information.")
+    if columnarBuilder is not None:
+        print("The same information is also in the " + columnarOutput +
+              " folder, partitioned by regulator and by year.")
+
+
+# This function is used to describe the filters provided as arguments in the
+# journal and the state, so that a journal is never resumed with different
+# filters. The version of the sentence segmenter is included too, so that the
+# rows of an earlier run are not reused once the sentences it found change.
+def getJournalFilters(startDate, endDate, listOfKeywords):
+    return {"startDate": startDate.isoformat(), "endDate": endDate.isoformat(),
+            "keywords": [keyword for keyword in listOfKeywords
+                         if keyword != ""], "segmenter": SEGMENTER_VERSION}
+
+
+# This function is used to add the files of a run provided as arguments to the
+# given filters, so that a journal is only resumed by a run reading the same
+# data file and PDF directory and writing the same output file. The directory
+# is None when the PDFs are downloaded into a new workspace by every run.
+def getJournalFiles(filters, dataFile, outputFile, directory=None):
+    return dict(filters, dataFile=os.path.abspath(dataFile),
+                outputFile=os.path.abspath(outputFile),
+                directory=directory and os.path.abspath(directory))
 
 
 # This is the main part of the program.
 if __name__ == "__main__":
 
+    # If any arguments are provided when the program is executed, for instance
+    # "python TextualAnalysisForAnyRegulator.py --download --start 01/01/2015",
+    # they are handled by the command line entry point without asking for
+    # anything.
+    if len(sys.argv) > 1:
+        from CommandLine import main
+        sys.exit(main(["any"] + sys.argv[1:]))
+
     # This variable stores the information regarding whether or not the user 
     # would like to process PDFs that he/she has locally or if they would like 
     # to download them.
     areFilesLocal = input("Are the PDF files you would like processed availab" +
                           "le locally? Reply with a 'True' \nor 'False'. ")  
     
+    # This variable stores the workspace the PDFs are downloaded into, so that
+    # several runs on the same machine never overwrite each other's files.
+    workspace = None
+
     # We are checking the result of the user's response.
     if areFilesLocal == "False":
 
@@ -295,7 +573,7 @@ if __name__ == "__main__":
         # available from the Data.csv file.
         print("The program will use the uploaded Data.csv file to download th" +
               "e necessary PDFs.")
-        downloadPDFs()
+        workspace = Workspace()
 
     # An instruction message is displayed in case the user wants to use the PDF 
     # files available locally.
@@ -324,5 +602,19 @@ if __name__ == "__main__":
                            " ").split(";")
     
     # We use the function we defined previously to get data from the different 
-    # PDFs and output it in a CSV file.
-    getDataFromDataframe(startDate, endDate, listOfKeywords)
\ No newline at end of file
+    # PDFs and output it in a CSV file, using one worker process per core. The
+    # progress is recorded in a journal so that an interrupted run can be
+    # resumed by running the program again with the same filters, and the
+    # records that have not changed since the last run are not downloaded or
+    # processed again. The downloaded PDFs are removed afterwards.
+    try:
+        getDataFromDataframe(startDate, endDate, listOfKeywords,
+                             os.cpu_count(), workspace.directory
+                             if workspace is not None else ".",
+                             journalFile='Output.journal',
+                             stateFile=STATE_FILE,
+                             download=workspace is not None,
+                             textIndexFile=TEXT_INDEX_FILE)
+    finally:
+        if workspace is not None:
+            workspace.close()
\ No newline at end of file
@@ -3,32 +3,35 @@ SPECIFIC CODE FOR EACH REGULATOR
 
 Steps for Executing Code Specific For Regulator:
 1. Import the data by uploading the CSV and XLSX files from the different regulators. Rename them as FDIC.csv, OCC.xlsx and FED.csv respectively.
-2. Create a new empty folder called Pages. This will store all the converted pages of the downloaded PDF file in an image format.
-3. Execute the main part of the code and provide information specific for the type of regulator requested.
+2. Execute the main part of the code and provide information specific for the type of regulator requested.
+3. Alternatively, to process many documents at once, execute the code with the regulator and a text file containing one FDIC docket number, OCC order number or FED URL per line, for instance python TextualAnalysisForSpecificRegulator.py FDIC dockets.txt. The dates are written to Output.csv and the status of every identifier to Status.csv. When FDIC.csv, OCC.xlsx or FED.csv are updated, only the identifiers whose rows were added or changed since the last run are downloaded and processed again.
+4. Documents can also be processed without any prompts by executing the code with a regulator command, for instance python TextualAnalysisForSpecificRegulator.py fdic FDIC-13-214e FDIC-12-568e --output Dockets.csv. Execute python CommandLine.py fdic --help to see every option.
 """
 
-# Importing the previously installed libraries.
+# Importing the previously installed libraries. pandas and the libraries used
+# for downloading and OCR are only imported when they are needed.
 import sys
 import os
-import re
-import requests
-import pytesseract
-import urllib.request
-import pandas as pd
-from pdf2image import convert_from_path
-from urllib.parse import urljoin
-from datetime import datetime
-from bs4 import BeautifulSoup
-from PIL import Image
+from Downloading import downloadFile, downloadFiles, getPDFLinks
+from Downloading import printDownloadReport
+from Hits import HitColumns, iterPageHits, printInstitutionSummary
+from Instrumentation import measureRecord, stage
+from PDFProcessing import iterDocumentTexts, iterPageTexts
+from RegulatorIndex import loadIndex
+from Results import ResultBuilder
+from RunState import RunState, getFingerprint
+from Sentences import SEGMENTER_VERSION
+from SourceReader import iterSourceRows
+from TextIndex import TextIndex
+from TextMatching import TextMatcher, getDateFromText
+from Workspace import Workspace
 
 
 # This function is used to download a PDF given a link and it saves the PDF
-# using the given name.
-def downloadPDF(link, fileName):
-
-    # This variable stores a list of the PDF files that have been downloaded
-    # from the appropriate link.
-    listOfFiles = []
+# using the given name in the given directory. The files are streamed to disk
+# through a pooled session for the host of the link and failed requests are
+# retried.
+def downloadPDF(link, fileName, directory="."):
 
     # If the link provided in the argument of the function is a webpage instead
     # of a link that directly leads to a PDF download, we handle it differently
@@ -36,42 +39,30 @@ def downloadPDF(link, fileName):
     # HTML files.
     if link[-3:] == "htm":
 
-        # This is used to open the link provided as an argument to the function.
-        response = requests.get(link)
-
-        # This variable obtains the HTML code for the webpage.
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # We iterate through all the PDFs available in the webpage.
-        for url in soup.select("a[href$='.pdf']"):
+        # This variable stores a list of the links to all the PDFs available in
+        # the webpage.
+        listOfLinks = getPDFLinks(link)
 
-            # We name the PDF files using the last portion of each link which
-            # are unique.
-            filename = url['href'].split('/')[-1]
+        # This variable stores a list of the PDF files that have been
+        # downloaded from the appropriate link. We name the PDF files using the
+        # last portion of each link which are unique.
+        listOfFiles = [os.path.join(directory, pdfLink.split('/')[-1])
+                       for pdfLink in listOfLinks]
 
-            # We append the listOfFiles variable.
-            listOfFiles.append(filename)
-
-            # If the file has successfully been downloaded, we make a note of
-            # it.
-            with open(filename, 'wb') as f:
-                f.write(requests.get(urljoin(link, url['href'])).content)
+        # We download all the PDFs available in the webpage at the same time.
+        listOfTimings = downloadFiles(list(zip(listOfLinks, listOfFiles)))
 
     else:
-        # This is used to open the link provided as an argument to the function.
-        response = urllib.request.urlopen(link)
-
-        # This opens the file in a binary-write mode.
-        file = open(fileName + ".pdf", 'wb')
 
-        # If the file has successfully been downloaded, we make a note of it.
-        file.write(response.read())
+        # This variable stores a list of the PDF files that have been
+        # downloaded from the appropriate link.
+        listOfFiles = [os.path.join(directory, fileName + ".pdf")]
 
-        # We close the file.
-        file.close()
+        # We stream the PDF to disk using the given name.
+        listOfTimings = [downloadFile(link, listOfFiles[0])]
 
-        # We append the listOfFiles variable.
-        listOfFiles.append(fileName + ".pdf")
+    # We display the timing of every file.
+    printDownloadReport(listOfTimings)
 
     # We return the listOfFiles variable so other functions can see how many
     # files were downloaded.
@@ -79,398 +70,543 @@ def downloadPDF(link, fileName):
 
 
 # This function is used to convert the different pages of the PDF with the name
-# provided as an argument into images which can be processed to look for dates.
-def processPDF(pdfFile):
-
-    # Name of the PDF file.
-    pdf = pdfFile + ".pdf"
-
-    # This variable stores all the pages of the PDF.
-    pages = convert_from_path(pdf, 500)
+# provided as an argument into text which can be processed to look for dates. A
+# list of names can be provided instead for a document made of several PDFs,
+# which are read one after another with their pages numbered continuously.
+# Pages with a usable text layer are read directly, and the remaining pages are
+# rendered and recognized pageWindow at a time, so the memory used does not grow
+# with the length of the document. Each page is rendered at the lowest
+# resolution that gives a confident OCR result. The number of pages that took
+# each path is added to the pageCounts dictionary if one is provided, and the
+# text of every page is added to the listOfPages list if one is provided. With
+# more than one worker, the pages that need OCR are recognized by that number of
+# worker processes at the same time.
+def processPDF(pdfFile, pageWindow=4, pageCounts=None, listOfPages=None,
+               workers=1):
+
+    # Name of the PDF file, or names of the PDF files making up the document.
+    if isinstance(pdfFile, str):
+        pdf = pdfFile + ".pdf"
+    else:
+        pdf = tuple(part + ".pdf" for part in pdfFile)
 
-    # This variable is a counter to store each page of the PDF to an image.
-    imageCounter = 1
+    # This variable stores the compiled date pattern.
+    matcher = TextMatcher()
 
-    # We iterate through all the pages stored above.
+    # We find every date in the text of each page of the PDF, which is either
+    # read from its text layer or recognized by passing the page to pytesseract
+    # straight from memory. This list stores a hit for every sentence that
+    # contains a date, recording the date as an ordinal and the position of the
+    # sentence in the text of its page instead of a copy of the sentence.
+    listOfSentencesWithDate = []
+    if workers > 1:
+        pages = [(pageNumber, text) for document, pageTexts in
+                 iterDocumentTexts([pdf], "adaptive", workers, pageWindow,
+                                   pageCounts=pageCounts)
+                 for pageNumber, text in enumerate(pageTexts, 1)]
+    else:
+        pages = iterPageTexts(pdf, "adaptive", pageWindow,
+                              pageCounts=pageCounts)
     for page in pages:
+        with stage("matching"):
+            listOfSentencesWithDate.extend(iterPageHits(page, matcher))
+        if listOfPages is not None:
+            listOfPages.append(page[1])
 
-        # We are specifying the file name for each page of the PDF to be stored
-        # as its corresponding image file. For instance, page 1 of the PDF will
-        # be stored as an image with the name Page 1.jpg in the Pages folder.
-        fileName = "Pages/Page " + str(imageCounter) + ".jpg"
-
-        # This will save the image of the page in our system.
-        page.save(fileName, 'JPEG')
-
-        # This will increment the image counter to show how many images we have.
-        imageCounter = imageCounter + 1
+    # We are returning the listOfSentencesWithDate so it can be presented in a
+    # CSV file.
+    return listOfSentencesWithDate
 
-    # This variable stores the total number of pages we have in our file.
-    fileLimit = imageCounter - 1
 
-    # This list of sentences stores the sentence that contains a date that was
-    # mentioned in the PDF. It is a list of lists with the first element being
-    # the sentence and the second element being the date.
-    listOfSentencesWithDate = []
+# This dictionary stores, for every regulator, how the identifier of a
+# document is described in the messages displayed to the user.
+REGULATOR_IDENTIFIERS = {"FDIC": "FDIC docket number", "OCC": "OCC order number",
+                         "FED": "FED URL"}
 
-    # We iterate again from 1 to the total number of pages in the PDF.
-    for i in range(1, fileLimit + 1):
 
-        # We set the file name to recognize text from the respective image of
-        # each page. Again, these files will be Page 1.jpg, Page 2.jpg, etc.
-        fileName = "Pages/Page " + str(i) + ".jpg"
+# This dictionary stores the file holding the data of every regulator.
+REGULATOR_FILES = {"FDIC": "FDIC.csv", "OCC": "OCC.xlsx", "FED": "FED.csv"}
 
-        # This recognizes the text as a string from the image using pytesseract.
-        text = str(((pytesseract.image_to_string(Image.open(fileName)))))
 
-        # This variable stores the recognized text. In many PDFs, at the ending
-        # of a line, if a word cannot be written fully, a 'hyphen' is added and
-        # the rest of the word is written in the next line. We are removing
-        # that.
-        text = text.replace('-\n', '')
+# This dictionary stores the columns of the data of every regulator that are
+# used: the column holding the identifiers of the documents and the columns
+# read by getRowDetails.
+REGULATOR_COLUMNS = {"FDIC": [" Docket Number", " Bank Name", " File URL"],
+                     "OCC": ["Order Number", "Record ID", "Institution Name",
+                             "Link to Enforcement Action"],
+                     "FED": ["URL", "Banking Organization"]}
 
-        # We split the text up into a list of different sentences.
-        sentences = text.split(". ")
 
-        # We iterate through all the sentences.
-        for sentence in sentences:
+# This function is used to read the rows of the data of the regulator with the
+# name provided as an argument, one at a time, as dictionaries of the columns
+# that are used. The data is read from the given data file, or from the usual
+# file of the regulator if no data file is provided. The FDIC and FED rows are
+# given a unique ID, counting the rows from 1, that is displayed in the output.
+def iterRegulatorRows(regulatorName, dataFile=None):
 
-            # The date variable stores the date that occurs in the current
-            # sentence we are looking at and stores it as a list using regular
-            # expression.
-            date = re.findall(r'((January|February|March|April|May|June|July|' +
-                              'August|September|October|November|December' +
-                              ')\s+\d{1,2},\s+\d{4})', sentence)
+    # This variable stores the file holding the data of the regulator.
+    if dataFile is None:
+        dataFile = REGULATOR_FILES[regulatorName]
 
-            # We are checking if the current sentence does contain a date.
-            if date != []:
+    # The OCC data has its own Record ID, whereas the FDIC and FED rows are
+    # numbered in the order they are read.
+    for uniqueID, row in enumerate(iterSourceRows(
+            dataFile, REGULATOR_COLUMNS[regulatorName]), 1):
+        if regulatorName != "OCC":
+            row["Unique ID"] = str(uniqueID)
+        yield row
 
-                # We add the sentence and the date in the form of a list to the
-                # listOfSentencesWithDate variable.
-                listOfSentencesWithDate.append([sentence.replace('\n', ' '),
-                                                date[0][0].replace('\n', ' ')])
 
-    # We are returning the listOfSentencesWithDate so it can be presented in a
-    # CSV file.
-    return listOfSentencesWithDate
+# This function is used to load the lookup index over the data of the regulator
+# with the name provided as an argument. The index is only rebuilt, by streaming
+# the data again, when the file of the regulator has changed since the last run.
+# A data file other than the usual file of the regulator can be provided.
+def loadRegulatorData(regulatorName, dataFile=None):
+    if dataFile is None:
+        dataFile = REGULATOR_FILES[regulatorName]
+    return loadIndex(regulatorName, dataFile,
+                     lambda: iterRegulatorRows(regulatorName, dataFile))
 
 
-# This function is used to differentiate the operations for different
-# regulators. The regulator name is provided as argument to the function.
-def getDataFromDataframe(regulatorName):
+# This function is used to find the unique ID, the name of the bank involved and
+# the link to the documents of a row of the data of the regulator with the name
+# provided as an argument.
+def getRowDetails(regulatorName, row):
 
     # We are checking if the regulator is FDIC.
     if regulatorName == "FDIC":
-
-        # We read the FDIC data and load it using pandas into a dataframe.
-        dataframe = pd.read_csv("FDIC.csv")
-
-        # This variable stores the docket number that is provided as a user
-        # input.
-        docketNumber = input("Enter the FDIC docket number for the document " +
-                             "you would like to see the date information for: ")
-
-        # This inserts a unique ID in the dataframe that is displayed in the
-        # output.
-        dataframe.insert(0, 'Unique ID', range(1, len(dataframe) + 1))
-
-        # This flag is used to indicate if we found the docket number requested
-        # by the user in the dataframe.
-        found = False
-
-        # We iterate through all the rows in the dataframe.
-        for index, row in dataframe.iterrows():
-
-            # We are updating the current docket number that we are going to
-            # compare. Some rows may have multiple docket numbers and in such
-            # scenarious, we are splitting them into a list of docket numbers.
-            currentDocketNumber = str(row[" Docket Number"])
-            currentDocketNumber = currentDocketNumber.split(",")
-
-            # If the docket number matches to the one requested by the user, we
-            # download the PDF using the link for the documents for the
-            # corresponding docket number in the same row.
-            if docketNumber in currentDocketNumber:
-
-                # We update the found flag to True.
-                found = True
-
-                # This variable stores the link to the PDF file.
-                linkToFile = row[" File URL"]
-
-                # This variable stores the name of the bank involved.
-                institutionName = row[" Bank Name"]
-
-                # This variable stores the unique ID of the row.
-                uniqueID = row["Unique ID"]
-
-                # We download the PDF using the previous function we created.
-                listOfFiles = downloadPDF(linkToFile, docketNumber)
-
-                # We find the list of sentences with date mentioned in the PDF
-                # using the previous function we created.
-                listOfSentencesWithDate = processPDF(docketNumber)
-
-                # We create an appropriate output dataframe with four different
-                # columns as requested.
-                outputDataframe = pd.DataFrame(columns=['Unique ID', 'Name o' +
-                                                        'f Institution', 'Date',
-                                                        'Sentence Containing' +
-                                                        ' Date'])
-
-                # We iterate through every sentence and date combination in the
-                # list of sentences with date.
-                for i in range(len(listOfSentencesWithDate)):
-
-                    # We convert the date to a datetime object.
-                    date = datetime.strptime(listOfSentencesWithDate[i][1],
-                                             '%B %d, %Y')
-
-                    # We check the year of the date since we only include
-                    # dates that occur after 1990.
-                    if date.year >= 1990:
-
-                        # We output the relevant information in the output
-                        # dataframe we created earlier.
-                        outputDataframe = outputDataframe.append({'Unique ID':
-                                                                  uniqueID,
-                                                                  'Name of Institution':
-                                                                  institutionName,
-                                                                  'Date':
-                                                                  listOfSentencesWithDate[i][1],
-                                                                  'Sentence Containing Date':
-                                                                  listOfSentencesWithDate[i][0]},
-                                                                 ignore_index=True)
-
-                # We display an error message if there are no dates after 1990
-                # that appear in the document.
-                if outputDataframe.empty:
-                    print("There are no relevant dates after the year 1990 in" +
-                          " the document referred to with the FDIC docket num" +
-                          "ber of " + docketNumber + ".")
-                else:
-                    # The outputDataframe is converted into an Output.csv file
-                    # which can be viewed by the user.
-                    outputDataframe.to_csv('Output.csv')
-                    print()
-                    print("Please open the Output.csv file to see the relevan" +
-                          "t date information.")
-
-        # We display an error message if the FDIC docket number is not found in
-        # the dataframe.
-        if found == False:
-            print("The FDIC docket number of " + docketNumber + " is incorrec" +
-                  "t. Please run the program again.")
+        return row["Unique ID"], row[" Bank Name"], row[" File URL"]
 
     # We are checking if the regulator is OCC.
     elif regulatorName == "OCC":
-
-        # We read the OCC data and load it using pandas into a dataframe.
-        dataframe = pd.read_excel("OCC.xlsx")
-
-        # This variable stores the docket number that is provided as a user
-        # input.
-        orderNumber = input("Enter the OCC order number for the document you " +
-                            "would like to see the date information for: ")
-
-        # This flag is used to indicate if we found the docket number requested
-        # by the user in the dataframe.
-        found = False
-
-        # We iterate through all the rows in the dataframe.
-        for index, row in dataframe.iterrows():
-
-            # We are updating the current order number that we are going to
-            # compare.
-            currentOrderNumber = str(row["Order Number"])
-
-            # If the order number matches to the one requested by the user, we
-            # download the PDF using the link for the documents for the
-            # corresponding order number in the same row.
-            if orderNumber == currentOrderNumber:
-
-                # We update the found flag to True.
-                found = True
-
-                # This variable stores the link to the PDF file.
-                linkToFile = row["Link to Enforcement Action"]
-
-                # This variable stores the name of the bank involved.
-                institutionName = row["Institution Name"]
-
-                # This variable stores the unique ID of the row.
-                uniqueID = row["Record ID"]
-
-                # We download the PDF using the previous function we created.
-                downloadPDF(linkToFile, orderNumber)
-
-                # We find the list of sentences with date mentioned in the PDF
-                # using the previous function we created.
-                listOfSentencesWithDate = processPDF(orderNumber)
-
-                # We create an appropriate output dataframe with four different
-                # columns as requested.
-                outputDataframe = pd.DataFrame(columns=['Unique ID', 'Name o' +
-                                                        'f Institution', 'Date',
-                                                        'Sentence Containing' +
-                                                        ' Date'])
-
-                # We iterate through every sentence and date combination in the
-                # list of sentences with date.
-                for i in range(len(listOfSentencesWithDate)):
-
-                    # We convert the date to a datetime object.
-                    date = datetime.strptime(listOfSentencesWithDate[i][1],
-                                             '%B %d, %Y')
-
-                    # We check the year of the date since we only include
-                    # dates that occur after 1990.
-                    if date.year >= 1990:
-
-                        # We output the relevant information in the output
-                        # dataframe we created earlier.
-                        outputDataframe = outputDataframe.append({'Unique ID':
-                                                                  uniqueID,
-                                                                  'Name of Institution':
-                                                                  institutionName,
-                                                                  'Date':
-                                                                  listOfSentencesWithDate[i][1],
-                                                                  'Sentence Containing Date':
-                                                                  listOfSentencesWithDate[i][0]},
-                                                                 ignore_index=True)
-
-                # We display an error message if there are no dates after 1990
-                # that appear in the document.
-                if outputDataframe.empty:
-                    print("There are no relevant dates after the year 1990 in" +
-                          " the document referred to with the OCC order numbe" +
-                          "r of " + orderNumber + ".")
-                else:
-                    # The outputDataframe is converted into an Output.csv file
-                    # which can be viewed by the user.
-                    outputDataframe.to_csv('Output.csv')
-                    print()
-                    print("Please open the Output.csv file to see the relevan" +
-                          "t date information.")
-
-        # We display an error message if the OCC order number is not found in
-        # the dataframe.
-        if found == False:
-            print("The OCC order number of " + orderNumber + " is incorrect. " +
-                  "Please run the program again.")
+        return (row["Record ID"], row["Institution Name"],
+                row["Link to Enforcement Action"])
 
     # We are checking if the regulator is FED.
     elif regulatorName == "FED":
+        return (str(row["Unique ID"]), row["Banking Organization"],
+                "https://www.federalreserve.gov/" + str(row["URL"]))
+
+
+# This function is used to find the key of the document of a row of the data of
+# the regulator with the name provided as an argument, which does not change
+# when other rows are added to or removed from the data: the Record ID of an OCC
+# row and the link to the documents of an FDIC or FED row, whose unique ID is
+# only the number of the row.
+def getDocumentKey(regulatorName, row):
+    uniqueID, institutionName, linkToFile = getRowDetails(regulatorName, row)
+    return str(uniqueID) if regulatorName == "OCC" else linkToFile
+
+
+# This function is used to download and process the documents of a row of the
+# data of the regulator with the name provided as an argument. The documents
+# are downloaded into their own folder of the workspace of the run. It
+# returns the unique ID of the row, the name of the bank involved and the list
+# of sentences with the dates mentioned in the documents. The pages that need
+# OCR are recognized by the number of worker processes given as an argument.
+def processRow(regulatorName, row, identifier, workspace, pageCounts=None,
+               listOfPages=None, workers=1):
+
+    # These variables store the unique ID of the row, the name of the bank
+    # involved and the link to the PDF file.
+    uniqueID, institutionName, linkToFile = getRowDetails(regulatorName, row)
+
+    # This variable stores the folder the documents are downloaded into.
+    directory = workspace.getDocumentDirectory(uniqueID)
+
+    # We are checking if the regulator is FED.
+    if regulatorName == "FED":
+
+        # We download the PDF using the previous function we created.
+        listOfFiles = downloadPDF(linkToFile, uniqueID, directory)
+
+        # Since the FED can result in multiple PDFs needing to be analysed, we
+        # analyse all the files in the listOfFiles variable that is returned
+        # as a result of executing the downloadPDF function as one document,
+        # so the pages are numbered continuously across the files.
+        listOfSentencesWithDate = processPDF([tempFile[:-4] for tempFile in
+                                              listOfFiles],
+                                             pageCounts=pageCounts,
+                                             listOfPages=listOfPages,
+                                             workers=workers)
+
+    # For FDIC and OCC, we download the PDF and find the list of sentences with
+    # date mentioned in the PDF using the previous functions we created.
+    else:
+        downloadPDF(linkToFile, identifier, directory)
+        listOfSentencesWithDate = processPDF(os.path.join(directory,
+                                                          identifier),
+                                             pageCounts=pageCounts,
+                                             listOfPages=listOfPages,
+                                             workers=workers)
+
+    return uniqueID, institutionName, listOfSentencesWithDate
 
-        # We read the FED data and load it using pandas into a dataframe.
-        dataframe = pd.read_csv("FED.csv")
-
-        # This list of sentences stores the sentence that contains a date that
-        # was mentioned in the PDF.
-        listOfSentencesWithDate = []
-
-        # This variable stores the URL for the document that the user provides
-        # as input.
-        url = input("Enter the FED URL for the document you would like to see" +
-                    " the date information for: ")
-
-        # This inserts a unique ID in the dataframe that is displayed in the
-        # output.
-        dataframe.insert(0, 'Unique ID', range(1, len(dataframe) + 1))
-
-        # This flag is used to indicate if we found the docket number requested
-        # by the user in the dataframe.
-        found = False
-
-        # We iterate through all the rows in the dataframe.
-        for index, row in dataframe.iterrows():
-
-            # We are updating the current URL that we are going to compare.
-            currentURL = str(row["URL"])
-
-            # If the URL matches to the one requested by the user, we download
-            # the PDF using the link for the documents.
-            if url == currentURL:
-
-                # We update the found flag to True.
-                found = True
-
-                # This variable stores the link to the PDF file.
-                linkToFile = "https://www.federalreserve.gov/" + currentURL
-
-                # This variable stores the name of the bank involved.
-                institutionName = row["Banking Organization"]
-
-                # This variable stores the unique ID of the row.
-                uniqueID = str(row["Unique ID"])
-
-                # We download the PDF using the previous function we created.
-                listOfFiles = downloadPDF(linkToFile, uniqueID)
-
-                # Since the FED can result in multiple PDFs needing to be
-                # analysed, we analyse each of them by iterating through all the
-                # files in the listOfFiles variables that is returned as a
-                # result of executing the downloadPDF function.
-                for tempFile in listOfFiles:
-
-                    # We find the list of sentences with date mentioned in the
-                    # PDF using the previous function we created. We do this for
-                    # all the files in the list of files.
-                    listOfSentencesWithDate += processPDF(tempFile[:-4])
-
-                # We create an appropriate output dataframe with four different
-                # columns as requested.
-                outputDataframe = pd.DataFrame(columns=['Unique ID', 'Name o' +
-                                                        'f Institution', 'Date',
-                                                        'Sentence Containing' +
-                                                        ' Date'])
-
-                # We iterate through every sentence and date combination in the
-                # list of sentences with date.
-                for i in range(len(listOfSentencesWithDate)):
-
-                    # We convert the date to a datetime object.
-                    date = datetime.strptime(listOfSentencesWithDate[i][1],
-                                             '%B %d, %Y')
-
-                    # We check the year of the date since we only include
-                    # dates that occur after 1990.
-                    if date.year >= 1990:
-
-                        # We output the relevant information in the output
-                        # dataframe we created earlier.
-                        outputDataframe = outputDataframe.append({'Unique ID':
-                                                                  uniqueID,
-                                                                  'Name of Institution':
-                                                                  institutionName,
-                                                                  'Date':
-                                                                  listOfSentencesWithDate[i][1],
-                                                                  'Sentence Containing Date':
-                                                                  listOfSentencesWithDate[i][0]},
-                                                                 ignore_index=True)
-
-                # We display an error message if there are no dates after 1990
-                # that appear in the document.
-                if outputDataframe.empty:
-                    print("There are no relevant dates after the year 1990 in" +
-                          " the document referred to with the url of " + url)
+
+# This variable stores the first year whose dates are included in the output.
+MINIMUM_YEAR = 1990
+
+
+# This function is used to keep only the sentences with a date that occurs in
+# the given year or later from the list of hits provided as an argument. It
+# returns a list of the sentences and their dates.
+def getSentencesFromYear(listOfSentencesWithDate, minimumYear=MINIMUM_YEAR):
+
+    # We compare the dates of all the hits at once in columns.
+    hitColumns = HitColumns(listOfSentencesWithDate)
+    return [[sentence, date] for date, sentence in
+            hitColumns.getRows(hitColumns.getYearMask(minimumYear))]
+
+
+# This function is used to display how many pages took each path if any
+# document was processed.
+def printPageCounts(pageCounts):
+    if sum(pageCounts.values()) > 0:
+        print(str(pageCounts["text"]) + " pages were read from their text lay" +
+              "er, " + str(pageCounts["cached"]) + " pages were taken from the" +
+              " OCR cache and " + str(pageCounts["ocr"]) + " pages were recog" +
+              "nized using OCR.")
+
+
+# This function is used to differentiate the operations for different
+# regulators. The regulator name is provided as argument to the function, along
+# with the name of the output file and the first year whose dates are output.
+def getDataFromDataframe(regulatorName, outputFile='Output.csv',
+                         minimumYear=MINIMUM_YEAR):
+
+    # This dictionary stores how many pages were read from their text layer, how
+    # many were taken from the OCR cache and how many had to be recognized using
+    # OCR.
+    pageCounts = {"text": 0, "cached": 0, "ocr": 0}
+
+    # We load the index over the data of the regulator.
+    regulatorIndex = loadRegulatorData(regulatorName)
+
+    # This variable stores the FDIC docket number, OCC order number or FED URL
+    # that is provided as a user input.
+    identifier = input("Enter the " + REGULATOR_IDENTIFIERS[regulatorName] +
+                       " for the document you would like to see the date inf" +
+                       "ormation for: ")
+
+    # This variable stores how the document is referred to in the messages.
+    if regulatorName == "FED":
+        description = "the url of " + identifier
+    else:
+        description = ("the " + REGULATOR_IDENTIFIERS[regulatorName] +
+                       " of " + identifier + ".")
+
+    # This list stores the rows matching the identifier.
+    listOfRows = regulatorIndex.lookup(identifier)
+
+    # The documents are downloaded into a workspace of their own, which is
+    # removed once they have been processed.
+    with Workspace() as workspace:
+
+        # We iterate through all the rows that match the identifier and
+        # download and process their documents.
+        for row in listOfRows:
+            uniqueID, institutionName, listOfSentencesWithDate = processRow(
+                regulatorName, row, identifier, workspace, pageCounts)
+
+            # We create an appropriate output with four different columns as
+            # requested.
+            outputBuilder = ResultBuilder(['Unique ID', 'Name of Institution',
+                                           'Date', 'Sentence Containing Date'])
+
+            # We output the sentences with a date from the minimum year onwards
+            # in the output we created.
+            for sentence, date in getSentencesFromYear(listOfSentencesWithDate,
+                                                       minimumYear):
+                outputBuilder.add(uniqueID, institutionName, date, sentence)
+
+            # We display an error message if there are no dates from the
+            # minimum year onwards that appear in the document.
+            if len(outputBuilder) == 0:
+                print("There are no relevant dates from the year " +
+                      str(minimumYear) + " onwards in the document referred " +
+                      "to with " + description)
+            else:
+                # The output is converted into an Output.csv file which can be
+                # viewed by the user.
+                outputBuilder.writeCSV(outputFile)
+                print()
+                print("Please open the " + outputFile + " file to see the rel" +
+                      "evant date information.")
+
+    # We display an error message if the identifier is not found in the
+    # data of the regulator.
+    if listOfRows == []:
+        if regulatorName == "FED":
+            print("The URL of " + identifier + " is incorrect. Please run the" +
+                  " program again.")
+        else:
+            print("The " + REGULATOR_IDENTIFIERS[regulatorName] + " of " +
+                  identifier + " is incorrect. Please run the program again.")
+
+    # We display how many pages took each path.
+    printPageCounts(pageCounts)
+
+
+# This function is used to read a list of FDIC docket numbers, OCC order numbers
+# or FED URLs from the file with the name provided as an argument. The file
+# should contain one identifier per line, and blank lines are ignored.
+def readIdentifiers(fileName):
+    with open(fileName, encoding='utf-8-sig') as file:
+        return [line.strip() for line in file if line.strip() != ""]
+
+
+# This function is used to add a row of the output of an identifier of the
+# regulator provided as an argument to the combined output and, if there is
+# one, to the columnar output, where the date is stored as a date.
+def addOutputRow(regulatorName, outputBuilder, columnarBuilder, identifier,
+                 uniqueID, institutionName, date, sentence):
+    with stage("output"):
+        outputBuilder.add(identifier, uniqueID, institutionName, date,
+                          sentence)
+        if columnarBuilder is not None:
+            dateValue = getDateFromText(date)
+            columnarBuilder.add((regulatorName, dateValue and dateValue.year),
+                                identifier, uniqueID, institutionName,
+                                dateValue, sentence)
+
+
+# This function is used to process the documents of the rows matching an
+# identifier of the regulator with the name provided as an argument, adding
+# their text to the text index if there is one. It returns a list with the
+# document key, the name of the bank involved, the date and the sentence of
+# every date from the minimum year onwards, and raises an exception if any of
+# the documents cannot be downloaded or processed. The pages that need OCR are
+# recognized by the number of worker processes given as an argument.
+def processRows(regulatorName, listOfRows, identifier, workspace, pageCounts,
+                minimumYear=MINIMUM_YEAR, textIndex=None, workers=1):
+    listOfOutputRows = []
+    for row in listOfRows:
+        listOfPages = [] if textIndex is not None else None
+
+        # Everything measured while the row is processed counts for its record
+        # in the run report.
+        with measureRecord(getRowDetails(regulatorName, row)[0],
+                           regulatorName):
+            uniqueID, institutionName, listOfSentencesWithDate = processRow(
+                regulatorName, row, identifier, workspace, pageCounts,
+                listOfPages, workers)
+
+            # We add the text of the documents of the row to the text index.
+            if textIndex is not None:
+                with stage("textIndex"):
+                    textIndex.addDocument(
+                        regulatorName, getDocumentKey(regulatorName, row),
+                        getFingerprint(*getRowDetails(regulatorName, row)[1:]),
+                        institutionName, listOfPages)
+            with stage("matching"):
+                listOfSentences = getSentencesFromYear(listOfSentencesWithDate,
+                                                       minimumYear)
+            for sentence, date in listOfSentences:
+                listOfOutputRows.append([getDocumentKey(regulatorName, row),
+                                         institutionName, date, sentence])
+    return listOfOutputRows
+
+
+# This function is used to process many documents of the regulator with the name
+# provided as an argument in one go, without asking the user for anything. The
+# data of the regulator is loaded once, and the dates of every FDIC docket
+# number, OCC order number or FED URL in the list of identifiers are written to
+# one combined output file. Only the dates from the minimum year onwards are
+# kept. The status of every identifier (found, not found, no dates from the
+# minimum year or failed) is written to a separate status file. If a state file
+# is provided, the identifiers whose rows have not changed since an earlier run
+# are taken from it instead of being downloaded and processed again. The data of
+# the regulator can be read from a data file other than its usual file. If a
+# columnar output directory is provided, the output is also written there in
+# the given format ("parquet" or "arrow"), partitioned by regulator and by year.
+# If a text index file is provided, the text of every document that is processed
+# is added to the index under its document key, and the documents that are no
+# longer in the data are removed from it. The pages of every document that need
+# OCR are recognized by the number of worker processes given as an argument.
+def getDataForIdentifiers(regulatorName, listOfIdentifiers,
+                          outputFile='Output.csv', statusFile='Status.csv',
+                          stateFile=None, dataFile=None,
+                          minimumYear=MINIMUM_YEAR, columnarOutput=None,
+                          columnarFormat="parquet", textIndexFile=None,
+                          workers=1):
+
+    # This dictionary stores how many pages were read from their text layer, how
+    # many were taken from the OCR cache and how many had to be recognized using
+    # OCR.
+    pageCounts = {"text": 0, "cached": 0, "ocr": 0}
+
+    # We load the index over the data of the regulator only once.
+    with stage("readData"):
+        regulatorIndex = loadRegulatorData(regulatorName, dataFile)
+
+    # We create the columnar output, where the dates are stored as dates.
+    columnarBuilder = None
+    if columnarOutput is not None:
+        from ColumnarResults import PartitionedWriter
+        columnarBuilder = PartitionedWriter(
+            columnarOutput, {"Identifier": "string", "Unique ID": "string",
+                             "Name of Institution": "string", "Date": "date",
+                             "Sentence Containing Date": "string"},
+            ["Regulator", "Year"], columnarFormat)
+
+    # We create the output recording the status of every identifier.
+    statusBuilder = ResultBuilder(['Identifier', 'Status', 'Number of Dates'])
+
+    # This variable stores the state of the earlier runs, if there is one, and
+    # this dictionary stores the fingerprint and the output of every identifier
+    # processed by them. The output is only reused for the same minimum year
+    # and the same version of the sentence segmenter.
+    filters = {"minimumYear": minimumYear, "segmenter": SEGMENTER_VERSION}
+    state = None
+    storedRecords = {}
+    if stateFile is not None:
+        state = RunState(stateFile)
+        storedRecords = state.getRecords(regulatorName, filters)
+
+    # This variable stores the text index, if there is one, which forgets the
+    # documents that have been removed from the data of the regulator. The
+    # documents are indexed under their document key, so that they keep their
+    # entry when rows are added before them.
+    textIndex = None
+    if textIndexFile is not None:
+        textIndex = TextIndex(textIndexFile)
+        documentKeys = set(getDocumentKey(regulatorName, row) for row in
+                           regulatorIndex.iterRows())
+        textIndex.removeDocuments(regulatorName, [
+            record for record in textIndex.getRecords(regulatorName)
+            if record not in documentKeys])
+
+    # This variable stores how many identifiers were taken from the state, and
+    # this one the status of an identifier without any dates to output.
+    numberOfUnchangedIdentifiers = 0
+    noDatesStatus = "no post-" + str(minimumYear) + " dates"
+
+    # This list stores the institution of every row of the output, which are
+    # grouped by institution at the end.
+    listOfInstitutions = []
+
+    # We create the combined output, which also records the identifier of
+    # every row, and stream it straight to the output file.
+    outputBuilder = ResultBuilder(['Identifier', 'Unique ID', 'Name of Insti' +
+                                   'tution', 'Date', 'Sentence Containing Da' +
+                                   'te'], outputFile)
+
+    # An identifier that raises an error or a run that is interrupted leaves
+    # no half written output behind.
+    try:
+        # The documents are downloaded into a workspace of their own, which is
+        # removed once they have been processed.
+        with Workspace() as workspace:
+
+            # We iterate through all the identifiers, ignoring repeated ones.
+            for identifier in dict.fromkeys(listOfIdentifiers):
+
+                # This list stores the rows matching the identifier.
+                listOfRows = regulatorIndex.lookup(identifier)
+                if listOfRows == []:
+                    statusBuilder.add(identifier, "not found", 0)
+                    if state is not None:
+                        state.removeRecords(regulatorName, filters,
+                                            [identifier])
+                    continue
+
+                # This variable stores the fingerprint of the rows matching the
+                # identifier, made of their document keys, names and links,
+                # which do not change when other rows are added before them.
+                # This dictionary maps the document keys to the current unique
+                # IDs.
+                fingerprint = getFingerprint(identifier, [
+                    (getDocumentKey(regulatorName, row),) +
+                    tuple(getRowDetails(regulatorName, row)[1:])
+                    for row in listOfRows])
+                uniqueIDs = {getDocumentKey(regulatorName, row):
+                             getRowDetails(regulatorName, row)[0]
+                             for row in listOfRows}
+
+                # If the rows have not changed since an earlier run, we take
+                # their output from the state instead of processing them again.
+                # The state stores the document key of every output row, which
+                # is replaced by its current unique ID when the row is written.
+                if fingerprint == storedRecords.get(identifier, (None,))[0]:
+                    listOfOutputRows = storedRecords[identifier][1]
+                    numberOfUnchangedIdentifiers += 1
                 else:
-                    # The outputDataframe is converted into an Output.csv file
-                    # which can be viewed by the user.
-                    outputDataframe.to_csv('Output.csv')
-                    print()
-                    print("Please open the Output.csv file to see the relevan" +
-                          "t date information.")
 
-        # We display an error message if the URL is not found in the dataframe.
-        if found == False:
-            print("The URL of " + url + " is incorrect. Please run the progra" +
-                  "m again.")
+                    # A document that cannot be downloaded or processed is
+                    # recorded as failed without stopping the other identifiers.
+                    try:
+                        listOfOutputRows = processRows(
+                            regulatorName, listOfRows, identifier, workspace,
+                            pageCounts, minimumYear, textIndex, workers)
+                    except Exception as error:
+                        print("The document referred to with the " +
+                              REGULATOR_IDENTIFIERS[regulatorName] + " of " +
+                              identifier + " could not be processed: " +
+                              str(error))
+                        statusBuilder.add(identifier, "failed", 0)
+                        continue
+
+                    # We make a note of the output of the identifier for the
+                    # next runs.
+                    if state is not None:
+                        state.putRecord(regulatorName, filters, identifier,
+                                        fingerprint, listOfOutputRows)
+
+                # The rows of the identifier are only written once all of its
+                # documents have been processed, so that an identifier which
+                # fails leaves nothing in the output.
+                for documentKey, institutionName, date, sentence in \
+                        listOfOutputRows:
+                    addOutputRow(regulatorName, outputBuilder, columnarBuilder,
+                                 identifier, uniqueIDs[documentKey],
+                                 institutionName, date, sentence)
+                statusBuilder.add(identifier, "found" if listOfOutputRows else
+                                  noDatesStatus, len(listOfOutputRows))
+                listOfInstitutions += [outputRow[1] for outputRow in
+                                       listOfOutputRows]
+    except BaseException:
+        outputBuilder.abort()
+        raise
+
+    # We write both files which can be viewed by the user.
+    with stage("output"):
+        outputBuilder.writeCSV()
+        if columnarBuilder is not None:
+            columnarBuilder.close()
+        statusBuilder.writeCSV(statusFile)
+    if textIndex is not None:
+        textIndex.close()
+    if state is not None:
+        state.close()
+        print(str(numberOfUnchangedIdentifiers) + " identifiers were unchang" +
+              "ed since the last run and were not processed again.")
+    print()
+    print("Please open the " + outputFile + " file to see the relevant date " +
+          "information and the " + statusFile + " file to see the status of " +
+          "every identifier.")
+
+    # We display how many pages took each path and the institutions with the
+    # most dates.
+    printPageCounts(pageCounts)
+    printInstitutionSummary(listOfInstitutions)
 
 
 # This is the main part of the program.
 if __name__ == "__main__":
 
+    # If a regulator and a file of identifiers are provided when the program is
+    # executed, for instance "python TextualAnalysisForSpecificRegulator.py
+    # FDIC dockets.txt", we process all of them without asking for anything.
+    # Any other arguments are handled by the command line entry point, for
+    # instance "python TextualAnalysisForSpecificRegulator.py fdic
+    # FDIC-13-214e --output Dockets.csv".
+    if len(sys.argv) > 1:
+        from CommandLine import main
+        if len(sys.argv) == 3 and sys.argv[1] in REGULATOR_IDENTIFIERS:
+            sys.exit(main([sys.argv[1].lower(), "--identifiers-file",
+                           sys.argv[2]]))
+        sys.exit(main(sys.argv[1:]))
+
     # This variable stores the regulator name that the user will provide as
     # input.
     regulatorName = input("Enter the regulator you would like to obtain docum" +
@@ -0,0 +1,88 @@
+"""
+SHARED WORKSPACE
+
+Helpers used by both the generalised code and the code specific for each
+regulator to keep the files of a run apart from the files of any other run.
+Every run gets its own temporary scratch directory and every document gets its
+own folder inside it, so the PDFs downloaded by two jobs on the same host, or by
+two documents of the same job whose files happen to share a name, never
+overwrite each other. The scratch directory is removed when the run ends.
+"""
+
+# Importing the previously installed libraries.
+import os
+import re
+import shutil
+import tempfile
+
+
+# This variable stores the directory where the scratch directories are created.
+# Setting it to None uses the temporary directory of the system.
+SCRATCH_DIRECTORY = None
+
+# This variable stores the characters that cannot be used in the name of the
+# folder of a document, such as the slashes of a FED URL.
+UNSAFE_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+# This function is used to find a temporary file name next to the file with the
+# name provided as an argument that no other process or thread is using. Files
+# are written to it first and then renamed, so readers never see half a file
+# and concurrent writers never write into the same temporary file. The file is
+# created under the umask of the process like a file created with open(),
+# instead of with the private permissions given by mkstemp, since it keeps them
+# once it is renamed.
+def getTemporaryFileName(fileName):
+    directory = os.path.dirname(os.path.abspath(fileName))
+    while True:
+        temporaryFileName = os.path.join(directory, os.path.basename(
+            fileName) + "." + os.urandom(6).hex() + ".part")
+        try:
+            fileDescriptor = os.open(temporaryFileName, os.O_WRONLY |
+                                     os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            continue
+        os.close(fileDescriptor)
+        return temporaryFileName
+
+
+class Workspace:
+
+    # This function is used to create the scratch directory of a run. If keep
+    # is True, the directory is left in place when the run ends so that the
+    # downloaded PDFs can be inspected.
+    def __init__(self, keep=False):
+        self.keep = keep
+        if SCRATCH_DIRECTORY is not None:
+            os.makedirs(SCRATCH_DIRECTORY, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="textual-analysis-",
+                                          dir=SCRATCH_DIRECTORY)
+
+    # This function is used to find the path of the file with the name provided
+    # as an argument inside the scratch directory.
+    def getPath(self, fileName):
+        return os.path.join(self.directory, fileName)
+
+    # This function is used to create the folder of the document with the
+    # identifier provided as an argument and return its path. The folder is
+    # emptied first, so a document never sees the files left by an earlier
+    # attempt.
+    def getDocumentDirectory(self, identifier):
+        name = UNSAFE_CHARACTERS.sub("_", str(identifier)).strip("._") or "_"
+        directory = os.path.join(self.directory, name)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        return directory
+
+    # This function is used to remove the scratch directory unless it should be
+    # kept.
+    def close(self):
+        if not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    # These functions allow the workspace to be used in a with statement.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInformation):
+        self.close()
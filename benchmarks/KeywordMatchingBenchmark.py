@@ -0,0 +1,113 @@
+"""
+KEYWORD MATCHING BENCHMARK
+
+Compares the time taken to find the dates and keywords in the text of a
+document using the original sentence by sentence loop and using the compiled
+TextMatcher, for an increasing number of keywords. Both approaches are checked
+to return the same hits before they are timed.
+
+Steps for Executing the Benchmark:
+1. Execute this file from the folder containing the code, for instance with python benchmarks/KeywordMatchingBenchmark.py.
+"""
+
+# Importing the previously installed libraries.
+import os
+import re
+import sys
+import time
+import random
+
+# We make the shared code importable when the benchmark is executed directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Sentences import splitSentences
+from TextMatching import TextMatcher
+
+
+# This variable stores the months used to plant dates in the text.
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+
+# This function is used to generate the text of a synthetic page with the
+# number of sentences provided as an argument. Some sentences contain a date
+# and some contain words taken from the vocabulary.
+def generatePage(randomGenerator, vocabulary, numberOfSentences):
+    sentences = []
+    for i in range(numberOfSentences):
+        words = randomGenerator.choices(vocabulary, k=randomGenerator.randint(8,
+                                                                           30))
+        if randomGenerator.random() < 0.2:
+            words.insert(randomGenerator.randrange(len(words)),
+                         randomGenerator.choice(MONTHS) + " " +
+                         str(randomGenerator.randint(1, 28)) + ",\n" +
+                         str(randomGenerator.randint(1980, 2022)))
+        sentences.append(" ".join(words).capitalize())
+    return ". ".join(sentences)
+
+
+# This function is used to find the dates and keywords in the text provided as
+# an argument the way the original code did, running the date pattern and every
+# keyword against every sentence. The sentences are found by the same segmenter
+# as the TextMatcher, so that only the matching itself is compared.
+def findWithSentenceLoop(text, listOfKeywords):
+    hits = []
+    for sentence in splitSentences(text):
+        date = re.findall(r'((January|February|March|April|May|June|July|' +
+                          'August|September|October|November|December' +
+                          r')\s+\d{1,2},\s+\d{4})', sentence)
+        if date != []:
+            hits.append((sentence, True, date[0][0]))
+        for keyword in listOfKeywords:
+            if keyword.lower() in sentence.lower():
+                hits.append((sentence, False, keyword))
+    return hits
+
+
+# This function is used to time the function provided as an argument, returning
+# the best time out of a few repetitions.
+def timeFunction(function, repetitions=3):
+    bestTime = None
+    for i in range(repetitions):
+        startTime = time.perf_counter()
+        function()
+        elapsedTime = time.perf_counter() - startTime
+        bestTime = elapsedTime if bestTime is None else min(bestTime,
+                                                            elapsedTime)
+    return bestTime
+
+
+# This is the main part of the program.
+if __name__ == "__main__":
+
+    # We generate a reproducible synthetic corpus of pages.
+    randomGenerator = random.Random(1990)
+    vocabulary = ["".join(randomGenerator.choices("abcdefghijklmnopqrstuvwxyz",
+                                                  k=randomGenerator.randint(3,
+                                                                            10)))
+                  for i in range(5000)]
+    pages = [generatePage(randomGenerator, vocabulary, 60) for i in range(50)]
+    numberOfSentences = sum(len(splitSentences(page)) for page in pages)
+    print("Corpus of " + str(len(pages)) + " pages and " +
+          str(numberOfSentences) + " sentences.")
+    print()
+    print("%10s %14s %14s %9s" % ("keywords", "loop (s)", "matcher (s)",
+                                  "speedup"))
+
+    # We compare both approaches for an increasing number of keywords.
+    for numberOfKeywords in [1, 10, 100, 1000]:
+        listOfKeywords = randomGenerator.sample(vocabulary, numberOfKeywords)
+
+        # We make sure both approaches find exactly the same hits.
+        matcher = TextMatcher(listOfKeywords)
+        for page in pages:
+            assert (findWithSentenceLoop(page, listOfKeywords) ==
+                    list(matcher.iterMatches(page)))
+
+        loopTime = timeFunction(lambda: [findWithSentenceLoop(page,
+                                                              listOfKeywords)
+                                         for page in pages])
+        matcherTime = timeFunction(lambda: [list(matcher.iterMatches(page))
+                                            for page in pages])
+        print("%10d %14.4f %14.4f %8.1fx" % (numberOfKeywords, loopTime,
+                                             matcherTime,
+                                             loopTime / matcherTime))
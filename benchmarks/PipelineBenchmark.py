@@ -0,0 +1,689 @@
+"""
+PIPELINE BENCHMARK
+
+Measures the generalised code end to end, from downloading the PDFs listed in a
+data file to writing Output.csv, on a reproducible synthetic corpus. The corpus
+is generated offline from a seed: every record is a short enforcement order
+with planted dates and keywords, written either as a PDF with a text layer or
+as an image-only PDF whose pages have to be recognized using OCR. The records
+are split between the OCC, the FDIC and the FED, and their links have the same
+shapes as in Data.csv: OCC links to a PDF, FDIC links to a download servlet
+without any extension, FED links relative to federalreserve.gov, some of them
+to a press release webpage with several PDFs. A local HTTP server stands in for
+the three websites, answers conditional requests like they do and can add a
+delay to every response, so no request leaves the machine.
+
+Every configuration runs the command line entry point in a process of its own,
+so its peak memory is its own, with the run report of Instrumentation enabled.
+For every configuration, the benchmark reports the throughput in records,
+pages and megabytes per second, the percentiles of the latency of the records
+and of their downloads, the peak memory, and the recall and precision of the
+planted dates and keywords found in Output.csv. The results are saved as a JSON
+file so that two versions of the code can be compared.
+
+Steps for Executing the Benchmark:
+1. Execute this file from the folder containing the code, for instance with python benchmarks/PipelineBenchmark.py. The corpus is generated in .cache/benchmarks the first time and the results are written to benchmarks/results/<label>.json, where the label defaults to the current commit.
+2. Add --records 120 --image-ratio 0.5 --latency 0.05 to change the size of the corpus, the share of image-only records and the delay of the server, or --configurations sequential,parallel to only run some of the configurations.
+3. Execute python benchmarks/PipelineBenchmark.py --compare benchmarks/results/old.json benchmarks/results/new.json to compare the results of two versions.
+"""
+
+# Importing the previously installed libraries.
+import os
+import re
+import sys
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import textwrap
+import threading
+import subprocess
+import tempfile
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+
+# We make the shared code importable when the benchmark is executed directly.
+CODE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIRECTORY)
+
+
+# This variable stores the version of the corpus, which changes whenever the
+# way it is generated changes, so that an old corpus is generated again.
+CORPUS_VERSION = 1
+
+# This variable stores the folder the corpus is generated in.
+CORPUS_DIRECTORY = os.path.join(CODE_DIRECTORY, ".cache", "benchmarks")
+
+# This variable stores the folder the results are saved in.
+RESULTS_DIRECTORY = os.path.join(CODE_DIRECTORY, "benchmarks", "results")
+
+# This variable stores the websites the local server stands in for.
+HOSTS = ["www.occ.gov", "orders.fdic.gov", "www.federalreserve.gov"]
+
+# This variable stores the months used to plant dates in the text.
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+# This variable stores the keywords planted in the text and searched for.
+KEYWORDS = ["Wyomissing", "Reginald", "cease and desist", "civil money penalty",
+            "Bank Secrecy Act", "unsafe or unsound"]
+
+# This dictionary stores the configurations that can be run, in the order they
+# are run. Every configuration gives the number of worker processes and the
+# cache it uses: configurations sharing a cache run one after another on the
+# same cache directory, so a later one finds the PDFs and the recognized pages
+# of an earlier one in the caches, and None disables the caches.
+CONFIGURATIONS = {
+    "sequential": {"workers": 1, "cache": "sequential"},
+    "parallel": {"workers": os.cpu_count() or 1, "cache": "parallel"},
+    "parallel-warm": {"workers": os.cpu_count() or 1, "cache": "parallel"},
+    "parallel-uncached": {"workers": os.cpu_count() or 1, "cache": None}}
+
+# These variables store the size of the pages in points and the resolution the
+# image-only pages are drawn at.
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+IMAGE_DPI = 200
+
+# This variable stores the number of characters of a line of text.
+LINE_WIDTH = 80
+
+
+# This function is used to generate a planted date.
+def generateDate(randomGenerator):
+    return (randomGenerator.choice(MONTHS) + " " +
+            str(randomGenerator.randint(1, 28)) + ", " +
+            str(randomGenerator.randint(1985, 2022)))
+
+
+# This function is used to generate the text of a synthetic page. A sentence
+# holds at most one date and one keyword, so that every planted date and
+# keyword is written to the output once. It returns the lines of the page and
+# the list of the planted dates and keywords.
+def generatePage(randomGenerator, vocabulary, numberOfSentences):
+    sentences = []
+    plantedKeys = []
+    for i in range(numberOfSentences):
+        words = randomGenerator.choices(vocabulary,
+                                        k=randomGenerator.randint(8, 20))
+
+        # The planted dates and keywords are glued together so that they are
+        # never split across two lines.
+        for key in ([generateDate(randomGenerator)]
+                    if randomGenerator.random() < 0.35 else []) + \
+                   ([randomGenerator.choice(KEYWORDS)]
+                    if randomGenerator.random() < 0.25 else []):
+            words.insert(randomGenerator.randrange(1, len(words)),
+                         key.replace(" ", "\0"))
+            plantedKeys.append(key)
+        sentence = " ".join(words)
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+
+    lines = textwrap.wrap(" ".join(sentences), LINE_WIDTH,
+                          break_long_words=False, break_on_hyphens=False)
+    return [line.replace("\0", " ") for line in lines], plantedKeys
+
+
+# This function is used to escape the text provided as an argument for a string
+# of a PDF content stream.
+def escapePDFText(text):
+    return (text.replace("\\", "\\\\").replace("(", "\\(")
+            .replace(")", "\\)"))
+
+
+# This function is used to write a PDF with a text layer to the file with the
+# name provided as an argument. The pages are given as lists of lines, which
+# are written in Helvetica from the top of the page.
+def writeTextPDF(fileName, pages):
+
+    # This list stores the body of every object, numbered from 1. The catalog,
+    # the page tree and the font come first, followed by every page and its
+    # content.
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helv" +
+               b"etica /Encoding /WinAnsiEncoding >>"]
+    pageNumbers = []
+    for lines in pages:
+        content = ("BT /F1 11 Tf 14 TL 72 740 Td " +
+                   " T* ".join("(" + escapePDFText(line) + ") Tj"
+                               for line in lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length " + str(len(content)).encode() +
+                       b" >>\nstream\n" + content + b"\nendstream")
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 " +
+                        str(PAGE_WIDTH) + " " + str(PAGE_HEIGHT) + "] /Resou" +
+                        "rces << /Font << /F1 3 0 R >> >> /Contents " +
+                        str(len(objects)) + " 0 R >>").encode())
+        pageNumbers.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = ("<< /Type /Pages /Kids [" +
+                  " ".join(str(number) + " 0 R" for number in pageNumbers) +
+                  "] /Count " + str(len(pageNumbers)) + " >>").encode()
+
+    # We write the objects followed by their cross-reference table.
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += str(number).encode() + b" 0 obj\n" + body + b"\nendobj\n"
+    xrefOffset = len(data)
+    data += b"xref\n0 " + str(len(objects) + 1).encode() + b"\n"
+    data += b"0000000000 65535 f \n"
+    data += b"".join(("%010d 00000 n \n" % offset).encode()
+                     for offset in offsets)
+    data += (b"trailer\n<< /Size " + str(len(objects) + 1).encode() +
+             b" /Root 1 0 R >>\nstartxref\n" + str(xrefOffset).encode() +
+             b"\n%%EOF\n")
+    with open(fileName, 'wb') as file:
+        file.write(data)
+
+
+# This function is used to load the font the image-only pages are drawn with.
+def loadFont(size):
+    from PIL import ImageFont
+    for fontName in ["DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/Deja" +
+                     "VuSans.ttf", "Arial.ttf"]:
+        try:
+            return ImageFont.truetype(fontName, size)
+        except OSError:
+            pass
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+# This function is used to write an image-only PDF to the file with the name
+# provided as an argument, like a scanned order. The pages are given as lists
+# of lines, which are drawn at the same place as in a PDF with a text layer.
+def writeImagePDF(fileName, pages):
+    from PIL import Image, ImageDraw
+    scale = IMAGE_DPI / 72
+    font = loadFont(int(11 * scale))
+    images = []
+    for lines in pages:
+        image = Image.new("L", (int(PAGE_WIDTH * scale),
+                                int(PAGE_HEIGHT * scale)), 255)
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            draw.text((72 * scale, (PAGE_HEIGHT - 740 - 11 + 14 * i) * scale),
+                      line, fill=0, font=font)
+        images.append(image)
+    images[0].save(fileName, "PDF", resolution=IMAGE_DPI, save_all=True,
+                   append_images=images[1:])
+
+
+# This function is used to find the link of a record, with the same shape as
+# the links of its regulator in Data.csv, and the links of the files served for
+# it. FED links are relative to federalreserve.gov, and a FED press release
+# webpage links to every PDF of the record.
+def getRecordLinks(regulatorName, uniqueID, numberOfParts):
+    if regulatorName == "OCC":
+        return ("https://www.occ.gov/static/enforcement-actions/ea" +
+                str(uniqueID) + ".pdf"), []
+    if regulatorName == "FDIC":
+        return ("https://orders.fdic.gov/sfc/servlet.shepherd/document/downl" +
+                "oad/069t%07dAAS?operationContext=S1" % uniqueID), []
+    if numberOfParts == 1:
+        return "/supervisionreg/files/order" + str(uniqueID) + ".pdf", []
+    return ("/newsevents/pressreleases/enforcement" + str(uniqueID) + "a.htm",
+            ["files/enforcement" + str(uniqueID) + "a" + str(part) + ".pdf"
+             for part in range(1, numberOfParts + 1)])
+
+
+# This function is used to find the path the local server serves the link
+# provided as an argument under, which starts with the website of the link.
+def getServedPath(link):
+    if not link.startswith("https"):
+        link = "https://www.federalreserve.gov/" + link
+    parts = urlsplit(link)
+    path = re.sub("/+", "/", "/" + parts.netloc + "/" + parts.path)
+    return path + ("?" + parts.query if parts.query else "")
+
+
+# This function is used to generate the corpus with the parameters provided as
+# arguments in the given folder, unless it has already been generated there. It
+# returns the manifest of the corpus, which gives the files served under every
+# path and the dates and keywords planted in every record.
+def generateCorpus(directory, numberOfRecords, imageRatio, seed):
+
+    # We reuse a corpus generated earlier with the same parameters.
+    parameters = {"version": CORPUS_VERSION, "records": numberOfRecords,
+                  "imageRatio": imageRatio, "seed": seed}
+    manifestFile = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifestFile):
+        with open(manifestFile, encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest["parameters"] == parameters:
+            return manifest
+
+    print("Generating a corpus of " + str(numberOfRecords) + " records in " +
+          directory + ".")
+    filesDirectory = os.path.join(directory, "files")
+    os.makedirs(filesDirectory, exist_ok=True)
+    randomGenerator = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(randomGenerator.choices(
+        letters, k=randomGenerator.randint(3, 10))) for i in range(3000)]
+
+    # These variables store the files served under every path, the rows of the
+    # data file and the records.
+    served = {}
+    rows = []
+    records = {}
+    for uniqueID in range(1, numberOfRecords + 1):
+        regulatorName = ["OCC", "FDIC", "FED"][uniqueID % 3]
+        isImage = randomGenerator.random() < imageRatio
+        numberOfParts = (randomGenerator.choice([1, 2, 3])
+                         if regulatorName == "FED" else 1)
+        link, partLinks = getRecordLinks(regulatorName, uniqueID,
+                                         numberOfParts)
+
+        # We write every PDF of the record.
+        plantedKeys = []
+        numberOfPages = 0
+        pdfPaths = []
+        for part in range(numberOfParts):
+            pages = []
+            for i in range(randomGenerator.randint(1, 3)):
+                lines, keys = generatePage(randomGenerator, vocabulary, 12)
+                pages.append(lines)
+                plantedKeys += keys
+            numberOfPages += len(pages)
+            pdfFile = os.path.join(filesDirectory, str(uniqueID) + "-" +
+                                   str(part + 1) + ".pdf")
+            if isImage:
+                writeImagePDF(pdfFile, pages)
+            else:
+                writeTextPDF(pdfFile, pages)
+            pdfPaths.append(os.path.relpath(pdfFile, directory))
+
+        # A record with several PDFs is linked to a webpage listing them.
+        if partLinks:
+            webpageFile = os.path.join(filesDirectory, str(uniqueID) + ".htm")
+            with open(webpageFile, 'w', encoding='utf-8') as file:
+                file.write("<html><body>" + "".join(
+                    '<a href="' + partLink + '">Order</a>'
+                    for partLink in partLinks) + "</body></html>")
+            served[getServedPath(link)] = os.path.relpath(webpageFile,
+                                                          directory)
+            webpage = getServedPath(link)
+            for partLink, pdfPath in zip(partLinks, pdfPaths):
+                served[webpage.rsplit("/", 1)[0] + "/" + partLink] = pdfPath
+        else:
+            served[getServedPath(link)] = pdfPaths[0]
+
+        rows.append([uniqueID, "Synthetic Bank " + str(uniqueID), link])
+        records[str(uniqueID)] = {"regulator": regulatorName,
+                                  "image": isImage, "pages": numberOfPages,
+                                  "keys": plantedKeys}
+
+    # We write the data file of the corpus.
+    with open(os.path.join(directory, "Data.csv"), 'w', newline='',
+              encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Record ID", "Institution Name", "Link to File"])
+        writer.writerows(rows)
+
+    manifest = {"parameters": parameters, "served": served,
+                "records": records}
+    with open(manifestFile, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+    return manifest
+
+
+class CorpusRequestHandler(BaseHTTPRequestHandler):
+
+    # These variables store the folder of the corpus, the files served under
+    # every path and the delay (in seconds) added to every response. Responses
+    # keep the connection alive like the websites do.
+    protocol_version = "HTTP/1.1"
+    directory = "."
+    served = {}
+    latency = 0.0
+
+    # This function is used to answer a GET request. A request whose ETag
+    # matches the file is answered with 304 Not Modified, like the websites
+    # answer the conditional requests of the download cache.
+    def do_GET(self):
+        time.sleep(self.latency)
+        relativePath = self.served.get(re.sub("/+", "/", self.path))
+        if relativePath is None:
+            self.send_error(404)
+            return
+        with open(os.path.join(self.directory, relativePath), 'rb') as file:
+            body = file.read()
+        entityTag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == entityTag:
+            self.send_response(304)
+            self.send_header("ETag", entityTag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html" if
+                         relativePath.endswith(".htm") else "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", entityTag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # This function is used to keep the server quiet.
+    def log_message(self, format, *arguments):
+        pass
+
+
+# This function is used to start the local server for the corpus with the
+# manifest provided as an argument on a free port of the machine. The server
+# answers in a thread of its own until it is shut down.
+def startServer(directory, manifest, latency):
+    handler = type("Handler", (CorpusRequestHandler,),
+                   {"directory": directory, "served": manifest["served"],
+                    "latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# This function is used to send the requests for the websites of the regulators
+# to the local server listening on the port provided as an argument, by giving
+# every website a pooled session of Downloading that rewrites the links.
+def routeHosts(port):
+    import requests
+    import Downloading
+
+    class LocalAdapter(requests.adapters.HTTPAdapter):
+        def send(self, request, **keywordArguments):
+            parts = urlsplit(request.url)
+            request.url = urlunsplit(("http", "127.0.0.1:" + str(port),
+                                      "/" + parts.netloc + parts.path,
+                                      parts.query, ""))
+            return super().send(request, **keywordArguments)
+
+    for host in HOSTS:
+        session = requests.Session()
+        session.mount("https://", LocalAdapter(
+            pool_connections=1, pool_maxsize=Downloading.PER_HOST_LIMIT))
+        Downloading.sessions[host] = session
+        Downloading.hostLimits[host] = threading.BoundedSemaphore(
+            Downloading.PER_HOST_LIMIT)
+
+
+# This function is used to run a configuration in this process with the
+# settings provided as a dictionary. The state of the earlier runs and the text
+# index are removed from the cache first, so every record is processed again
+# while the download cache and the OCR cache are kept.
+def runConfiguration(settings):
+    routeHosts(settings["port"])
+    arguments = ["any", "--download", "--input", settings["dataFile"],
+                 "--start", "01/01/1900", "--end", "31/12/2100",
+                 "--keywords", ";".join(KEYWORDS),
+                 "--workers", str(settings["workers"]),
+                 "--output", settings["outputFile"],
+                 "--journal", settings["journalFile"],
+                 "--report", settings["reportFile"],
+                 "--scratch-directory", settings["scratchDirectory"]]
+    cacheDirectory = settings["cacheDirectory"]
+    if cacheDirectory is None:
+        arguments.append("--no-cache")
+    else:
+        arguments += ["--cache-directory", cacheDirectory]
+        os.makedirs(cacheDirectory, exist_ok=True)
+        for fileName in os.listdir(cacheDirectory):
+            if fileName.startswith(("state.sqlite3", "text.sqlite3")):
+                os.remove(os.path.join(cacheDirectory, fileName))
+    from CommandLine import main
+    return main(arguments)
+
+
+# This function is used to find the given percentiles of the list of values
+# provided as an argument using the nearest rank.
+def getPercentiles(values, percentiles=(50, 90, 99)):
+    values = sorted(values)
+    if values == []:
+        return {}
+    summary = {"p" + str(percentile): values[max(0, -(-percentile *
+                                                     len(values) // 100) - 1)]
+               for percentile in percentiles}
+    summary["max"] = values[-1]
+    return summary
+
+
+# This function is used to compare the rows of the output file provided as an
+# argument with the dates and keywords planted in the records. It returns the
+# recall and the precision of the rows.
+def getAccuracy(outputFile, records):
+    planted = Counter((uniqueID, key) for uniqueID, record in records.items()
+                      for key in record["keys"])
+    found = Counter()
+    with open(outputFile, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            found[(row["Record ID"], " ".join(
+                row["Key Information"].split()))] += 1
+    truePositives = sum((found & planted).values())
+    return (truePositives / max(1, sum(planted.values())),
+            truePositives / max(1, sum(found.values())))
+
+
+# This function is used to run the configuration with the name provided as an
+# argument in a process of its own and measure it. It returns the results of
+# the configuration.
+def measureConfiguration(name, manifest, corpusDirectory, runDirectory, port):
+    configuration = CONFIGURATIONS[name]
+    directory = os.path.join(runDirectory, name)
+    os.makedirs(directory)
+    settings = {"port": port, "workers": configuration["workers"],
+                "dataFile": os.path.join(corpusDirectory, "Data.csv"),
+                "outputFile": os.path.join(directory, "Output.csv"),
+                "journalFile": os.path.join(directory, "Output.journal"),
+                "reportFile": os.path.join(directory, "Report.json"),
+                "scratchDirectory": directory,
+                "cacheDirectory": None if configuration["cache"] is None else
+                os.path.join(runDirectory, "cache-" +
+                             configuration["cache"])}
+
+    # We run the configuration, keeping what it prints in a log.
+    print("Running the " + name + " configuration.")
+    with open(os.path.join(directory, "run.log"), 'w') as log:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                  "--run", json.dumps(settings)],
+                                 cwd=directory, stdout=log,
+                                 stderr=subprocess.STDOUT)
+    if process.returncode != 0:
+        raise RuntimeError("The " + name + " configuration failed, see " +
+                           os.path.join(directory, "run.log") + ".")
+
+    # We summarize the run report and compare the output with the corpus.
+    with open(settings["reportFile"], encoding='utf-8') as file:
+        report = json.load(file)
+    recall, precision = getAccuracy(settings["outputFile"],
+                                    manifest["records"])
+    wallTime = report["wallTime"]
+    recordLatencies = [sum(stage["wallTime"] for stage in
+                           record["stages"].values())
+                       for record in report["records"].values()]
+    downloadLatencies = [record["stages"]["download"]["wallTime"]
+                         for record in report["records"].values()
+                         if "download" in record["stages"]]
+    return {"workers": configuration["workers"],
+            "cache": configuration["cache"], "wallTime": wallTime,
+            "recordsPerSecond": len(manifest["records"]) / wallTime,
+            "pagesPerSecond": report["pagesPerSecond"],
+            "megabytesPerSecond": report["bytesDownloaded"] / 1024 ** 2 /
+            wallTime,
+            "recordLatency": getPercentiles(recordLatencies),
+            "downloadLatency": getPercentiles(downloadLatencies),
+            "peakMemory": report["peakMemory"], "recall": recall,
+            "precision": precision, "cacheHitRates": report["cacheHitRates"],
+            "cpuTime": report["cpuTime"],
+            "workerCPUTime": report["workerCPUTime"],
+            "stages": report["stages"]}
+
+
+# This function is used to describe the machine and the version of the code
+# the benchmark runs with.
+def getEnvironment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                cwd=CODE_DIRECTORY, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+# This dictionary stores the metrics compared between two results, with whether
+# a higher value is better.
+COMPARED_METRICS = {"recordsPerSecond": True, "pagesPerSecond": True,
+                    "recordLatency.p50": False, "recordLatency.p90": False,
+                    "downloadLatency.p90": False,
+                    "peakMemory.mainProcess": False,
+                    "peakMemory.largestWorker": False, "recall": True,
+                    "precision": True}
+
+
+# This function is used to find a metric, given as a path such as
+# "recordLatency.p90", in the results of a configuration.
+def getMetric(results, metric):
+    for key in metric.split("."):
+        if not isinstance(results, dict):
+            return None
+        results = results.get(key)
+    return results
+
+
+# This function is used to display the metrics of every configuration found in
+# both results files provided as arguments, with the change from the first to
+# the second.
+def compareResults(oldFile, newFile):
+    with open(oldFile, encoding='utf-8') as file:
+        oldResults = json.load(file)
+    with open(newFile, encoding='utf-8') as file:
+        newResults = json.load(file)
+    if oldResults["corpus"]["parameters"] != \
+            newResults["corpus"]["parameters"]:
+        print("Warning: the results were measured on different corpora.")
+    print("%-20s %-26s %12s %12s %9s" % ("configuration", "metric",
+                                         oldResults["label"][:12],
+                                         newResults["label"][:12], "change"))
+    for name, oldConfiguration in oldResults["configurations"].items():
+        newConfiguration = newResults["configurations"].get(name)
+        if newConfiguration is None:
+            continue
+        for metric, higherIsBetter in COMPARED_METRICS.items():
+            oldValue = getMetric(oldConfiguration, metric)
+            newValue = getMetric(newConfiguration, metric)
+            if oldValue is None or newValue is None:
+                continue
+            change = ("%+8.1f%%" % (100 * (newValue - oldValue) / oldValue)
+                      if oldValue else "")
+            print("%-20s %-26s %12.4g %12.4g %9s" % (name, metric, oldValue,
+                                                     newValue, change))
+
+
+# This function is used to display the main results of every configuration.
+def printResults(results):
+    print()
+    print("%-20s %9s %9s %9s %9s %9s %8s %8s" % (
+        "configuration", "time (s)", "records/s", "pages/s", "p50 (s)",
+        "p90 (s)", "memory", "recall"))
+    for name, configuration in results["configurations"].items():
+        peakMemory = configuration["peakMemory"]["mainProcess"]
+        print("%-20s %9.2f %9.2f %9.2f %9.3f %9.3f %7s %7.1f%%" % (
+            name, configuration["wallTime"],
+            configuration["recordsPerSecond"],
+            configuration["pagesPerSecond"] or 0,
+            configuration["recordLatency"].get("p50", 0),
+            configuration["recordLatency"].get("p90", 0),
+            str(peakMemory // 1024 ** 2) + "MB" if peakMemory else "-",
+            100 * configuration["recall"]))
+
+
+# This is the main part of the program.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the whole pipeline on a synthetic corpus.")
+    parser.add_argument("--records", type=int, default=60,
+                        help="number of records (default: %(default)s)")
+    parser.add_argument("--image-ratio", type=float, default=0.3,
+                        help="share of image-only records (default: " +
+                        "%(default)s)")
+    parser.add_argument("--seed", type=int, default=1990,
+                        help="seed of the corpus (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="delay in seconds added to every response of t" +
+                        "he server (default: %(default)s)")
+    parser.add_argument("--configurations", default=",".join(CONFIGURATIONS),
+                        help="configurations to run, separated by commas (d" +
+                        "efault: %(default)s)")
+    parser.add_argument("--label", help="name of the results (default: the " +
+                        "current commit)")
+    parser.add_argument("--compare", nargs=2, metavar="RESULTS",
+                        help="compare two results files instead of running")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    # A configuration is run by a process of its own with its settings.
+    if arguments.run is not None:
+        sys.exit(runConfiguration(json.loads(arguments.run)))
+    if arguments.compare is not None:
+        compareResults(*arguments.compare)
+        sys.exit(0)
+
+    # This list stores the configurations to run, in their usual order.
+    listOfNames = [name for name in arguments.configurations.split(",")
+                   if name != ""]
+    for name in listOfNames:
+        if name not in CONFIGURATIONS:
+            parser.error("unknown configuration " + repr(name) + ", choose " +
+                         "among " + ", ".join(CONFIGURATIONS))
+    listOfNames = [name for name in CONFIGURATIONS if name in listOfNames]
+
+    # We generate the corpus, or reuse it, and serve it locally.
+    corpusDirectory = os.path.join(CORPUS_DIRECTORY, "corpus-" +
+                                   str(arguments.records) + "-" +
+                                   str(arguments.image_ratio) + "-" +
+                                   str(arguments.seed))
+    manifest = generateCorpus(corpusDirectory, arguments.records,
+                              arguments.image_ratio, arguments.seed)
+    server = startServer(corpusDirectory, manifest, arguments.latency)
+
+    # We run every configuration in a folder of its own.
+    environment = getEnvironment()
+    results = {"label": arguments.label or environment["commit"] or
+               datetime.now().strftime("%Y%m%d-%H%M%S"),
+               "created": datetime.now().isoformat(timespec="seconds"),
+               "environment": environment,
+               "corpus": {"parameters": manifest["parameters"],
+                          "latency": arguments.latency,
+                          "records": len(manifest["records"]),
+                          "pages": sum(record["pages"] for record in
+                                       manifest["records"].values()),
+                          "imagePages": sum(record["pages"] for record in
+                                            manifest["records"].values()
+                                            if record["image"]),
+                          "plantedKeys": sum(len(record["keys"]) for record in
+                                             manifest["records"].values())},
+               "configurations": {}}
+    with tempfile.TemporaryDirectory(prefix="PipelineBenchmark.") as \
+            runDirectory:
+        try:
+            for name in listOfNames:
+                results["configurations"][name] = measureConfiguration(
+                    name, manifest, corpusDirectory, runDirectory,
+                    server.server_address[1])
+        finally:
+            server.shutdown()
+
+    # We save the results so that they can be compared with other versions.
+    os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+    resultsFile = os.path.join(RESULTS_DIRECTORY, results["label"] + ".json")
+    with open(resultsFile, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    printResults(results)
+    print()
+    print("The results were saved to " + resultsFile + ".")
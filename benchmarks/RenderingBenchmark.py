@@ -0,0 +1,106 @@
+"""
+RENDERING BENCHMARK
+
+Compares the throughput and the recall of the dates found using OCR for
+different ways of choosing the resolution the pages are rendered at: the fixed
+resolutions of DPI_LADDER, the adaptive resolution, and the adaptive resolution
+with binarized pages. Every page of every PDF is recognized using OCR, with the
+text layer and the OCR cache disabled.
+
+The dates found by each strategy are compared with reference dates. For a page
+with a usable text layer, the reference dates are the ones found in its text
+layer, otherwise they are the ones found using OCR at the highest resolution.
+
+Steps for Executing the Benchmark:
+1. Copy a few sample regulator PDFs into a folder, for instance Samples.
+2. Execute this file from the folder containing the code with the folder of samples as an argument, for instance python benchmarks/RenderingBenchmark.py Samples.
+"""
+
+# Importing the previously installed libraries.
+import os
+import sys
+import time
+
+# We make the shared code importable when the benchmark is executed directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PDFProcessing
+from TextMatching import TextMatcher
+
+
+# This function is used to find the dates in the text of every page provided as
+# a dictionary mapping (PDF, page number) to text. It returns a set of (PDF,
+# page number, date) tuples.
+def findDates(pageTexts):
+    matcher = TextMatcher()
+    return {(pdf, pageNumber, date)
+            for (pdf, pageNumber), text in pageTexts.items()
+            for sentence, isDate, date in
+            matcher.iterMatches(text.replace('-\n', ''))}
+
+
+# This function is used to recognize every page of every PDF in the list of PDFs
+# provided as an argument with the given resolution. It returns the text of
+# every page and the time taken.
+def recognizeAllPages(listOfPDFs, dpi, binarize):
+    PDFProcessing.BINARIZE = binarize
+    pageTexts = {}
+    startTime = time.perf_counter()
+    for pdf in listOfPDFs:
+        for pageNumber, text in PDFProcessing.iterPageTexts(
+                pdf, dpi, useTextLayer=False):
+            pageTexts[(pdf, pageNumber)] = text
+    return pageTexts, time.perf_counter() - startTime
+
+
+# This is the main part of the program.
+if __name__ == "__main__":
+
+    # This variable stores the folder of sample PDFs.
+    sampleFolder = sys.argv[1] if len(sys.argv) > 1 else "Samples"
+    listOfPDFs = sorted(os.path.join(sampleFolder, name) for name in
+                        os.listdir(sampleFolder) if name.lower().endswith(".pdf"))
+
+    # We make sure every page is really recognized.
+    PDFProcessing.OCR_CACHE_FILE = None
+
+    # This list stores the strategies compared, as tuples of their name, the
+    # dpi passed to iterPageTexts and whether the pages are binarized.
+    strategies = [(str(dpi) + " DPI", dpi, False)
+                  for dpi in PDFProcessing.DPI_LADDER]
+    strategies += [("adaptive", "adaptive", False),
+                   ("adaptive binarized", "adaptive", True)]
+
+    # We recognize the pages with every strategy.
+    results = {}
+    for name, dpi, binarize in strategies:
+        results[name] = recognizeAllPages(listOfPDFs, dpi, binarize)
+
+    # We build the reference dates from the text layers, falling back on the
+    # highest fixed resolution for the pages without a usable text layer.
+    highestResolution = str(PDFProcessing.DPI_LADDER[-1]) + " DPI"
+    referenceTexts = dict(results[highestResolution][0])
+    for pdf in listOfPDFs:
+        try:
+            textLayer = PDFProcessing.getTextLayer(pdf)
+        except Exception:
+            continue
+        for i, text in enumerate(textLayer):
+            if PDFProcessing.isTextLayerUsable(text):
+                referenceTexts[(pdf, i + 1)] = text
+    referenceDates = findDates(referenceTexts)
+
+    # We display the results of every strategy.
+    numberOfPages = len(referenceTexts)
+    print(str(len(listOfPDFs)) + " PDFs with " + str(numberOfPages) +
+          " pages and " + str(len(referenceDates)) + " reference dates.")
+    print()
+    print("%-20s %10s %12s %10s" % ("strategy", "time (s)", "pages/sec",
+                                    "recall"))
+    for name, dpi, binarize in strategies:
+        pageTexts, elapsedTime = results[name]
+        foundDates = findDates(pageTexts)
+        recall = (len(foundDates & referenceDates) / len(referenceDates)
+                  if referenceDates else 1.0)
+        print("%-20s %10.2f %12.2f %9.1f%%" % (name, elapsedTime,
+                                               numberOfPages / elapsedTime,
+                                               100 * recall))
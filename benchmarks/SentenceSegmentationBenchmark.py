@@ -0,0 +1,184 @@
+"""
+SENTENCE SEGMENTATION BENCHMARK
+
+Compares the original sentence splitter, which split the text of a page with
+". ", with the segmenter of Sentences.py. Synthetic pages are generated with
+known sentence boundaries: some sentences end at the end of a line (".\n"),
+some contain abbreviations and names with initials, some end with a single
+letter such as "Exhibit A", some contain several dates and some have a line
+break inside a date. The abbreviations, the names and the words starting the
+sentences are held out: they are written independently of the lists of
+Sentences.py and in the case they appear in real orders, such as "INC." or
+"Assn.", so the segmenter is not measured on the very words it was tuned on.
+For each splitter, the benchmark reports its throughput, the precision and the
+recall of the sentence boundaries it finds, and the recall of the planted dates,
+since only the first date of every sentence is written to the output.
+
+Steps for Executing the Benchmark:
+1. Execute this file from the folder containing the code, for instance with python benchmarks/SentenceSegmentationBenchmark.py.
+"""
+
+# Importing the previously installed libraries.
+import os
+import sys
+import time
+import random
+
+# We make the shared code importable when the benchmark is executed directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Sentences import getSentenceOffsets
+from TextMatching import DATE_PATTERN
+
+
+# This variable stores the months used to plant dates in the text.
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+# This variable stores phrases with abbreviations and initials that are planted
+# inside the sentences. Some of them are not known to the segmenter.
+ABBREVIATION_PHRASES = ["pursuant to 15 U.S.C. 78u(d)", "FIRST STATE BANK, " +
+                        "INC. and", "Docket NO. 2021-07 of",
+                        "under 12 C.F.R. Pt. 263", "Citibank, N.A. and",
+                        "signed by Mary T. Jones", "approved by A. B. Carter",
+                        "the Bankers Assn. and", "Smith Bros. and",
+                        "Community Bancorp, Co. and"]
+
+# This variable stores phrases planted at the end of the sentences, which end
+# with a single capital letter that is not an initial.
+ENDING_PHRASES = ["as set out in Exhibit A", "listed in Schedule B",
+                  "described in Appendix C", "under Part D"]
+
+# This variable stores words that start some of the sentences.
+OPENING_WORDS = ["The", "Respondent", "Management", "Within", "Each", "Bank",
+                 "Accordingly", "Its", "Directors", "Nothing", "Beginning"]
+
+
+# This function is used to generate a planted date, which sometimes has a line
+# break inside it like the text recognized from a scanned page.
+def generateDate(randomGenerator):
+    separator = "\n" if randomGenerator.random() < 0.2 else " "
+    return (randomGenerator.choice(MONTHS) + separator +
+            str(randomGenerator.randint(1, 28)) + ", " +
+            str(randomGenerator.randint(1980, 2022)))
+
+
+# This function is used to generate the text of a synthetic page with the
+# number of sentences provided as an argument. It returns the text, the
+# positions where the sentences end and the positions of the planted dates.
+def generatePage(randomGenerator, vocabulary, numberOfSentences):
+    text = ""
+    sentenceEnds = []
+    datePositions = []
+    for i in range(numberOfSentences):
+        words = randomGenerator.choices(vocabulary,
+                                        k=randomGenerator.randint(8, 30))
+        if randomGenerator.random() < 0.2:
+            words.insert(randomGenerator.randrange(1, len(words)),
+                         randomGenerator.choice(ABBREVIATION_PHRASES))
+        if randomGenerator.random() < 0.3:
+            words.insert(0, randomGenerator.choice(OPENING_WORDS))
+        if randomGenerator.random() < 0.15:
+            words.append(randomGenerator.choice(ENDING_PHRASES))
+        for j in range(randomGenerator.choice([0, 0, 1, 1, 2])):
+            words.insert(randomGenerator.randrange(len(words) + 1), "DATE")
+        sentence = " ".join(words)
+        sentence = sentence[0].upper() + sentence[1:]
+
+        # We replace the placeholders with dates, recording their positions.
+        while "DATE" in sentence:
+            position = sentence.index("DATE")
+            datePositions.append(len(text) + position)
+            sentence = (sentence[:position] + generateDate(randomGenerator) +
+                        sentence[position + 4:])
+
+        # The sentence ends at the end of a line or is followed by a space.
+        text += sentence
+        sentenceEnds.append(len(text))
+        text += ".\n" if randomGenerator.random() < 0.4 else ". "
+    return text, sentenceEnds, datePositions
+
+
+# This function is used to split the text provided as an argument the way the
+# original code did. It returns the same lists as getSentenceOffsets.
+def getSplitOffsets(text):
+    sentenceStarts = [0]
+    sentenceEnds = []
+    for sentence in text.split(". ")[:-1]:
+        sentenceEnds.append(sentenceStarts[-1] + len(sentence))
+        sentenceStarts.append(sentenceEnds[-1] + 2)
+    sentenceEnds.append(len(text))
+    return sentenceStarts, sentenceEnds
+
+
+# This function is used to find the positions of the dates that end up in the
+# output when the text is split by the splitter provided as an argument, which
+# are the first date of every sentence.
+def findReportedDates(text, splitter):
+    positions = set()
+    for sentenceStart, sentenceEnd in zip(*splitter(text)):
+        dateMatch = DATE_PATTERN.search(text, sentenceStart, sentenceEnd)
+        if dateMatch is not None:
+            positions.add(dateMatch.start())
+    return positions
+
+
+# This function is used to time the function provided as an argument, returning
+# the best time out of a few repetitions.
+def timeFunction(function, repetitions=3):
+    bestTime = None
+    for i in range(repetitions):
+        startTime = time.perf_counter()
+        function()
+        elapsedTime = time.perf_counter() - startTime
+        bestTime = elapsedTime if bestTime is None else min(bestTime,
+                                                            elapsedTime)
+    return bestTime
+
+
+# This is the main part of the program.
+if __name__ == "__main__":
+
+    # We generate a reproducible synthetic corpus of pages.
+    randomGenerator = random.Random(1990)
+    vocabulary = ["".join(randomGenerator.choices("abcdefghijklmnopqrstuvwxyz",
+                                                  k=randomGenerator.randint(3,
+                                                                            10)))
+                  for i in range(5000)]
+    pages = [generatePage(randomGenerator, vocabulary, 60) for i in range(200)]
+    numberOfBytes = sum(len(text.encode("utf-8")) for text, ends, dates in
+                        pages)
+    print("Corpus of " + str(len(pages)) + " pages, " +
+          str(sum(len(ends) for text, ends, dates in pages)) + " sentences " +
+          "and " + str(sum(len(dates) for text, ends, dates in pages)) +
+          " dates.")
+    print()
+    print("%-12s %10s %10s %10s %10s %10s" % ("splitter", "time (s)", "MB/s",
+                                              "precision", "recall",
+                                              "dates"))
+
+    # We compare both splitters on the same pages.
+    for name, splitter in [("split", getSplitOffsets),
+                           ("segmenter", getSentenceOffsets)]:
+        elapsedTime = timeFunction(lambda: [splitter(text) for text, ends,
+                                            dates in pages])
+
+        # We compare the boundaries found with the planted ones, ignoring the
+        # end of the page which is not a boundary, and count the planted dates
+        # that are reported.
+        truePositives = foundBoundaries = plantedBoundaries = 0
+        reportedDates = plantedDates = 0
+        for text, sentenceEnds, datePositions in pages:
+            found = set(splitter(text)[1][:-1])
+            planted = set(sentenceEnds)
+            truePositives += len(found & planted)
+            foundBoundaries += len(found)
+            plantedBoundaries += len(planted)
+            reportedDates += len(findReportedDates(text, splitter) &
+                                 set(datePositions))
+            plantedDates += len(datePositions)
+
+        print("%-12s %10.4f %10.1f %10.3f %10.3f %10.3f" % (
+            name, elapsedTime, numberOfBytes / elapsedTime / 1024 ** 2,
+            truePositives / max(1, foundBoundaries),
+            truePositives / max(1, plantedBoundaries),
+            reportedDates / max(1, plantedDates)))